@@ -0,0 +1,105 @@
+"""Microbenchmark block classification on a list-heavy synthetic page.
+
+Usage:
+    python3 bench/block_benchmark.py --blocks 5000 --output bench/results/blocks.json
+    python3 bench/block_benchmark.py --compare bench/results/blocks.json
+
+Times the per-line regex classifier the parser used to have (kept below as
+the reference), block_to_block_type, and classify_block, which also returns
+the item bodies, over every block of one large page. Most of the page is
+lists and quotes, the blocks that classify line by line.
+"""
+import os
+import re
+import sys
+import json
+import argparse
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+from corpus import CorpusGenerator
+from run_benchmarks import time_call, current_commit
+from markdown_parser import BlockType, block_to_block_type, classify_block, markdown_to_blocks
+
+LIST_HEAVY_MIX = {
+    "paragraph": 1,
+    "heading": 1,
+    "unordered_list": 4,
+    "ordered_list": 4,
+    "quote": 2,
+    "code": 1,
+}
+
+def regex_block_type(block):
+    """The original classifier: string patterns, re-run on every line."""
+    lines = block.split("\n")
+    if re.match(r"^#{1,6}\s", block):
+        return BlockType.HEADING
+    if block.startswith("```") and block.endswith("```"):
+        return BlockType.CODE
+    if all(line.startswith(">") for line in lines):
+        return BlockType.QUOTE
+    if all(re.match(r"^-\s", line) for line in lines):
+        return BlockType.UNORDERED_LIST
+    if all(re.match(r"^\d+\.\s", line) for line in lines):
+        numbers = [int(re.match(r"^(\d+)\.", line).group(1)) for line in lines]
+        if numbers == list(range(1, len(numbers) + 1)):
+            return BlockType.ORDERED_LIST
+    return BlockType.PARAGRAPH
+
+def regex_item_bodies(block, block_type):
+    """The original item extraction that followed classification."""
+    if block_type == BlockType.UNORDERED_LIST:
+        return [line[2:] for line in block.split("\n")]
+    if block_type == BlockType.ORDERED_LIST:
+        return [re.sub(r"^\d+\. ", "", line) for line in block.split("\n")]
+    if block_type == BlockType.QUOTE:
+        return [line[1:].lstrip() for line in block.split("\n")]
+    return [block]
+
+def run(args):
+    generator = CorpusGenerator(seed=args.seed, blocks_per_page=args.blocks, block_mix=LIST_HEAVY_MIX)
+    blocks = markdown_to_blocks(generator.page("List-heavy page"))
+    for block in blocks:
+        # The engines must agree before their timings mean anything
+        assert regex_block_type(block) == block_to_block_type(block), block
+
+    benchmarks = {
+        "regex_block_type": lambda: [regex_block_type(block) for block in blocks],
+        "block_to_block_type": lambda: [block_to_block_type(block) for block in blocks],
+        "regex_with_items": lambda: [regex_item_bodies(block, regex_block_type(block)) for block in blocks],
+        "classify_block": lambda: [classify_block(block) for block in blocks],
+    }
+    results = {}
+    for name, func in benchmarks.items():
+        results[name] = time_call(func, args.repeat)
+        print(f"{name:<20} min {results[name]['min'] * 1000:10.2f} ms   "
+              f"median {results[name]['median'] * 1000:10.2f} ms")
+    return {"commit": current_commit(), "blocks": len(blocks), "seed": args.seed, "results": results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a previous results file")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for name, result in report["results"].items():
+            before = baseline["results"].get(name)
+            if before is not None:
+                print(f"  {name:<20} {before['min'] * 1000:10.2f} ms -> {result['min'] * 1000:10.2f} ms "
+                      f"({result['min'] / before['min']:.2f}x)")
+
+if __name__ == "__main__":
+    main()
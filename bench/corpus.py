@@ -0,0 +1,140 @@
+"""Deterministic synthetic markdown corpus for benchmarks.
+
+The same parameters and seed always produce byte-identical pages, so timings
+taken on different commits are measured against the same input.
+"""
+import os
+import random
+
+WORDS = (
+    "ring hobbit wizard elf dwarf shire mordor gondor rohan river mountain "
+    "forest road journey fellowship shadow light tower king steward council "
+    "lore song story battle horse sword bow cloak lamp star tree stone"
+).split()
+
+# Relative weight of each block kind in a page
+DEFAULT_BLOCK_MIX = {
+    "paragraph": 6,
+    "heading": 2,
+    "unordered_list": 2,
+    "ordered_list": 1,
+    "quote": 1,
+    "code": 1,
+}
+
+def parse_block_mix(text):
+    """Parse a block mix like "paragraph=6,heading=2,code=1".
+
+    Kinds left out do not occur.
+
+    Raises:
+        ValueError: If a kind is unknown or a weight is not a positive number
+    """
+    mix = {}
+    for item in text.split(","):
+        kind, _, weight = item.strip().partition("=")
+        if kind not in DEFAULT_BLOCK_MIX:
+            raise ValueError(f"unknown block kind {kind!r}, expected one of {', '.join(DEFAULT_BLOCK_MIX)}")
+        try:
+            mix[kind] = float(weight)
+        except ValueError:
+            raise ValueError(f"invalid weight {weight!r} for {kind}")
+        if mix[kind] <= 0:
+            raise ValueError(f"invalid weight {weight!r} for {kind}")
+    return mix
+
+class CorpusGenerator():
+    """Builds synthetic pages from a seeded random generator.
+
+    Args:
+        seed (int): Random seed
+        blocks_per_page (int): Number of blocks in each page
+        block_mix (dict): Block kind to relative weight, see DEFAULT_BLOCK_MIX
+        inline_density (float): Chance that a word is wrapped in bold, italic or code
+        links_per_block (float): Average number of links per text block
+        images_per_block (float): Average number of images per text block
+        words_per_block (int): Average number of words per paragraph
+    """
+
+    def __init__(self, seed=0, blocks_per_page=30, block_mix=None, inline_density=0.1,
+                 links_per_block=1.0, images_per_block=0.1, words_per_block=60):
+        self.rng = random.Random(seed)
+        self.blocks_per_page = blocks_per_page
+        self.block_mix = block_mix or DEFAULT_BLOCK_MIX
+        self.inline_density = inline_density
+        self.links_per_block = links_per_block
+        self.images_per_block = images_per_block
+        self.words_per_block = words_per_block
+
+    def _count(self, average):
+        # Integer part always, fractional part by chance
+        whole = int(average)
+        return whole + (1 if self.rng.random() < average - whole else 0)
+
+    def inline_text(self, words):
+        rng = self.rng
+        parts = []
+        for _ in range(words):
+            word = rng.choice(WORDS)
+            if rng.random() < self.inline_density:
+                word = rng.choice(["**{}**", "_{}_", "`{}`"]).format(word)
+            parts.append(word)
+        for _ in range(self._count(self.links_per_block)):
+            parts.insert(rng.randrange(len(parts) + 1), f"[{rng.choice(WORDS)}](/{rng.choice(WORDS)}/{rng.randrange(1000)})")
+        for _ in range(self._count(self.images_per_block)):
+            parts.insert(rng.randrange(len(parts) + 1), f"![{rng.choice(WORDS)}](/images/{rng.choice(WORDS)}.png)")
+        return " ".join(parts)
+
+    def block(self, kind):
+        rng = self.rng
+        if kind == "heading":
+            return "#" * rng.randint(2, 4) + " " + self.inline_text(rng.randint(2, 6))
+        if kind == "unordered_list":
+            return "\n".join("- " + self.inline_text(rng.randint(3, 12)) for _ in range(rng.randint(2, 8)))
+        if kind == "ordered_list":
+            return "\n".join(f"{i}. " + self.inline_text(rng.randint(3, 12)) for i in range(1, rng.randint(2, 8) + 1))
+        if kind == "quote":
+            return "\n".join("> " + self.inline_text(rng.randint(4, 12)) for _ in range(rng.randint(1, 4)))
+        if kind == "code":
+            lines = [" ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 8))) for _ in range(rng.randint(2, 10))]
+            return "```\n" + "\n".join(lines) + "\n```"
+        words = max(1, int(rng.gauss(self.words_per_block, self.words_per_block / 4)))
+        text = self.inline_text(words).split(" ")
+        # wrap paragraphs over several lines like hand-written markdown
+        return "\n".join(" ".join(text[i:i + 12]) for i in range(0, len(text), 12))
+
+    def page(self, title):
+        kinds = list(self.block_mix)
+        weights = [self.block_mix[kind] for kind in kinds]
+        blocks = ["# " + title]
+        blocks += [self.block(kind) for kind in self.rng.choices(kinds, weights, k=self.blocks_per_page)]
+        return "\n\n".join(blocks) + "\n"
+
+def generate_corpus(dest_dir, pages=100, nesting=2, fanout=4, **options):
+    """Write a synthetic content tree of markdown pages.
+
+    Args:
+        dest_dir (str): Directory to write the pages into
+        pages (int): Number of pages
+        nesting (int): Directory depth pages are spread over
+        fanout (int): Subdirectories per directory level
+        **options: Passed to CorpusGenerator
+
+    Returns:
+        list: Paths of the written pages
+    """
+    generator = CorpusGenerator(**options)
+    paths = []
+    for index in range(pages):
+        parts = []
+        value = index
+        for _ in range(nesting):
+            parts.append(f"section{value % fanout}")
+            value //= fanout
+        name = "index.md" if index == 0 else f"page{index}.md"
+        path = os.path.join(dest_dir, *parts[:index % (nesting + 1)], name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(generator.page(f"Page {index}"))
+        paths.append(path)
+    return paths
@@ -0,0 +1,81 @@
+"""Measure the memory held by the node trees of one large synthetic page.
+
+Usage:
+    python3 bench/memory_benchmark.py --blocks 5000 --output bench/results/memory.json
+    python3 bench/memory_benchmark.py --compare bench/results/memory.json
+
+tracemalloc reports the bytes still allocated once the TextNode lists and the
+HTMLNode tree of the page are built, and the peak reached while building them.
+"""
+import os
+import sys
+import json
+import argparse
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+from corpus import CorpusGenerator
+from markdown_parser import markdown_to_blocks, markdown_to_html_node, text_to_textnodes
+
+def count_nodes(node):
+    return 1 + sum(count_nodes(child) for child in node.children or [])
+
+def measure(func):
+    tracemalloc.start()
+    try:
+        tracemalloc.reset_peak()
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current, peak
+
+def run(args):
+    generator = CorpusGenerator(seed=args.seed, blocks_per_page=args.blocks,
+                                inline_density=args.inline_density, links_per_block=args.links_per_block)
+    markdown = generator.page("Large page")
+    blocks = markdown_to_blocks(markdown)
+
+    text_nodes, text_current, text_peak = measure(lambda: [text_to_textnodes(block) for block in blocks])
+    tree, tree_current, tree_peak = measure(lambda: markdown_to_html_node(markdown))
+    text_node_count = sum(len(nodes) for nodes in text_nodes)
+    html_node_count = count_nodes(tree)
+    results = {
+        "text_nodes": {"count": text_node_count, "bytes": text_current, "peak": text_peak,
+                       "bytes_per_node": text_current / text_node_count},
+        "html_tree": {"count": html_node_count, "bytes": tree_current, "peak": tree_peak,
+                      "bytes_per_node": tree_current / html_node_count},
+    }
+    for name, result in results.items():
+        print(f"{name:<11} {result['count']:8d} nodes  {result['bytes'] / 2**20:8.2f} MiB held  "
+              f"{result['peak'] / 2**20:8.2f} MiB peak  {result['bytes_per_node']:7.1f} B/node")
+    return {"markdown_bytes": len(markdown.encode("utf-8")), "blocks": args.blocks, "seed": args.seed,
+            "results": results}
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--blocks", type=int, default=5000)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--inline-density", type=float, default=0.2)
+    parser.add_argument("--links-per-block", type=float, default=3.0)
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a previous results file")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+        for name, result in report["results"].items():
+            before = baseline["results"][name]["bytes"]
+            print(f"  {name:<11} {before / 2**20:8.2f} MiB -> {result['bytes'] / 2**20:8.2f} MiB "
+                  f"({result['bytes'] / before:.2f}x)")
+
+if __name__ == "__main__":
+    main()
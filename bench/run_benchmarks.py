@@ -0,0 +1,152 @@
+"""Benchmark the markdown pipeline on a synthetic corpus.
+
+Usage:
+    python3 bench/run_benchmarks.py --pages 200 --output bench/results/HEAD.json
+    python3 bench/run_benchmarks.py --compare bench/results/before.json
+
+Each benchmark is repeated and the minimum and median times are stored as
+JSON, together with the corpus parameters and the commit they were taken on,
+so runs on different commits can be compared.
+"""
+import os
+import io
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import statistics
+import subprocess
+import tempfile
+from contextlib import redirect_stdout
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, "src"))
+
+from corpus import DEFAULT_BLOCK_MIX, generate_corpus, parse_block_mix
+from markdown_parser import text_to_textnodes, markdown_to_blocks, markdown_to_html_node, markdown_to_html
+from page_generator import generate_pages_recursive
+
+def time_call(func, repeat):
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        times.append(time.perf_counter() - start)
+    return {"min": min(times), "median": statistics.median(times), "repeat": repeat}
+
+def current_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=ROOT_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(args):
+    work_dir = tempfile.mkdtemp(prefix="ssg-bench-")
+    try:
+        content_dir = os.path.join(work_dir, "content")
+        paths = generate_corpus(
+            content_dir, pages=args.pages, nesting=args.nesting, seed=args.seed,
+            blocks_per_page=args.blocks_per_page, inline_density=args.inline_density,
+            links_per_block=args.links_per_block, images_per_block=args.images_per_block,
+            block_mix=args.block_mix,
+        )
+        documents = []
+        for path in paths:
+            with open(path) as f:
+                documents.append(f.read())
+        blocks = [block for document in documents for block in markdown_to_blocks(document)]
+        nodes = [markdown_to_html_node(document) for document in documents]
+        template_path = os.path.join(ROOT_DIR, "template.html")
+
+        def end_to_end():
+            dest_dir = os.path.join(work_dir, "docs")
+            shutil.rmtree(dest_dir, ignore_errors=True)
+            with redirect_stdout(io.StringIO()):
+                generate_pages_recursive(content_dir, template_path, dest_dir, "/", jobs=args.jobs)
+
+        benchmarks = {
+            "text_to_textnodes": lambda: [text_to_textnodes(block) for block in blocks],
+            "markdown_to_blocks": lambda: [markdown_to_blocks(document) for document in documents],
+            "markdown_to_html_node": lambda: [markdown_to_html_node(document) for document in documents],
+            "to_html": lambda: [node.to_html() for node in nodes],
+            "markdown_to_html": lambda: [markdown_to_html(document) for document in documents],
+            "generate_pages_recursive": end_to_end,
+        }
+        results = {}
+        for name, func in benchmarks.items():
+            if args.only and name not in args.only:
+                continue
+            results[name] = time_call(func, args.repeat)
+            print(f"{name:<26} min {results[name]['min'] * 1000:10.2f} ms   "
+                  f"median {results[name]['median'] * 1000:10.2f} ms")
+        return {
+            "commit": current_commit(),
+            "python": platform.python_version(),
+            "corpus": {
+                "pages": args.pages,
+                "nesting": args.nesting,
+                "seed": args.seed,
+                "blocks_per_page": args.blocks_per_page,
+                "block_mix": args.block_mix,
+                "inline_density": args.inline_density,
+                "links_per_block": args.links_per_block,
+                "images_per_block": args.images_per_block,
+                "bytes": sum(len(document.encode("utf-8")) for document in documents),
+            },
+            "jobs": args.jobs,
+            "results": results,
+        }
+    finally:
+        shutil.rmtree(work_dir)
+
+def compare(baseline, current):
+    """Print how each benchmark's minimum time changed against a baseline run."""
+    print(f"Compared with {baseline.get('commit')}:")
+    if baseline.get("corpus") != current.get("corpus"):
+        print("  warning: the runs used different corpus parameters")
+    for name, result in current["results"].items():
+        before = baseline["results"].get(name)
+        if before is None:
+            continue
+        ratio = result["min"] / before["min"] if before["min"] else float("inf")
+        print(f"  {name:<26} {before['min'] * 1000:10.2f} ms -> {result['min'] * 1000:10.2f} ms  ({ratio:.2f}x)")
+
+def block_mix_spec(text):
+    try:
+        return parse_block_mix(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=100)
+    parser.add_argument("--nesting", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--blocks-per-page", type=int, default=30)
+    parser.add_argument("--block-mix", type=block_mix_spec, default=DEFAULT_BLOCK_MIX, metavar="KIND=WEIGHT,...",
+                        help="Relative weight of each block kind, e.g. paragraph=6,heading=2,code=1 "
+                             f"(kinds: {', '.join(DEFAULT_BLOCK_MIX)})")
+    parser.add_argument("--inline-density", type=float, default=0.1)
+    parser.add_argument("--links-per-block", type=float, default=1.0)
+    parser.add_argument("--images-per-block", type=float, default=0.1)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--jobs", type=int, default=1, help="Worker processes for the end-to-end build")
+    parser.add_argument("--only", nargs="*", help="Run only these benchmarks")
+    parser.add_argument("--output", help="Write the results as JSON to this path")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare against a previous results file")
+    args = parser.parse_args(argv)
+
+    report = run(args)
+    if args.output:
+        os.makedirs(os.path.dirname(os.path.abspath(args.output)), exist_ok=True)
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), report)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+import os
+import json
+import hashlib
+from collections import OrderedDict
+
+# Bump when block rendering changes so stale on-disk fragments are ignored
+CACHE_VERSION = 4
+
+class BlockCache():
+    """Bounded LRU memo of rendered markdown blocks.
+
+    Keys are hashes of a block's markdown text, and of the context of the
+    UrlResolver it was rendered with, and values are the HTML the block
+    renders to, so repeated blocks (shared disclaimers, boilerplate lists)
+    are parsed once. Hits and misses are counted for reporting.
+    """
+
+    def __init__(self, maxsize=4096, track_new=False):
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._new = [] if track_new else None # (key, html) put since take_new, if tracked
+
+    @staticmethod
+    def key(block, urls=None, facts=None):
+        """Return the key of a block rendered with the given UrlResolver, if any.
+
+        Blocks rendered while collecting markdown_parser.PageFacts are cached
+        as (html, facts) and keyed apart from those cached as plain HTML.
+        """
+        if urls is not None:
+            block = f"{urls.context}\0{block}"
+        if facts is not None:
+            block = f"{facts.context}\0{block}"
+        return hashlib.blake2b(block.encode("utf-8"), digest_size=16).hexdigest()
+
+    def get(self, key):
+        html = self._entries.get(key)
+        if html is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return html
+
+    def put(self, key, html):
+        if self._new is not None and key not in self._entries:
+            self._new.append((key, html))
+        self._entries[key] = html
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def take_new(self):
+        """Return the entries added since the last call, with track_new set.
+
+        Worker processes hand these back so the parent can merge them into
+        the cache it saves.
+        """
+        new, self._new = self._new, []
+        return new
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
+
+    def __len__(self):
+        return len(self._entries)
+
+class DiskBlockCache(BlockCache):
+    """A BlockCache that is loaded from and saved to a JSON file between runs."""
+
+    def __init__(self, path, maxsize=65536, track_new=False):
+        super().__init__(maxsize)
+        self.path = path
+        if os.path.exists(path):
+            with open(path, "r") as f:
+                data = json.load(f)
+            if data.get("version") == CACHE_VERSION:
+                for key, html in data["blocks"]:
+                    self.put(key, html)
+        if track_new:
+            self._new = []
+
+    def save(self):
+        """Write the cached fragments to disk, least recently used first."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"version": CACHE_VERSION, "blocks": list(self._entries.items())}, f)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,73 @@
+import os
+import sys
+import json
+import socket
+
+# Where the build daemon listens by default, in the project directory
+SOCKET_NAME = ".build-daemon.sock"
+
+def socket_path(root_dir):
+    """Return the daemon socket of a project, or $BUILD_DAEMON_SOCKET if set."""
+    return os.environ.get("BUILD_DAEMON_SOCKET") or os.path.join(root_dir, SOCKET_NAME)
+
+# Commands of main.py that do not build, so are always run in this process
+LOCAL_COMMANDS = ("serve", "merge", "daemon")
+
+class NoDaemonError(Exception):
+    """Raised when no build daemon accepts the connection."""
+
+def request_build(argv, path, out=None):
+    """Run a build in the daemon listening on path, copying its output to out.
+
+    Args:
+        argv (list): Build options, as given to main.py
+        path (str): The daemon's Unix socket
+        out (file, optional): Receives the build's output, stdout by default
+
+    Returns:
+        int: The build's exit status
+
+    Raises:
+        NoDaemonError: If no daemon is listening on path
+        OSError: If the daemon went away mid-build
+    """
+    out = sys.stdout if out is None else out
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError as e:
+            raise NoDaemonError(f"no build daemon listening on {path}: {e}") from e
+        request = {"argv": argv, "cwd": os.getcwd()}
+        sock.sendall(json.dumps(request).encode("utf-8") + b"\n")
+        with sock.makefile("r", encoding="utf-8") as reader:
+            for line in reader:
+                message = json.loads(line)
+                if "status" in message:
+                    return message["status"]
+                out.write(message["output"])
+    raise ConnectionError(f"build daemon on {path} closed the connection")
+
+def main(argv=None):
+    """Build through the daemon, or in this process when none is running.
+
+    Takes the same options as a build with main.py. Only the standard library
+    is imported until a cold build is needed, so a warm build costs little
+    more than interpreter startup. A daemon that goes away mid-build fails
+    the build instead of starting it over, since the daemon may have written
+    part of it already. The serve, merge and daemon commands run here.
+    """
+    argv = sys.argv[1:] if argv is None else argv
+    if not argv or argv[0] not in LOCAL_COMMANDS:
+        root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        try:
+            return request_build(argv, socket_path(root_dir))
+        except NoDaemonError:
+            print("No build daemon running, building in this process", file=sys.stderr)
+        except OSError as e:
+            print(f"Build daemon failed mid-build: {e}", file=sys.stderr)
+            return 1
+    from main import main as build_main
+    return build_main(argv)
+
+if __name__ == "__main__":
+    sys.exit(main())
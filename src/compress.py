@@ -0,0 +1,114 @@
+import os
+import gzip
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from manifest import hash_bytes, remove_output
+from pipeline import read_bytes, write_if_changed
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+COMPRESSIBLE_EXTENSIONS = (".html", ".css", ".js")
+
+def available_formats():
+    """Return the compressed variants this build can write: "gz", plus "zst" if zstandard is installed."""
+    return ["gz", "zst"] if zstandard is not None else ["gz"]
+
+def compress_bytes(data, fmt):
+    """Compress data for a .gz or .zst sibling.
+
+    gzip output carries no timestamp, so the same input always gives the same bytes.
+    """
+    if fmt == "gz":
+        return gzip.compress(data, compresslevel=9, mtime=0)
+    if fmt == "zst":
+        return zstandard.ZstdCompressor(level=19).compress(data)
+    raise ValueError(f"unknown compression format: {fmt}")
+
+def compress_outputs(dest_dir, manifest, min_size=1024, formats=None, workers=8):
+    """Write precompressed siblings of the HTML, CSS and JS files under dest_dir.
+
+    Every file at least min_size bytes long gets a sibling per format, e.g.
+    index.html.gz. A file whose content hash matches the one recorded in the
+    manifest, and whose siblings still exist, is not compressed again.
+    Siblings of files that were removed or shrank below min_size are deleted.
+    Compression runs on a thread pool; zlib and zstd release the GIL while
+    they work.
+
+    Args:
+        dest_dir (str): The build output directory
+        manifest (BuildManifest): Records the hash each file was compressed from;
+            updated in place
+        min_size (int): Smaller files are served uncompressed
+        formats (list, optional): Formats to write, default available_formats()
+        workers (int): Number of compression threads
+
+    Returns:
+        list: Paths, relative to dest_dir, of the siblings written or removed
+    """
+    formats = formats if formats is not None else available_formats()
+    seen = set()
+    sources = []
+    for root, dirs, files in os.walk(dest_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if not file.endswith(COMPRESSIBLE_EXTENSIONS):
+                continue
+            path = os.path.join(root, file)
+            if os.path.getsize(path) < min_size:
+                continue
+            rel_path = os.path.relpath(path, dest_dir).replace(os.sep, "/")
+            seen.add(rel_path)
+            sources.append(rel_path)
+
+    def compress(rel_path):
+        data = read_bytes(os.path.join(dest_dir, rel_path))
+        content_hash = hash_bytes(data)
+        outputs = [f"{rel_path}.{fmt}" for fmt in formats]
+        entry = manifest.compressed.get(rel_path)
+        if (entry is not None and entry["hash"] == content_hash and entry["outputs"] == outputs
+                and all(os.path.exists(os.path.join(dest_dir, output)) for output in outputs)):
+            return rel_path, entry, []
+        written = []
+        for fmt, output in zip(formats, outputs):
+            if write_if_changed(os.path.join(dest_dir, output), compress_bytes(data, fmt)):
+                written.append(output)
+        return rel_path, {"hash": content_hash, "outputs": outputs}, written
+
+    changed = []
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for rel_path, entry, written in executor.map(compress, sources):
+            previous = manifest.compressed.get(rel_path)
+            if previous is not None:
+                # Drop siblings of formats no longer written
+                for output in previous["outputs"]:
+                    if output not in entry["outputs"]:
+                        remove_output(dest_dir, output)
+                        changed.append(output)
+            manifest.record_compressed(rel_path, entry["hash"], entry["outputs"])
+            changed.extend(written)
+
+    changed.extend(remove_compressed(dest_dir, manifest, seen))
+    logger.info(f"Compression: {len(sources)} files, {len(changed)} variants written or removed")
+    return changed
+
+def remove_compressed(dest_dir, manifest, keep=()):
+    """Delete the recorded compressed siblings of every output not in keep.
+
+    Called with no keep set when a build runs without compression, so old
+    siblings cannot go stale next to outputs that have changed since.
+
+    Returns:
+        list: Paths, relative to dest_dir, of the removed siblings
+    """
+    removed = []
+    for outputs in manifest.prune_compressed(set(keep)):
+        for output in outputs:
+            logger.debug(f"Removing stale compressed file: {os.path.join(dest_dir, output)}")
+            remove_output(dest_dir, output)
+            removed.append(output)
+    return removed
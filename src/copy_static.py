@@ -1,11 +1,25 @@
 import os
+import json
 import shutil
 import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from manifest import ASSET_MANIFEST_NAME, hash_file, remove_output
+from pipeline import write_if_changed
+from shard import in_shard
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Static files worth fingerprinting: stylesheets, scripts, images and fonts.
+# Anything else, like robots.txt, favicon.ico or CNAME, is only fetched by its name.
+FINGERPRINT_EXTENSIONS = {
+    ".css", ".js", ".mjs", ".map",
+    ".png", ".jpg", ".jpeg", ".gif", ".webp", ".avif", ".svg",
+    ".woff", ".woff2", ".ttf", ".otf", ".eot",
+}
+
 def copy_static(source_dir: str, dest_dir: str) -> None:
     """Recursively copy all files from source_dir to dest_dir.
     
@@ -29,9 +43,242 @@ def copy_static(source_dir: str, dest_dir: str) -> None:
         
         # If it's a file, copy it
         if os.path.isfile(source_path):
-            logger.info(f"Copying file: {source_path} -> {dest_path}")
+            logger.debug(f"Copying file: {source_path} -> {dest_path}")
             shutil.copy(source_path, dest_path)
         # If it's a directory, recursively copy it
         else:
-            logger.info(f"Copying directory: {source_path} -> {dest_path}")
-            copy_static(source_path, dest_path) 
\ No newline at end of file
+            logger.debug(f"Copying directory: {source_path} -> {dest_path}")
+            copy_static(source_path, dest_path) 
+
+def copy_file(source_path: str, dest_path: str, link: bool) -> str:
+    """Copy one file into place, preferring a hardlink, then an in-kernel copy.
+
+    The file is written next to dest_path and renamed over it, so readers never
+    see a half-copied file. The source's mtime is preserved so the next sync
+    can tell the copy is current from its stat alone.
+
+    Returns:
+        str: "linked" or "copied"
+    """
+    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    tmp_path = f"{dest_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        if link and os.stat(source_path).st_dev == os.stat(os.path.dirname(dest_path)).st_dev:
+            try:
+                os.link(source_path, tmp_path)
+                os.replace(tmp_path, dest_path)
+                return "linked"
+            except OSError:
+                pass
+        with open(source_path, "rb") as src, open(tmp_path, "wb") as dst:
+            try:
+                # copy_file_range can share extents (reflink) on filesystems that support it
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            except (AttributeError, OSError):
+                src.seek(0)
+                dst.seek(0)
+                dst.truncate()
+                shutil.copyfileobj(src, dst)
+        shutil.copystat(source_path, tmp_path)
+        os.replace(tmp_path, dest_path)
+        return "copied"
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+def _is_current(source_path: str, dest_path: str, compare_hash: bool) -> bool:
+    """Check whether dest_path already holds the contents of source_path.
+
+    A hardlinked copy always does, since it is the same file, so whether the
+    source changed since it was linked has to be told from the manifest.
+    """
+    try:
+        dest_stat = os.stat(dest_path)
+    except FileNotFoundError:
+        return False
+    source_stat = os.stat(source_path)
+    if os.path.samestat(source_stat, dest_stat):
+        return True
+    if source_stat.st_size != dest_stat.st_size:
+        return False
+    if source_stat.st_mtime_ns == dest_stat.st_mtime_ns:
+        return True
+    if compare_hash and hash_file(source_path) == hash_file(dest_path):
+        # Same bytes with a different mtime, e.g. after a fresh checkout
+        shutil.copystat(source_path, dest_path)
+        return True
+    return False
+
+def _compare_record(source_path: str, previous, compare_hash: bool) -> tuple:
+    """Check a source against what the manifest recorded for it.
+
+    Returns:
+        tuple: (whether the source is unchanged, its [size, mtime], its hash if
+            known). With compare_hash, the hash of a source whose stats differ
+            from its record is taken and compared instead.
+    """
+    st = os.stat(source_path)
+    stamp = [st.st_size, st.st_mtime_ns]
+    if previous is None:
+        return False, stamp, hash_file(source_path) if compare_hash else None
+    if previous.get("stamp") == stamp:
+        return True, stamp, previous.get("hash")
+    if not compare_hash:
+        return False, stamp, None
+    content_hash = hash_file(source_path)
+    return content_hash == previous.get("hash"), stamp, content_hash
+
+def fingerprint_path(rel_path: str, content_hash: str, length: int = 8) -> str:
+    """Insert a content hash into a file name, e.g. css/main.css -> css/main.3f9a1c2e.css."""
+    head, name = os.path.split(rel_path)
+    stem, extension = os.path.splitext(name)
+    return os.path.join(head, f"{stem}.{content_hash[:length]}{extension}").replace(os.sep, "/")
+
+def fingerprint_assets(source_dir: str, workers: int = 8, hashes: dict = None) -> dict:
+    """Name the stylesheets, scripts, images and fonts under source_dir after their contents.
+
+    A fingerprinted name changes whenever the file's contents change, so it
+    can be served with a long-lived, immutable cache lifetime. Only files with
+    one of the FINGERPRINT_EXTENSIONS get one; sync_static copies them under
+    their own name too, for url() references in stylesheets, source map
+    comments and relative links, which are not rewritten.
+    Every asset is hashed, sharded builds included, so links to assets of
+    other shards are rewritten the same way.
+
+    Args:
+        source_dir (str): The static directory
+        workers (int): Number of hashing threads
+        hashes (dict, optional): Hashes kept from an earlier call, updated in
+            place. Files whose size and mtime match their entry are not read
+            again.
+
+    Returns:
+        dict: Path relative to source_dir to its fingerprinted path
+    """
+    rel_paths = []
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for file in sorted(files):
+            if os.path.splitext(file)[1].lower() in FINGERPRINT_EXTENSIONS:
+                rel_paths.append(os.path.relpath(os.path.join(root, file), source_dir).replace(os.sep, "/"))
+    if hashes is None:
+        hashes = {}
+    stats = {}
+    for rel_path in rel_paths:
+        st = os.stat(os.path.join(source_dir, rel_path))
+        stats[rel_path] = (st.st_size, st.st_mtime_ns)
+    stale = [rel_path for rel_path in rel_paths
+             if rel_path not in hashes or hashes[rel_path][:2] != stats[rel_path]]
+    paths = [os.path.join(source_dir, rel_path) for rel_path in stale]
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        for rel_path, content_hash in zip(stale, executor.map(hash_file, paths)):
+            hashes[rel_path] = (*stats[rel_path], content_hash)
+    for rel_path in set(hashes) - set(stats):
+        del hashes[rel_path]
+    return {rel_path: fingerprint_path(rel_path, hashes[rel_path][2]) for rel_path in rel_paths}
+
+def write_asset_manifest(dest_dir: str, assets: dict) -> list:
+    """Publish the asset map as asset-manifest.json, or remove it when there is none.
+
+    Returns:
+        list: [ASSET_MANIFEST_NAME] if the file was written or removed, else []
+    """
+    path = os.path.join(dest_dir, ASSET_MANIFEST_NAME)
+    if assets:
+        data = json.dumps(assets, indent=1, sort_keys=True).encode("utf-8")
+        return [ASSET_MANIFEST_NAME] if write_if_changed(path, data) else []
+    if os.path.exists(path):
+        remove_output(dest_dir, ASSET_MANIFEST_NAME)
+        return [ASSET_MANIFEST_NAME]
+    return []
+
+def sync_static(source_dir: str, dest_dir: str, manifest=None, compare_hash: bool = False,
+                link: bool = True, workers: int = 8, shard=None, assets=None) -> list:
+    """Bring dest_dir up to date with source_dir without wiping it.
+
+    With a manifest, a file is considered unchanged when its size and mtime
+    are the ones the manifest recorded for it and its copy is current. The
+    record is what catches in-place edits of a hardlinked file, whose copy
+    is the edited file itself. Without one, a file is considered unchanged
+    when its copy has the same size and mtime. With compare_hash, files whose
+    stats differ are hashed as well and only copied when their contents
+    differ. Changed files are hardlinked when both trees share a filesystem
+    and copied on a thread pool otherwise.
+
+    Args:
+        source_dir (str): Source directory path
+        dest_dir (str): Destination directory path
+        manifest (BuildManifest, optional): Manifest of the previous build. Files it
+            records that no longer exist in source_dir are removed from dest_dir.
+            It is updated in place.
+        compare_hash (bool): Hash files whose size matches but mtime differs
+        link (bool): Hardlink files instead of copying them when possible
+        workers (int): Number of copy threads
+        shard (tuple, optional): (index, count); only sync the files in this shard,
+            see shard.in_shard
+        assets (dict, optional): Also copy files under these fingerprinted paths,
+            see fingerprint_assets. Files keep their own name as well, since
+            references from stylesheets, scripts and relative URLs are not
+            rewritten. The copy made under a file's previous fingerprinted
+            name is removed.
+
+    Returns:
+        list: Paths, relative to dest_dir, of the files that were copied or removed
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    assets = assets or {}
+    seen = set()
+    pending = []
+    renamed = []
+
+    for root, dirs, files in os.walk(source_dir):
+        dirs.sort()
+        for file in sorted(files):
+            source_path = os.path.join(root, file)
+            rel_path = os.path.relpath(source_path, source_dir).replace(os.sep, "/")
+            if not in_shard(rel_path, shard):
+                continue
+            seen.add(rel_path)
+            output = assets.get(rel_path, rel_path)
+            # A fingerprinted file is also kept under its own name, for the
+            # references to it that are not rewritten
+            outputs = [rel_path] if output == rel_path else [rel_path, output]
+            unchanged = True
+            if manifest is not None:
+                previous = manifest.static.get(rel_path)
+                if previous is not None and previous["output"] not in outputs:
+                    renamed.append(previous["output"])
+                unchanged, source_stamp, content_hash = _compare_record(source_path, previous, compare_hash)
+                manifest.record_static(rel_path, output, source_stamp, content_hash)
+            for copy_path in outputs:
+                if not unchanged or not _is_current(source_path, os.path.join(dest_dir, copy_path), compare_hash):
+                    pending.append((rel_path, copy_path))
+
+    def copy(paths):
+        rel_path, output = paths
+        source_path = os.path.join(source_dir, rel_path)
+        dest_path = os.path.join(dest_dir, output)
+        how = copy_file(source_path, dest_path, link)
+        logger.debug(f"{how.capitalize()} file: {source_path} -> {dest_path}")
+        return how
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = list(executor.map(copy, pending))
+
+    removed = []
+    if manifest is not None:
+        for output in renamed + manifest.prune_static(seen):
+            logger.debug(f"Removing stale file: {os.path.join(dest_dir, output)}")
+            remove_output(dest_dir, output)
+            removed.append(output)
+
+    logger.info(
+        f"Static sync: {results.count('linked')} linked, {results.count('copied')} copied, "
+        f"{len(seen - {rel_path for rel_path, output in pending})} unchanged, {len(removed)} removed"
+    )
+    return [output for rel_path, output in pending] + removed
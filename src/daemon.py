@@ -0,0 +1,199 @@
+import os
+import sys
+import json
+import signal
+import logging
+import socket
+import argparse
+import traceback
+import socketserver
+from contextlib import redirect_stderr, redirect_stdout
+from block_cache import BlockCache, DiskBlockCache
+from client import socket_path
+from main import build, parse_args
+from manifest import BuildManifest
+from search_index import SearchIndex, SEARCH_DIR
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (st.st_size, st.st_mtime_ns)
+
+def _dir_stamp(directory):
+    try:
+        files = sorted(os.listdir(directory))
+    except FileNotFoundError:
+        return None
+    return tuple((file, _file_stamp(os.path.join(directory, file))) for file in files)
+
+class WarmState():
+    """What the build daemon keeps in memory from one build to the next.
+
+    Manifests, with their dependency graph and asset map, and search indexes
+    are reused only while the files they were last saved to are untouched, so
+    a cold build run in between is picked up. The static files' hashes, the
+    rendered blocks and, through template.load_template, the compiled
+    templates are kept for as long as the daemon runs.
+    """
+
+    def __init__(self):
+        self.asset_hashes = {} # see copy_static.fingerprint_assets
+        self._manifests = {}   # manifest path -> (BuildManifest, file stamp after saving)
+        self._searches = {}    # docs directory -> (SearchIndex, directory stamp after writing)
+        self._caches = {}      # --block-cache path or None -> BlockCache
+
+    def load_manifest(self, path):
+        """Return the manifest at path as the last build left it."""
+        cached = self._manifests.get(path)
+        if cached is not None and cached[1] == _file_stamp(path):
+            return cached[0]
+        return BuildManifest.load(path)
+
+    def remember_manifest(self, manifest):
+        """Keep a manifest that was just saved for the next build."""
+        self._manifests[manifest.path] = (manifest, _file_stamp(manifest.path))
+
+    def load_search(self, dest_dir):
+        """Return the search index of a site as the last build left it."""
+        cached = self._searches.get(dest_dir)
+        if cached is not None and cached[1] == _dir_stamp(os.path.join(dest_dir, SEARCH_DIR)):
+            return cached[0]
+        return SearchIndex.load(dest_dir)
+
+    def remember_search(self, dest_dir, search):
+        """Keep a search index that was just written for the next build."""
+        self._searches[dest_dir] = (search, _dir_stamp(os.path.join(dest_dir, SEARCH_DIR)))
+
+    def block_cache(self, path=None):
+        """Return the block cache for --block-cache path, loading it on first use."""
+        cache = self._caches.get(path)
+        if cache is None:
+            cache = DiskBlockCache(path) if path else BlockCache(maxsize=65536)
+            self._caches[path] = cache
+        return cache
+
+class _ClientOutput():
+    """Text stream that forwards everything written to it to the client.
+
+    A client that goes away does not stop the build, its output is dropped.
+    """
+
+    def __init__(self, wfile):
+        self._wfile = wfile
+
+    def write(self, text):
+        if self._wfile is not None and text:
+            try:
+                _send(self._wfile, {"output": text})
+            except OSError:
+                self._wfile = None
+        return len(text)
+
+    def flush(self):
+        pass
+
+def _send(wfile, message):
+    wfile.write(json.dumps(message).encode("utf-8") + b"\n")
+    wfile.flush()
+
+class BuildRequestHandler(socketserver.StreamRequestHandler):
+    """Runs one build per connection.
+
+    The client sends a single JSON line, {"argv": [...], "cwd": "..."}, with
+    the same options main.py takes. While the build runs, its output is sent
+    back as {"output": text} lines, followed by {"status": exit status}.
+    """
+
+    def handle(self):
+        line = self.rfile.readline()
+        if not line:
+            # A probe checking whether the daemon is up
+            return
+        request = json.loads(line)
+        status = self.server.run_build(request["argv"], request["cwd"], _ClientOutput(self.wfile))
+        try:
+            _send(self.wfile, {"status": status})
+        except OSError:
+            pass
+
+class BuildDaemon(socketserver.UnixStreamServer):
+    """Serves builds of one project over a Unix socket, one at a time, from warm state."""
+
+    def __init__(self, path, root_dir):
+        super().__init__(path, BuildRequestHandler)
+        self.root_dir = root_dir
+        self.state = WarmState()
+
+    def run_build(self, argv, cwd, out):
+        """Build with the given options, as main.py would from cwd.
+
+        Log records go to out for the length of the build, at the INFO level
+        copy_static configures for a cold build, in place of the root logger's
+        handlers, which write to the daemon's own stderr.
+
+        Returns:
+            int: The exit status main.py would have had
+        """
+        previous = os.getcwd()
+        root_logger = logging.getLogger()
+        handlers, level = root_logger.handlers, root_logger.level
+        handler = logging.StreamHandler(out)
+        handler.setFormatter(logging.Formatter(logging.BASIC_FORMAT))
+        root_logger.handlers = [handler]
+        root_logger.setLevel(logging.INFO)
+        try:
+            with redirect_stdout(out), redirect_stderr(out):
+                try:
+                    # Paths given as options are relative to the client's directory
+                    os.chdir(cwd)
+                    build(parse_args(argv), self.root_dir, self.state)
+                    return 0
+                except SystemExit as e:
+                    return e.code if isinstance(e.code, int) else (0 if e.code is None else 1)
+                except Exception:
+                    traceback.print_exc()
+                    return 1
+        finally:
+            root_logger.handlers = handlers
+            root_logger.setLevel(level)
+            os.chdir(previous)
+
+def _is_listening(path):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        try:
+            sock.connect(path)
+        except OSError:
+            return False
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Keep a warm build process serving builds over a Unix socket.")
+    parser.add_argument("--socket", metavar="PATH",
+                        help="Socket to listen on (default .build-daemon.sock in the project directory)")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    path = args.socket or socket_path(root_dir)
+    if _is_listening(path):
+        print(f"A build daemon is already listening on {path}", file=sys.stderr)
+        return 1
+    if os.path.exists(path):
+        # Left behind by a daemon that did not shut down cleanly
+        os.remove(path)
+    server = BuildDaemon(path, root_dir)
+    # Shut down cleanly when stopped by a service manager or kill, too
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    print(f"Build daemon listening on {path}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        os.remove(path)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,76 @@
+import posixpath
+from urllib.parse import urlsplit
+
+# Link targets with these extensions are pages, anything else is an asset
+_PAGE_EXTENSIONS = ("", ".html", ".md")
+
+def site_path(url, source_key):
+    """Resolve a URL found in a page to a path relative to the site root.
+
+    Args:
+        url (str): The href or src as written in the markdown
+        source_key (str): The page's markdown path relative to the content directory
+
+    Returns:
+        str: Site path without a leading slash ("" for the root), or None if the
+            URL points outside the site or only to a fragment
+    """
+    parts = urlsplit(url)
+    if parts.scheme or parts.netloc or not parts.path:
+        return None
+    path = parts.path
+    if not path.startswith("/"):
+        path = posixpath.join("/" + posixpath.dirname(source_key), path)
+    return posixpath.normpath(path).lstrip("/")
+
+def resolve_page(path, pages):
+    """Find the markdown source a site path is served from.
+
+    Args:
+        path (str): Site path, see site_path
+        pages (set): Markdown paths of every page, relative to the content directory
+
+    Returns:
+        str: The matching markdown path, or None if no page serves that path
+    """
+    stem, extension = posixpath.splitext(path)
+    if extension == ".html" or extension == ".md":
+        candidates = [stem + ".md"]
+    elif path == "":
+        candidates = ["index.md"]
+    else:
+        candidates = [path + ".md", path + "/index.md"]
+    for candidate in candidates:
+        if candidate in pages:
+            return candidate
+    return None
+
+def page_dependencies(links, images, source_key, pages):
+    """Build the dependency entry of one page.
+
+    Args:
+        links (list): URLs of the page's links, as written, see markdown_parser.PageFacts
+        images (list): URLs of the page's images, as written
+        source_key (str): The page's markdown path relative to the content directory
+        pages (set): Markdown paths of every page in this build
+
+    Returns:
+        dict: {"links": {site path: markdown path or None}, "assets": [site paths]}.
+            Links remember what they resolved to, so a page can be rebuilt when a
+            page it links to appears or disappears.
+    """
+    linked = {}
+    assets = []
+    for url in links:
+        path = site_path(url, source_key)
+        if path is None:
+            continue
+        if posixpath.splitext(path)[1] in _PAGE_EXTENSIONS:
+            linked[path] = resolve_page(path, pages)
+        elif path not in assets:
+            assets.append(path)
+    for url in images:
+        path = site_path(url, source_key)
+        if path is not None and path not in assets:
+            assets.append(path)
+    return {"links": linked, "assets": assets}
@@ -1,5 +1,5 @@
 import os
-from markdown_parser import markdown_to_html_node, extract_title
+from markdown_parser import markdown_to_html_node, extract_heading_title
 
 def generate_page(from_path, template_path, dest_path):
     """Generate an HTML page from a markdown file using a template.
@@ -24,7 +24,7 @@ def generate_page(from_path, template_path, dest_path):
     html_content = html_node.to_html()
     
     # Extract title from markdown
-    title = extract_title(markdown)
+    title = extract_heading_title(markdown)
     
     # Replace placeholders in template
     html_page = template.replace("{{ Title }}", title)
@@ -1,20 +1,65 @@
+import sys
+
+# Prop names are shared between nodes: every link leaf points at the same
+# ("href",) tuple instead of carrying a dict of its own
+_PROP_KEYS = {}
+
+def intern_prop_keys(keys):
+    keys = tuple(sys.intern(key) for key in keys)
+    return _PROP_KEYS.setdefault(keys, keys)
+
 class HTMLNode():
+    # slots keep nodes small; props are stored as a shared tuple of names
+    # and a tuple of values, and turned into a dict only when read
+    __slots__ = ('tag', 'value', 'children', '_prop_keys', '_prop_values', '_props')
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         self.tag = tag           # string tag, like p, a, h1
         self.value = value       # string value, text inside a paragraph
         self.children = children # list of HTMLNode objects
-        self.props = props       # don't know if i should use .copy() here
+        self.props = props       # dict of attributes, copied into tuples
+
+    @property
+    def props(self):
+        # built on first read and kept, so changes made to it stick; from
+        # then on it replaces the tuples
+        if self._props is None and self._prop_keys is not None:
+            self._props = dict(zip(self._prop_keys, self._prop_values))
+        return self._props
+
+    @props.setter
+    def props(self, props):
+        self._props = None
+        if props is None:
+            self._prop_keys = None
+            self._prop_values = None
+        else:
+            self._prop_keys = intern_prop_keys(props.keys())
+            self._prop_values = tuple(props.values())
+
+    def _set_props(self, keys, values):
+        # fast path for callers that already hold interned keys
+        self._props = None
+        self._prop_keys = keys
+        self._prop_values = values
 
     def to_html(self):
         raise NotImplementedError()
 
+    def iter_html(self):
+        # yield the html in chunks; subclasses with children override this
+        yield self.to_html()
+
+    def write_html(self, fp):
+        for chunk in self.iter_html():
+            fp.write(chunk)
+
     def props_to_html(self):
-        if not self.props:
+        if self._props is not None:
+            return ''.join(f' {key}="{value}"' for key, value in self._props.items())
+        if not self._prop_keys:
             return ''
-        res = ''
-        for prop in self.props:
-            res += f' {prop}="{self.props[prop]}"'
-        return res
+        return ''.join(f' {key}="{value}"' for key, value in zip(self._prop_keys, self._prop_values))
 
     def __repr__(self):
         return f'HTMLNode: tag={self.tag}, value={self.value}, children={self.children}, props={self.props}'
@@ -26,5 +71,10 @@ class HTMLNode():
             self.tag == other.tag and
             self.value == other.value and
             self.children == other.children and
-            self.props == other.props
+            self._props_equal(other)
         )
+
+    def _props_equal(self, other):
+        if self._prop_keys is other._prop_keys and self._props is None and other._props is None:
+            return self._prop_values == other._prop_values
+        return self.props == other.props # same attributes in another order
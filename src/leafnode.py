@@ -1,6 +1,8 @@
 from htmlnode import HTMLNode
 
 class LeafNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         super().__init__(tag, value, children, props)
 
@@ -10,7 +12,7 @@ class LeafNode(HTMLNode):
         elif self.tag == None:
             return self.value
         
-        if self.props == None:
+        if self._prop_keys == None:
             return f'<{self.tag}>{self.value}</{self.tag}>'
 
         return f'<{self.tag}{self.props_to_html()}>{self.value}</{self.tag}>'
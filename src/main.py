@@ -1,27 +1,213 @@
 import os
 import sys
-import shutil
-from copy_static import copy_static
+import argparse
+from contextlib import nullcontext
+from copy_static import fingerprint_assets, sync_static, write_asset_manifest
 from page_generator import generate_pages_recursive
+from manifest import BuildManifest, MANIFEST_NAME, remove_output
+from block_cache import BlockCache, DiskBlockCache
+from profiler import BuildProfile, format_report
+from compress import compress_outputs, remove_compressed
+from shard import parse_shard, shard_dir
+from search_index import SearchIndex
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(description="Build the static site.")
+    parser.add_argument("basepath", nargs="?", default="/",
+                        help='Base path for all URLs in the generated HTML (default "/")')
+    parser.add_argument("--incremental", action="store_true",
+                        help="Only rebuild pages and copy assets that changed since the last build")
+    parser.add_argument("--hash-static", action="store_true",
+                        help="Compare static files by content when their mtimes differ")
+    parser.add_argument("--no-hardlinks", action="store_true",
+                        help="Always copy static files instead of hardlinking them")
+    parser.add_argument("-j", "--jobs", type=int, default=1,
+                        help="Number of worker processes used to render pages (default 1)")
+    parser.add_argument("--io-workers", type=int, default=4, metavar="N",
+                        help="With one job, threads reading sources ahead and writing pages behind "
+                             "rendering (default 4, 0 to do everything in turn)")
+    parser.add_argument("--block-cache", metavar="PATH",
+                        help="Keep rendered blocks in this file so later builds can reuse them")
+    parser.add_argument("--direct", action="store_true",
+                        help="Render markdown straight to HTML without building node trees")
+    parser.add_argument("--compress", action="store_true",
+                        help="Write .gz (and .zst if zstandard is installed) siblings of HTML, CSS and JS files")
+    parser.add_argument("--compress-min-size", type=int, default=1024, metavar="BYTES",
+                        help="With --compress, leave files smaller than this uncompressed (default 1024)")
+    parser.add_argument("--fingerprint", action="store_true",
+                        help="Copy static files under content-hashed names and point links at them")
+    parser.add_argument("--relative-links", action="store_true",
+                        help="Make absolute links relative to each page instead of prefixing them with basepath")
+    parser.add_argument("--search-index", action="store_true",
+                        help="Write a prefix-sharded search index of every page to docs/search")
+    parser.add_argument("--changed-files", metavar="PATH",
+                        help="Write the docs paths this build wrote or removed to PATH, one per line")
+    parser.add_argument("--shard", metavar="I/N", type=shard_spec,
+                        help="Build only the I-th of N slices of the site into docs-shards/I-of-N; "
+                             "combine the slices with the merge command")
+    parser.add_argument("--explain", metavar="PATH",
+                        help="With --incremental, print why the page at PATH (its markdown or HTML) was rebuilt")
+    parser.add_argument("-v", "--verbose", action="store_true",
+                        help="Print the number of changed files and block cache statistics at the end of the build")
+    parser.add_argument("--profile", metavar="PATH",
+                        help="Time every build stage and write a JSON report to PATH")
+    parser.add_argument("--profile-top", type=int, default=10, metavar="N",
+                        help="Number of slowest pages to list in the profile (default 10)")
+    parser.add_argument("--profile-pstats", metavar="PATH",
+                        help="With --profile, also dump cProfile stats of markdown_to_html_node to PATH")
+    args = parser.parse_args(argv)
+    if args.explain and not args.incremental:
+        # A full build rebuilds every page without comparing it to the last build
+        parser.error("--explain requires --incremental")
+    return args
+
+def shard_spec(text):
+    try:
+        return parse_shard(text)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+def explain_key(path, content_dir, docs_dir):
+    """Map a markdown or HTML path given on the command line to its manifest key."""
+    abspath = os.path.abspath(path)
+    if abspath.startswith(docs_dir + os.sep):
+        return os.path.splitext(os.path.relpath(abspath, docs_dir))[0].replace(os.sep, "/") + ".md"
+    if abspath.startswith(content_dir + os.sep):
+        return os.path.relpath(abspath, content_dir).replace(os.sep, "/")
+    return path.replace(os.sep, "/")
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+
+    # "serve" starts the live-reload dev server instead of building
+    if argv and argv[0] == "serve":
+        from serve import main as serve_main
+        return serve_main(argv[1:])
+
+    # "merge" combines the outputs of --shard builds
+    if argv and argv[0] == "merge":
+        from merge import main as merge_main
+        return merge_main(argv[1:])
+
+    # "daemon" keeps a warm build process listening for builds, see client.py
+    if argv and argv[0] == "daemon":
+        from daemon import main as daemon_main
+        return daemon_main(argv[1:])
 
-def main():
     # Get the project root directory
-    root_dir = os.path.dirname(os.path.dirname(__file__))
-    
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    return build(parse_args(argv), root_dir)
+
+def build(args, root_dir, state=None):
+    """Build the site once.
+
+    Args:
+        args (argparse.Namespace): Build options, see parse_args
+        root_dir (str): The project directory holding content/, static/ and the template
+        state (WarmState, optional): State kept between builds by the build daemon.
+            Without it everything is loaded from disk.
+    """
     # Get basepath from CLI args or default to "/"
-    basepath = sys.argv[1] if len(sys.argv) > 1 else "/"
-    
+    basepath = args.basepath
+
     # Define paths
     static_dir = os.path.join(root_dir, "static")
     docs_dir = os.path.join(root_dir, "docs")
     content_dir = os.path.join(root_dir, "content")
     template_path = os.path.join(root_dir, "template.html")
-    
-    # Copy static files to docs directory
-    copy_static(static_dir, docs_dir)
-    
+    if args.shard:
+        docs_dir = shard_dir(docs_dir, args.shard)
+
+    profile = BuildProfile(args.profile_pstats) if args.profile else None
+    static_stage = profile.stage("static_copy") if profile else nullcontext()
+
+    manifest_path = os.path.join(docs_dir, MANIFEST_NAME)
+    previous = state.load_manifest(manifest_path) if state is not None else BuildManifest.load(manifest_path)
+    if args.incremental:
+        # Take the record of the previous build and only redo what changed
+        manifest = previous
+    else:
+        # Rebuild every page, but record it all so stale files can be swept
+        # afterwards instead of wiping docs/ and rewriting unchanged files.
+        # Static files and compressed siblings are checked against their
+        # records, so keep those; sync_static drops the static files gone since.
+        manifest = BuildManifest(manifest_path, static=previous.static, compressed=previous.compressed)
+
+    with static_stage:
+        if args.fingerprint:
+            assets = fingerprint_assets(static_dir, hashes=state.asset_hashes if state is not None else None)
+        else:
+            assets = {}
+        renamed_assets = manifest.record_assets(assets)
+        changed_files = sync_static(static_dir, docs_dir, manifest, compare_hash=args.hash_static,
+                                    link=not args.no_hardlinks, shard=args.shard, assets=assets)
+        changed_assets = set(changed_files) | set(renamed_assets)
+        changed_files.extend(write_asset_manifest(docs_dir, assets))
+
+    # An incremental build only re-indexes the pages it rebuilds
+    if args.search_index and args.incremental:
+        search = state.load_search(docs_dir) if state is not None else SearchIndex.load(docs_dir)
+    elif args.search_index:
+        search = SearchIndex()
+    else:
+        search = None
+
+    # Repeated blocks are rendered once per build, or once ever with --block-cache.
+    # The daemon keeps them for as long as it runs.
+    if state is not None:
+        cache = state.block_cache(args.block_cache)
+    else:
+        cache = DiskBlockCache(args.block_cache) if args.block_cache else BlockCache()
+    hits, misses = cache.hits, cache.misses
+
     # Generate all pages recursively
-    generate_pages_recursive(content_dir, template_path, docs_dir, basepath)
+    try:
+        rebuilt = generate_pages_recursive(content_dir, template_path, docs_dir, basepath,
+                                           manifest=manifest, jobs=args.jobs, cache=cache,
+                                           profile=profile, direct=args.direct,
+                                           changed_assets=changed_assets, io_workers=args.io_workers,
+                                           changed_files=changed_files, shard=args.shard, assets=assets,
+                                           search=search, relative_links=args.relative_links,
+                                           rebuild_all=not args.incremental)
+        if search is not None:
+            changed_files.extend(search.write(docs_dir))
+            if state is not None:
+                state.remember_search(docs_dir, search)
+        for output in manifest.record_search(search.outputs() if search is not None else []):
+            remove_output(docs_dir, output)
+            changed_files.append(output)
+        if not args.incremental:
+            changed_files.extend(manifest.remove_unrecorded(docs_dir))
+        if args.compress:
+            with profile.stage("compress") if profile else nullcontext():
+                changed_files.extend(compress_outputs(docs_dir, manifest, min_size=args.compress_min_size))
+        else:
+            changed_files.extend(remove_compressed(docs_dir, manifest))
+        if args.explain:
+            key = explain_key(args.explain, content_dir, docs_dir)
+            if key in rebuilt:
+                print(f"{key} was rebuilt: {'; '.join(rebuilt[key])}")
+            elif key in manifest.pages:
+                print(f"{key} is up to date")
+            else:
+                print(f"{key} is not a page of this site")
+    finally:
+        # Keep the record of the pages that did build, even if some failed
+        manifest.save()
+        if state is not None:
+            state.remember_manifest(manifest)
+        if args.changed_files:
+            with open(args.changed_files, "w") as f:
+                f.writelines(f"{path}\n" for path in sorted(set(changed_files)))
+        if args.verbose or args.changed_files:
+            print(f"Changed files: {len(set(changed_files))}")
+        if args.block_cache:
+            cache.save()
+        if args.verbose or profile is not None:
+            print(f"Block cache: {cache.hits - hits} hits, {cache.misses - misses} misses")
+        if profile is not None:
+            report = profile.write(args.profile, top=args.profile_top)
+            print(format_report(report))
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())
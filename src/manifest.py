@@ -0,0 +1,276 @@
+import os
+import json
+import hashlib
+from dependencies import resolve_page
+
+MANIFEST_NAME = ".build-manifest.json"
+MANIFEST_VERSION = 4
+
+# Published next to the site when assets are fingerprinted, see copy_static.write_asset_manifest
+ASSET_MANIFEST_NAME = "asset-manifest.json"
+
+def hash_bytes(data):
+    """Return the hex sha256 digest of a bytes object."""
+    return hashlib.sha256(data).hexdigest()
+
+def hash_file(path):
+    """Return the hex sha256 digest of a file's contents.
+
+    Args:
+        path (str): Path to the file to hash
+
+    Returns:
+        str: Hex digest of the file contents
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+def remove_output(dest_dir, rel_path):
+    """Delete a generated file and any directories it leaves empty.
+
+    Args:
+        dest_dir (str): Root of the output tree, never removed itself
+        rel_path (str): Path of the file relative to dest_dir
+    """
+    path = os.path.join(dest_dir, rel_path)
+    if os.path.isfile(path):
+        os.remove(path)
+    parent = os.path.dirname(path)
+    root = os.path.abspath(dest_dir)
+    while os.path.abspath(parent) != root and os.path.isdir(parent) and not os.listdir(parent):
+        os.rmdir(parent)
+        parent = os.path.dirname(parent)
+
+class BuildManifest():
+    """On-disk record of what the last build produced.
+
+    Pages are keyed by their markdown path relative to the content directory,
+    static assets by their path relative to the static directory. Each entry
+    remembers the output it wrote, and pages also the hashes they were built
+    from, so the next build can skip anything that is still current and prune
+    outputs whose sources have disappeared. Static entries remember the size
+    and mtime of their source, and its hash when it was compared by contents,
+    see copy_static.sync_static.
+
+    Page entries also hold the page's edges in the dependency graph: its
+    template, the pages it links to and the assets it references, see
+    dependencies.page_dependencies.
+
+    Compressed entries are keyed by output path and remember the hash each
+    output's precompressed siblings were made from, see compress.compress_outputs.
+
+    Assets maps every static path to its fingerprinted path when the build
+    fingerprints assets, see copy_static.fingerprint_assets, and is empty otherwise.
+    Search lists the files of the search index, see search_index.SearchIndex.
+    """
+
+    def __init__(self, path, pages=None, static=None, compressed=None, assets=None, search=None):
+        self.path = path
+        self.pages = pages if pages is not None else {}
+        self.static = static if static is not None else {}
+        self.compressed = compressed if compressed is not None else {}
+        self.assets = assets if assets is not None else {}
+        self.search = search if search is not None else []
+
+    @classmethod
+    def load(cls, path):
+        """Load a manifest from disk, or return an empty one if there is none.
+
+        Args:
+            path (str): Path of the manifest file
+
+        Returns:
+            BuildManifest: The loaded manifest
+        """
+        if not os.path.exists(path):
+            return cls(path)
+        with open(path, "r") as f:
+            data = json.load(f)
+        if data.get("version") != MANIFEST_VERSION:
+            return cls(path)
+        return cls(path, data.get("pages", {}), data.get("static", {}), data.get("compressed", {}),
+                   data.get("assets", {}), data.get("search", []))
+
+    def save(self):
+        """Write the manifest back to disk."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        data = {
+            "version": MANIFEST_VERSION,
+            "pages": self.pages,
+            "static": self.static,
+            "compressed": self.compressed,
+            "assets": self.assets,
+            "search": self.search,
+        }
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(data, f, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.path)
+
+    def stale_reasons(self, rel_path, source_hash, template_hash, basepath, pages, changed_assets=()):
+        """Explain why a page has to be rebuilt.
+
+        Args:
+            rel_path (str): The page's markdown path relative to the content directory
+            source_hash (str): Hash of the page's markdown
+            template_hash (str): Hash of the template the page uses
+            basepath (str): Basepath of this build
+            pages (set): Markdown paths of every page in this build
+            changed_assets (set): Static paths copied or removed by this build
+
+        Returns:
+            list: Human-readable reasons, empty if the recorded output is current
+        """
+        entry = self.pages.get(rel_path)
+        if entry is None:
+            return ["not built before"]
+        reasons = []
+        if entry["hash"] != source_hash:
+            reasons.append("source changed")
+        if entry["template"] != template_hash:
+            reasons.append(f"template {entry['template_path']} changed" if "template_path" in entry
+                           else "template changed")
+        if entry["basepath"] != basepath:
+            reasons.append(f"basepath changed from {entry['basepath']} to {basepath}")
+        for path, target in entry.get("links", {}).items():
+            current = resolve_page(path, pages)
+            if current != target:
+                if current is None:
+                    reasons.append(f"linked page {target} was removed")
+                else:
+                    reasons.append(f"linked page {current} was added")
+        for path in entry.get("assets", []):
+            if path in changed_assets:
+                reasons.append(f"asset {path} changed")
+        return reasons
+
+    def record_page(self, rel_path, source_hash, template_hash, basepath, output,
+                    template_path=None, dependencies=None):
+        """Remember a built page and its dependencies.
+
+        Args:
+            template_path (str, optional): The template the page was built with
+            dependencies (dict, optional): Links and assets, see dependencies.page_dependencies
+        """
+        entry = {
+            "hash": source_hash,
+            "template": template_hash,
+            "basepath": basepath,
+            "output": output,
+        }
+        if template_path is not None:
+            entry["template_path"] = template_path
+        if dependencies is not None:
+            entry["links"] = dependencies["links"]
+            entry["assets"] = dependencies["assets"]
+        self.pages[rel_path] = entry
+
+    def record_static(self, rel_path, output, stamp=None, content_hash=None):
+        """Remember a static asset's output, and the [size, mtime] and hash of
+        its source when known, see copy_static.sync_static."""
+        entry = {"output": output}
+        if stamp is not None:
+            entry["stamp"] = stamp
+        if content_hash is not None:
+            entry["hash"] = content_hash
+        self.static[rel_path] = entry
+
+    def record_compressed(self, rel_path, content_hash, outputs):
+        self.compressed[rel_path] = {"hash": content_hash, "outputs": outputs}
+
+    def record_assets(self, assets):
+        """Replace the asset map, see copy_static.fingerprint_assets.
+
+        Args:
+            assets (dict): Static path to fingerprinted path, empty when the
+                build does not fingerprint assets
+
+        Returns:
+            list: Static paths whose URL changed since the recorded map, so
+                pages referencing them can be rebuilt
+        """
+        changed = sorted(path for path in set(self.assets) | set(assets)
+                         if self.assets.get(path, path) != assets.get(path, path))
+        self.assets = dict(assets)
+        return changed
+
+    def record_search(self, outputs):
+        """Replace the list of search index files.
+
+        Returns:
+            list: Previously recorded files that are no longer listed
+        """
+        stale = sorted(set(self.search) - set(outputs))
+        self.search = sorted(outputs)
+        return stale
+
+    def prune_pages(self, seen):
+        """Forget pages whose sources were not seen in this build.
+
+        Args:
+            seen (set): Relative paths of every page source found this build
+
+        Returns:
+            list: Output paths of the removed entries
+        """
+        return self._prune(self.pages, seen)
+
+    def prune_static(self, seen):
+        """Forget static assets whose sources were not seen in this build.
+
+        Returns:
+            list: Output paths of the removed entries, with the copy under the
+                asset's own name next to a fingerprinted one
+        """
+        outputs = []
+        for rel_path in sorted(rel_path for rel_path in self.static if rel_path not in seen):
+            output = self.static.pop(rel_path)["output"]
+            outputs.extend([output] if output == rel_path else [output, rel_path])
+        return outputs
+
+    def prune_compressed(self, seen):
+        """Forget compressed outputs whose originals were not seen in this build.
+
+        Returns:
+            list: The lists of sibling paths of the removed entries
+        """
+        stale = [rel_path for rel_path in self.compressed if rel_path not in seen]
+        return [self.compressed.pop(rel_path)["outputs"] for rel_path in sorted(stale)]
+
+    def remove_unrecorded(self, dest_dir):
+        """Delete every file under dest_dir that this manifest did not produce.
+
+        A full build records everything it writes into a fresh manifest and then
+        calls this, instead of wiping dest_dir up front, so unchanged files keep
+        their mtimes.
+
+        Returns:
+            list: Paths, relative to dest_dir, of the removed files
+        """
+        recorded = {entry["output"] for entry in self.pages.values()}
+        recorded.update(entry["output"] for entry in self.static.values())
+        # Fingerprinted assets are kept under their own name too
+        recorded.update(self.static)
+        for entry in self.compressed.values():
+            recorded.update(entry["outputs"])
+        recorded.add(os.path.relpath(self.path, dest_dir).replace(os.sep, "/"))
+        if self.assets:
+            recorded.add(ASSET_MANIFEST_NAME)
+        recorded.update(self.search)
+        removed = []
+        for root, dirs, files in os.walk(dest_dir):
+            dirs.sort()
+            for file in sorted(files):
+                rel_path = os.path.relpath(os.path.join(root, file), dest_dir).replace(os.sep, "/")
+                if rel_path not in recorded:
+                    removed.append(rel_path)
+        for rel_path in removed:
+            remove_output(dest_dir, rel_path)
+        return removed
+
+    def _prune(self, entries, seen):
+        stale = [rel_path for rel_path in entries if rel_path not in seen]
+        return [entries.pop(rel_path)["output"] for rel_path in sorted(stale)]
@@ -4,6 +4,9 @@ from enum import Enum
 from parentnode import ParentNode
 from leafnode import LeafNode
 from text_to_html import text_node_to_html_node
+from profiler import NULL_TIMINGS
+from search_index import PageText
+from urls import html_urls
 
 class BlockType(Enum):
     PARAGRAPH = "paragraph"
@@ -13,6 +16,29 @@ class BlockType(Enum):
     UNORDERED_LIST = "unordered_list"
     ORDERED_LIST = "ordered_list"
 
+_INLINE_DELIMITERS = {
+    "**": TextType.BOLD,
+    "_": TextType.ITALIC,
+    "`": TextType.CODE,
+}
+_INLINE_OPENER = re.compile(r"\*\*|_|`|!\[|\[")
+
+def _find_from(text, token, start, found):
+    """Find the first occurrence of token at or after start, memoizing the last search.
+
+    A previous search for the same token that began at or before start is
+    still valid if it found nothing, or found an index at or after start.
+    Reusing it keeps repeated lookups for unmatched openers linear overall.
+    """
+    cached = found.get(token)
+    if cached is not None:
+        searched_from, index = cached
+        if searched_from <= start and (index == -1 or index >= start):
+            return index
+    index = text.find(token, start)
+    found[token] = (start, index)
+    return index
+
 def extract_markdown_images(text):
     """Extract markdown image syntax from text.
     
@@ -168,26 +194,286 @@ def text_to_textnodes(text):
             TextNode(" word and a ", TextType.TEXT),
             TextNode("code block", TextType.CODE)
         ]
-    """
-    # Start with a single text node
-    nodes = [TextNode(text, TextType.TEXT)]
-    
-    # Split by bold text
-    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
     
-    # Split by italic text
-    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    The text is scanned once from left to right. At each opening marker the
+    matching closer is looked up and the span is emitted as a single node, so
+    the work is linear in the length of the text. Spans do not nest: markers
+    inside a span are kept as literal text, and openers without a closer are
+    left as plain text.
+    """
+    return [TextNode(*span) for span in _scan_inline(text)]
+
+def _scan_inline(text):
+    """Yield the (text, text_type, url) spans of inline markdown, see text_to_textnodes."""
+    pos = 0    # start of the pending run of plain text
+    scan = 0   # where to look for the next opening marker
+    found = {} # token -> (searched from, index found), see _find_from
+    length = len(text)
+    emitted = False
+
+    while True:
+        match = _INLINE_OPENER.search(text, scan)
+        if match is None:
+            break
+        start = match.start()
+        token = match.group()
+
+        if token in _INLINE_DELIMITERS:
+            inner = start + len(token)
+            close = _find_from(text, token, inner, found)
+            if close == -1:
+                scan = inner
+                continue
+            if start > pos:
+                yield text[pos:start], TextType.TEXT, None
+            yield text[inner:close], _INLINE_DELIMITERS[token], None
+            emitted = True
+            pos = scan = close + len(token)
+            if pos == length:
+                # The split pipeline leaves an empty trailing text node here
+                yield "", TextType.TEXT, None
+            continue
+
+        # Image "![alt](url)" or link "[text](url)"
+        label_start = start + len(token)
+        label_end = _find_from(text, "]", label_start, found)
+        if label_end == -1 or not text.startswith("(", label_end + 1):
+            scan = start + 1
+            continue
+        url_end = _find_from(text, ")", label_end + 2, found)
+        if url_end == -1:
+            scan = start + 1
+            continue
+        if start > pos:
+            yield text[pos:start], TextType.TEXT, None
+        text_type = TextType.IMAGE if token == "![" else TextType.LINK
+        yield text[label_start:label_end], text_type, text[label_end + 2:url_end]
+        emitted = True
+        pos = scan = url_end + 1
+
+    if pos < length or not emitted:
+        yield text[pos:], TextType.TEXT, None
+
+_HEADING_START = re.compile(r"#{1,6}\s")
+_UNORDERED_ITEM = re.compile(r"-\s")
+_ORDERED_ITEM = re.compile(r"(\d+)\.\s")
+_NON_SPACE = re.compile(r"\S")
+_BLANK_LINES = re.compile(r"\n(?:[^\S\n]*\n)+")
+_FENCE_LINE = re.compile(r"^[^\S\n]*```(.*)$", re.MULTILINE)
+_LANGUAGE_CHARS = frozenset("abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ")
+
+# The same patterns over UTF-8 bytes, which still hold "\r\n" and "\r" newlines.
+# _SPACE is every character str.isspace() accepts except "\n" and "\r", encoded,
+# so blocks split exactly where they would in the decoded text.
+_NEWLINE = rb"(?:\r\n|\r(?!\n)|\n)"
+_SPACE = rb"(?:[\t\x0b\x0c\x1c-\x1f ]|\xc2[\x85\xa0]|\xe1\x9a\x80|\xe2\x80[\x80-\x8a\xa8\xa9\xaf]|\xe2\x81\x9f|\xe3\x80\x80)"
+_NEWLINE_BYTES = re.compile(_NEWLINE)
+_BLANK_LINES_BYTES = re.compile(_NEWLINE + rb"(?:" + _SPACE + rb"*" + _NEWLINE + rb")+")
+_LEADING_SPACE_BYTES = re.compile(rb"(?:" + _SPACE + rb"|[\r\n])*")
+_FENCE_LINE_BYTES = re.compile(rb"(?:^|(?<=\r))" + _SPACE + rb"*```([^\r\n]*)", re.MULTILINE)
+
+def scan_blocks(markdown):
+    """Yield the blocks of a markdown document as (block_type, start, end) spans.
     
-    # Split by code blocks
-    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    The document is scanned once without copying any text. Blocks are
+    separated by blank lines, except inside ``` fences, so fenced code may
+    contain blank lines. markdown[start:end] is the block with its
+    surrounding whitespace removed.
     
-    # Split by images
-    nodes = split_nodes_image(nodes)
+    Args:
+        markdown (str): Raw markdown text to scan
+        
+    Yields:
+        tuple: (BlockType, start offset, end offset) for each block in order
+    """
+    for block_type, items, start, end in _scan_blocks(markdown):
+        yield block_type, start, end
+
+def _scan_blocks(markdown):
+    """Like scan_blocks, but yield (block_type, items, start, end), see classify_block."""
+    block_start = None
+    in_fence = False
+    pos = 0
+    length = len(markdown)
+    while pos < length:
+        separator = _BLANK_LINES.search(markdown, pos)
+        chunk_end = separator.start() if separator is not None else length
+        if block_start is None:
+            first = _NON_SPACE.search(markdown, pos, chunk_end)
+            if first is not None:
+                block_start = first.start()
+        if block_start is not None and markdown.find("```", pos, chunk_end) != -1:
+            for fence in _FENCE_LINE.finditer(markdown, pos, chunk_end):
+                # A line like ```code``` is inline code, not an opening fence
+                in_fence = not in_fence and "```" not in fence.group(1)
+        if block_start is not None and (not in_fence or separator is None):
+            end = chunk_end
+            while markdown[end - 1].isspace():
+                end -= 1
+            yield (*classify_block(markdown, block_start, end), block_start, end)
+            block_start = None
+        pos = separator.end() if separator is not None else length
+    if block_start is not None:
+        end = length
+        while markdown[end - 1].isspace():
+            end -= 1
+        yield (*classify_block(markdown, block_start, end), block_start, end)
+
+class MappedMarkdown():
+    """A UTF-8 markdown document held in a bytes-like object, such as an mmap.
+
+    Blocks are found by scanning the bytes and decoded one at a time, so the
+    document is never held in memory as a whole string. Newlines are read as
+    in text mode: "\r\n" and "\r" become "\n" within each block.
+    """
+
+    def __init__(self, data, start=0):
+        self.data = data
+        self.start = start
+
+    def first_line(self):
+        """Return the document's first line, decoded, with its newline."""
+        return _decode(self.data[self.start:self._line_end()])
+
+    def skip_line(self):
+        """Return the document without its first line."""
+        return MappedMarkdown(self.data, self._line_end())
+
+    def _line_end(self):
+        newline = _NEWLINE_BYTES.search(self.data, self.start)
+        return len(self.data) if newline is None else newline.end()
+
+    def blocks(self):
+        """Yield the document's blocks like _scan_blocks, as (text, block_type, items, start, end).
+
+        text is the decoded block, so start is 0 and end is len(text).
+        """
+        data = self.data
+        length = len(data)
+        block_start = None
+        in_fence = False
+        pos = self.start
+        while pos < length:
+            separator = _BLANK_LINES_BYTES.search(data, pos)
+            chunk_end = separator.start() if separator is not None else length
+            if block_start is None:
+                first = _LEADING_SPACE_BYTES.match(data, pos, chunk_end).end()
+                if first < chunk_end:
+                    block_start = first
+            if block_start is not None and data.find(b"```", pos, chunk_end) != -1:
+                for fence in _FENCE_LINE_BYTES.finditer(data, pos, chunk_end):
+                    in_fence = not in_fence and b"```" not in fence.group(1)
+            if block_start is not None and (not in_fence or separator is None):
+                yield _decoded_block(data[block_start:chunk_end])
+                block_start = None
+            pos = separator.end() if separator is not None else length
+        if block_start is not None:
+            yield _decoded_block(data[block_start:length])
+
+def _decode(data):
+    return str(data, "utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+def _decoded_block(data):
+    text = _decode(data).rstrip()
+    return (text, *classify_block(text), 0, len(text))
+
+def iter_blocks(markdown):
+    """Yield (text, block_type, items, start, end) for each block of a document.
+
+    Args:
+        markdown (str or MappedMarkdown): The document
+
+    Yields:
+        tuple: text[start:end] is the block and items are offsets into text,
+            see classify_block. For a str, text is the document itself; a
+            MappedMarkdown decodes one block at a time.
+    """
+    if isinstance(markdown, MappedMarkdown):
+        yield from markdown.blocks()
+        return
+    for block_type, items, start, end in _scan_blocks(markdown):
+        yield markdown, block_type, items, start, end
+
+def classify_block(text, start=0, end=None):
+    """Classify the block text[start:end] and locate its inline texts in one pass.
     
-    # Split by links
-    nodes = split_nodes_link(nodes)
+    Lines are checked with precompiled patterns anchored by pos/endpos, or
+    plain character tests, so nothing is sliced out of text.
     
-    return nodes
+    Args:
+        text (str): The document, or a single block
+        start (int): Offset of the block's first character
+        end (int, optional): Offset just past the block's last character
+        
+    Returns:
+        tuple: (BlockType, items). items lists the (start, end) offsets of the
+            block's inline texts: one per list item or quote line with its
+            marker removed, or a single span holding a heading's text, the code
+            inside a fence, or the whole paragraph.
+    """
+    if end is None:
+        end = len(text)
+    first = text[start] if start < end else ""
+    if first == "#" and _HEADING_START.match(text, start, end):
+        level = 1
+        while text[start + level] == "#":
+            level += 1
+        if text[start + level] != " ":
+            return BlockType.HEADING, [(start, end)]
+        return BlockType.HEADING, [(start + level + 1, end)]
+    if first == "`" and text.startswith("```", start, end) and text.endswith("```", start, end):
+        # Drop the opening fence with its language tag and the closing fence
+        body_start = start + 3
+        while body_start < end and text[body_start] in _LANGUAGE_CHARS:
+            body_start += 1
+        if text.startswith("\n", body_start, end):
+            body_start += 1
+        # In a block like ```` the closing fence overlaps the opening one
+        return BlockType.CODE, [(body_start, end - 3 if end - 3 >= body_start else end)]
+    if first != ">" and first != "-" and not first.isdecimal():
+        return BlockType.PARAGRAPH, [(start, end)]
+    quote = first == ">"
+    unordered = first == "-"
+    ordered = not (quote or unordered)
+    items = []
+    number = 1
+    line_start = start
+    while True:
+        line_end = text.find("\n", line_start, end)
+        if line_end == -1:
+            line_end = end
+        if quote:
+            if text.startswith(">", line_start, line_end):
+                body_start = line_start + 1
+                while body_start < line_end and text[body_start].isspace():
+                    body_start += 1
+                items.append((body_start, line_end))
+            else:
+                quote = False
+        elif unordered:
+            if _UNORDERED_ITEM.match(text, line_start, line_end):
+                items.append((line_start + 2, line_end))
+            else:
+                unordered = False
+        else:
+            # Numbers must start at 1 and increment by 1
+            match = _ORDERED_ITEM.match(text, line_start, line_end)
+            if match is not None and int(match.group(1)) == number:
+                dot = match.end(1)
+                items.append((dot + 2 if text[dot + 1] == " " else line_start, line_end))
+                number += 1
+            else:
+                ordered = False
+        if not (quote or unordered or ordered):
+            return BlockType.PARAGRAPH, [(start, end)]
+        if line_end == end:
+            break
+        line_start = line_end + 1
+    if quote:
+        return BlockType.QUOTE, items
+    if unordered:
+        return BlockType.UNORDERED_LIST, items
+    return BlockType.ORDERED_LIST, items
 
 def markdown_to_blocks(markdown):
     """Split markdown text into blocks.
@@ -202,17 +488,7 @@ def markdown_to_blocks(markdown):
         Input: "# Heading\n\nParagraph\n\n- List item"
         Output: ["# Heading", "Paragraph", "- List item"]
     """
-    # Split by double newlines
-    blocks = markdown.split("\n\n")
-    
-    # Strip whitespace and filter out empty blocks
-    filtered_blocks = []
-    for block in blocks:
-        stripped = block.strip()
-        if stripped != "":
-            filtered_blocks.append(stripped)
-            
-    return filtered_blocks
+    return [markdown[start:end] for _, start, end in scan_blocks(markdown)]
 
 def block_to_block_type(block):
     """Determine the type of a markdown block.
@@ -231,78 +507,370 @@ def block_to_block_type(block):
         - Ordered list blocks have every line starting with a number, ., and a space
         - All other blocks are paragraphs
     """
-    lines = block.split("\n")
+    return classify_block(block)[0]
+
+class BlockFacts():
+    """What a block tells about its page besides its HTML.
+    
+    Collected as the block's nodes are built: the URLs of its links and
+    images, as written, including href and src URLs in raw HTML, and when searching, the block's search terms and the
+    text of its heading, fed to a search_index.PageText.
+    """
+    
+    def __init__(self, search=False):
+        self.links = []
+        self.images = []
+        self.text = PageText() if search else None
+    
+    def open(self, tag):
+        """Take note of a block element opening, so heading words weigh more."""
+        if self.text is not None:
+            self.text.open(tag)
+    
+    def close(self, tag):
+        if self.text is not None:
+            self.text.close(tag)
+    
+    def add(self, text, text_type, url):
+        """Take note of one inline node."""
+        if text_type == TextType.LINK:
+            self.links.append(url)
+        elif text_type == TextType.IMAGE:
+            # An image's alt text is not searched
+            self.images.append(url)
+            return
+        elif text_type == TextType.TEXT:
+            # Raw HTML links and images count as the markdown ones do
+            for attribute, html_url in html_urls(text):
+                (self.links if attribute == "href" else self.images).append(html_url)
+        if self.text is not None:
+            # Raw HTML in the markdown is passed through, so strip its tags
+            self.text.feed_html(text)
     
-    # Check for heading
-    if re.match(r"^#{1,6}\s", block):
-        return BlockType.HEADING
+    def values(self):
+        """Return the facts as plain data, to be cached with the block's HTML.
+        
+        Returns:
+            tuple: (links, images, title or None, {term: weight} or None when not searching)
+        """
+        if self.text is None:
+            return self.links, self.images, None, None
+        return self.links, self.images, self.text.title, self.text.terms
+
+class PageFacts():
+    """Collects the facts of every block of a page as it is rendered, see BlockFacts.
     
-    # Check for code block
-    if block.startswith("```") and block.endswith("```"):
-        return BlockType.CODE
+    Rendered blocks are cached together with their facts, so a block taken
+    from a BlockCache still reports them.
     
-    # Check for quote block
-    if all(line.startswith(">") for line in lines):
-        return BlockType.QUOTE
+    Args:
+        search (bool, optional): Also collect the page's title and weighted
+            search terms, see search_entry
+    """
     
-    # Check for unordered list
-    if all(re.match(r"^-\s", line) for line in lines):
-        return BlockType.UNORDERED_LIST
+    def __init__(self, search=False):
+        self.search = search
+        self.links = []
+        self.images = []
+        self.title = None
+        self.terms = {} if search else None
+        # Blocks cached with facts are kept apart from those cached without,
+        # and from those cached without search terms, see BlockCache.key
+        self.context = "facts+search" if search else "facts"
     
-    # Check for ordered list
-    if all(re.match(r"^\d+\.\s", line) for line in lines):
-        # Verify numbers start at 1 and increment by 1
-        numbers = [int(re.match(r"^(\d+)\.", line).group(1)) for line in lines]
-        if numbers == list(range(1, len(numbers) + 1)):
-            return BlockType.ORDERED_LIST
+    def block(self):
+        """Return a BlockFacts to collect the facts of the next block in."""
+        return BlockFacts(self.search)
     
-    # Default to paragraph
-    return BlockType.PARAGRAPH
+    def add(self, values):
+        """Add the facts of a block, as returned by BlockFacts.values."""
+        links, images, title, terms = values
+        self.links.extend(links)
+        self.images.extend(images)
+        if self.title is None:
+            self.title = title
+        if self.terms is not None:
+            for term, weight in terms.items():
+                self.terms[term] = self.terms.get(term, 0) + weight
+    
+    def search_entry(self):
+        """Return what the search index needs of the page.
+        
+        Returns:
+            dict: {"title": text of the first heading or None, "terms": {term: weight}},
+                where a term's weight is the number of times it occurs, with
+                occurrences in headings counting extra, see search_index.HEADING_WEIGHTS
+        """
+        return {"title": self.title, "terms": self.terms}
 
-def text_to_children(text):
-    """Converts a string of markdown text to a list of HTMLNode children using inline parsing."""
+def text_to_children(text, urls=None, facts=None):
+    """Converts a string of markdown text to a list of HTMLNode children using inline parsing.
+    
+    Link and image URLs are resolved with urls, a UrlResolver, if given, and
+    every node is noted in facts, a BlockFacts, if given.
+    """
     nodes = text_to_textnodes(text)
-    return [text_node_to_html_node(node) for node in nodes]
+    if facts is not None:
+        for node in nodes:
+            facts.add(node.text, node.text_type, node.url)
+    return [text_node_to_html_node(node, urls) for node in nodes]
+
+def _block_layout(text, block_type, start, items):
+    """Cut a classified block's inline texts out of the document.
+    
+    Returns:
+        tuple: (tag, item tag or None, list of texts). Lists give one text per
+            item; code blocks give ("pre", "code", [code]) and the code is not
+            inline-parsed.
+    """
+    if block_type == BlockType.HEADING:
+        body_start, body_end = items[0]
+        level = body_start - start - 1 if body_start > start else 1
+        return f"h{level}", None, [" ".join(text[body_start:body_end].splitlines())]
+    elif block_type == BlockType.CODE:
+        body_start, body_end = items[0]
+        return "pre", "code", [text[body_start:body_end]]
+    elif block_type == BlockType.QUOTE:
+        return "blockquote", None, ["\n".join([text[item_start:item_end] for item_start, item_end in items])]
+    elif block_type == BlockType.UNORDERED_LIST:
+        return "ul", "li", [text[item_start:item_end] for item_start, item_end in items]
+    elif block_type == BlockType.ORDERED_LIST:
+        return "ol", "li", [text[item_start:item_end] for item_start, item_end in items]
+    body_start, body_end = items[0]
+    return "p", None, [" ".join(text[body_start:body_end].splitlines())]
+
+def _block_to_html_node(text, block_type, start, items, urls=None, facts=None):
+    tag, item_tag, texts = _block_layout(text, block_type, start, items)
+    if facts is not None:
+        facts.open(tag)
+    if block_type == BlockType.CODE:
+        if facts is not None:
+            facts.add(texts[0], TextType.CODE, None)
+        node = ParentNode(tag, [LeafNode(item_tag, texts[0])])
+    elif item_tag is not None:
+        node = ParentNode(tag, [ParentNode(item_tag, text_to_children(item, urls, facts)) for item in texts])
+    else:
+        node = ParentNode(tag, text_to_children(texts[0], urls, facts))
+    if facts is not None:
+        facts.close(tag)
+    return node
 
-def markdown_to_html_node(markdown):
-    """Converts a full markdown document into a single parent HTMLNode (<div>)."""
-    blocks = markdown_to_blocks(markdown)
+def _cached_block(cache, key, facts):
+    """Look a block up in the cache, adding the facts cached with it to facts.
+    
+    Returns:
+        str: The block's HTML, or None if it is not cached
+    """
+    cached = cache.get(key)
+    if cached is None or facts is None:
+        return cached
+    html, values = cached
+    facts.add(values)
+    return html
+
+def _render_block_html(text, block_type, start, items, timings, direct, urls, facts):
+    """Render one block to HTML, adding its facts to facts.
+    
+    Returns:
+        tuple: (html, what to cache for the block: the html, or with facts
+            (html, facts values))
+    """
+    block_facts = facts.block() if facts is not None else None
+    if direct:
+        with timings.stage("inline_parse"):
+            out = []
+            _render_block(text, block_type, start, items, out, urls, block_facts)
+            html = "".join(out)
+    else:
+        with timings.stage("inline_parse"):
+            node = _block_to_html_node(text, block_type, start, items, urls, block_facts)
+        with timings.stage("serialize"):
+            html = node.to_html()
+    if block_facts is None:
+        return html, html
+    values = block_facts.values()
+    facts.add(values)
+    return html, (html, values)
+
+def markdown_to_html_node(markdown, cache=None, timings=NULL_TIMINGS, urls=None, facts=None):
+    """Converts a full markdown document into a single parent HTMLNode (<div>).
+    
+    Args:
+        markdown (str): Raw markdown document
+        cache (BlockCache, optional): Memo of rendered blocks. With a cache every
+            block becomes a raw LeafNode(None, html) child, so pass one only
+            when the caller just needs the HTML.
+        timings (PageTimings, optional): Receives the time spent scanning and
+            inline-parsing blocks
+        urls (UrlResolver, optional): Resolves link and image URLs as their
+            nodes are built. Without one they are kept as written.
+        facts (PageFacts, optional): Receives the links, images and, when
+            searching, the search terms of every block as its nodes are built,
+            or as it is taken from the cache
+    """
+    with timings.stage("block_split"):
+        spans = list(_scan_blocks(markdown))
     children = []
-    for block in blocks:
-        block_type = block_to_block_type(block)
-        if block_type == BlockType.PARAGRAPH:
-            para_text = " ".join(block.splitlines())
-            children.append(ParentNode("p", text_to_children(para_text)))
-        elif block_type == BlockType.HEADING:
-            match = re.match(r"^(#{1,6}) ", block)
-            level = len(match.group(1)) if match else 1
-            tag = f"h{level}"
-            text = block[level+1:] if match else block
-            heading_text = " ".join(text.splitlines())
-            children.append(ParentNode(tag, text_to_children(heading_text)))
-        elif block_type == BlockType.CODE:
-            code_content = re.sub(r"^```[a-zA-Z]*\n?|```$", "", block, flags=re.MULTILINE)
-            code_node = LeafNode("code", code_content)
-            pre_node = ParentNode("pre", [code_node])
-            children.append(pre_node)
-        elif block_type == BlockType.QUOTE:
-            quote_lines = [line[1:].lstrip() for line in block.split("\n")]
-            quote_text = "\n".join(quote_lines)
-            children.append(ParentNode("blockquote", text_to_children(quote_text)))
-        elif block_type == BlockType.UNORDERED_LIST:
-            items = [line[2:] for line in block.split("\n")]  # Remove '- '
-            li_nodes = [ParentNode("li", text_to_children(item)) for item in items]
-            children.append(ParentNode("ul", li_nodes))
-        elif block_type == BlockType.ORDERED_LIST:
-            items = [re.sub(r"^\d+\. ", "", line) for line in block.split("\n")]
-            li_nodes = [ParentNode("li", text_to_children(item)) for item in items]
-            children.append(ParentNode("ol", li_nodes))
+    for block_type, items, start, end in spans:
+        if cache is None:
+            block_facts = facts.block() if facts is not None else None
+            with timings.stage("inline_parse"):
+                children.append(_block_to_html_node(markdown, block_type, start, items, urls, block_facts))
+            if block_facts is not None:
+                facts.add(block_facts.values())
+            continue
+        key = cache.key(markdown[start:end], urls, facts)
+        html = _cached_block(cache, key, facts)
+        if html is None:
+            html, cached = _render_block_html(markdown, block_type, start, items, timings, False, urls, facts)
+            cache.put(key, cached)
+        children.append(LeafNode(None, html))
     return ParentNode("div", children)
 
-def extract_title(markdown):
-    if '#' in markdown:
-        markdown = markdown.lstrip('#')
-        markdown = markdown.lstrip(' ')
-        return markdown
+_INLINE_TAGS = {
+    TextType.BOLD: "b",
+    TextType.ITALIC: "i",
+    TextType.CODE: "code",
+}
+
+def _render_inline(text, out, urls=None, facts=None):
+    """Append the HTML of inline markdown text to out, as text_node_to_html_node would render it.
+    
+    Every span is noted in facts, a BlockFacts, if given.
+    """
+    for span, text_type, url in _scan_inline(text):
+        if facts is not None:
+            facts.add(span, text_type, url)
+        if text_type == TextType.TEXT:
+            out.append(span if urls is None else urls.resolve_html(span))
+        elif text_type == TextType.LINK:
+            out.append(f'<a href="{url if urls is None else urls.resolve(url)}">{span}</a>')
+        elif text_type == TextType.IMAGE:
+            out.append(f'<img src="{url if urls is None else urls.resolve(url)}" alt="{span}"></img>')
+        else:
+            tag = _INLINE_TAGS[text_type]
+            out.append(f"<{tag}>{span}</{tag}>")
+
+def _render_block(text, block_type, start, items, out, urls=None, facts=None):
+    tag, item_tag, texts = _block_layout(text, block_type, start, items)
+    if facts is not None:
+        facts.open(tag)
+    out.append(f"<{tag}>")
+    if block_type == BlockType.CODE:
+        if facts is not None:
+            facts.add(texts[0], TextType.CODE, None)
+        out.append(f"<{item_tag}>{texts[0]}</{item_tag}>")
+    elif item_tag is not None:
+        for item in texts:
+            out.append(f"<{item_tag}>")
+            _render_inline(item, out, urls, facts)
+            out.append(f"</{item_tag}>")
     else:
-        raise Exception('no title in markdown found')
+        _render_inline(texts[0], out, urls, facts)
+    out.append(f"</{tag}>")
+    if facts is not None:
+        facts.close(tag)
+
+def markdown_to_html(markdown, cache=None, timings=NULL_TIMINGS, urls=None, facts=None):
+    """Renders a full markdown document straight to HTML.
+    
+    This is the direct engine: blocks and inline spans are written into one
+    output buffer without building TextNode or HTMLNode objects. The result is
+    identical to markdown_to_html_node(markdown).to_html().
+    
+    Args:
+        markdown (str): Raw markdown document
+        cache (BlockCache, optional): Memo of rendered blocks, shared with markdown_to_html_node
+        timings (PageTimings, optional): Receives the time spent scanning and
+            rendering blocks
+        urls (UrlResolver, optional): Resolves link and image URLs, see
+            markdown_to_html_node
+        facts (PageFacts, optional): Receives the facts of every block, see
+            markdown_to_html_node
+    
+    Returns:
+        str: The document as a <div> of HTML blocks
+    """
+    with timings.stage("block_split"):
+        spans = list(_scan_blocks(markdown))
+    if not spans:
+        raise ValueError('missing children for parentnode object')
+    out = ["<div>"]
+    for block_type, items, start, end in spans:
+        if cache is None:
+            block_facts = facts.block() if facts is not None else None
+            with timings.stage("inline_parse"):
+                _render_block(markdown, block_type, start, items, out, urls, block_facts)
+            if block_facts is not None:
+                facts.add(block_facts.values())
+            continue
+        key = cache.key(markdown[start:end], urls, facts)
+        html = _cached_block(cache, key, facts)
+        if html is None:
+            html, cached = _render_block_html(markdown, block_type, start, items, timings, True, urls, facts)
+            cache.put(key, cached)
+        out.append(html)
+    out.append("</div>")
+    return "".join(out)
+
+def markdown_to_html_chunks(markdown, cache=None, timings=NULL_TIMINGS, direct=False, urls=None, facts=None):
+    """Render a document one block at a time.
+    
+    Nothing but the current block is held in memory, so this is how large
+    mapped documents are rendered. The chunks join to the same HTML as
+    markdown_to_html_node(markdown).to_html().
+    
+    Args:
+        markdown (str or MappedMarkdown): The document
+        cache (BlockCache, optional): Memo of rendered blocks
+        timings (PageTimings, optional): Receives the time spent rendering blocks
+        direct (bool, optional): Render blocks with the direct engine instead of
+            building a node for each
+        urls (UrlResolver, optional): Resolves link and image URLs, see
+            markdown_to_html_node
+        facts (PageFacts, optional): Receives the facts of each block as it is
+            rendered, see markdown_to_html_node
+    
+    Yields:
+        str: "<div>", the HTML of each block, then "</div>"
+    """
+    yield "<div>"
+    empty = True
+    for text, block_type, items, start, end in iter_blocks(markdown):
+        empty = False
+        key = None
+        if cache is not None:
+            key = cache.key(text[start:end], urls, facts)
+            html = _cached_block(cache, key, facts)
+            if html is not None:
+                yield html
+                continue
+        html, cached = _render_block_html(text, block_type, start, items, timings, direct, urls, facts)
+        if key is not None:
+            cache.put(key, cached)
+        yield html
+    if empty:
+        raise ValueError('missing children for parentnode object')
+    yield "</div>"
+
+def extract_heading_title(markdown):
+    """Return the text of a document's first heading, to title its page.
+    
+    Blocks are scanned only up to the first heading, so the title of a huge
+    document is found without reading all of it.
+    
+    Args:
+        markdown (str or MappedMarkdown): The document
+    
+    Returns:
+        str: The heading's raw markdown text, with its lines joined by spaces
+    
+    Raises:
+        Exception: If the document has no heading
+    """
+    for text, block_type, items, start, end in iter_blocks(markdown):
+        if block_type == BlockType.HEADING:
+            body_start, body_end = items[0]
+            return " ".join(text[body_start:body_end].splitlines()).strip()
+    raise Exception('no title in markdown found')
+
@@ -0,0 +1,110 @@
+import os
+import sys
+import argparse
+from manifest import BuildManifest, MANIFEST_NAME
+from pipeline import same_contents
+from copy_static import copy_file
+from search_index import SearchIndex, SEARCH_DIR
+
+class MergeConflictError(Exception):
+    """Raised when two shards produced different files at the same path."""
+
+    def __init__(self, conflicts):
+        self.conflicts = conflicts # list of (relative path, shard directories)
+        lines = [f"{path}: {', '.join(dirs)}" for path, dirs in conflicts]
+        super().__init__(f"{len(conflicts)} conflicting path(s):\n" + "\n".join(lines))
+
+def merge_shards(shard_dirs, dest_dir):
+    """Combine the outputs and manifests of shard builds into one site.
+
+    Every conflict is collected before anything is written. A path that two
+    shards produced with different bytes is a conflict, and so is a source
+    recorded in two shard manifests, or shards fingerprinting the same asset
+    differently. Files already current in dest_dir are left alone, and files
+    no shard produced are removed. The shards' search indexes are combined
+    into one, keeping the page ids dest_dir's index already gave out.
+
+    Args:
+        shard_dirs (list): Output directories of the shard builds
+        dest_dir (str): Directory to merge into
+
+    Returns:
+        list: Paths, relative to dest_dir, of the files written or removed
+
+    Raises:
+        MergeConflictError: If the shards overlap
+    """
+    owners = {} # relative path -> shard directories that produced it
+    for directory in shard_dirs:
+        for root, dirs, files in os.walk(directory):
+            dirs.sort()
+            for file in sorted(files):
+                rel_path = os.path.relpath(os.path.join(root, file), directory).replace(os.sep, "/")
+                if rel_path != MANIFEST_NAME and not rel_path.startswith(SEARCH_DIR + "/"):
+                    owners.setdefault(rel_path, []).append(directory)
+
+    conflicts = []
+    for rel_path, dirs in sorted(owners.items()):
+        first = os.path.join(dirs[0], rel_path)
+        if any(not same_contents(first, os.path.join(other, rel_path)) for other in dirs[1:]):
+            conflicts.append((rel_path, dirs))
+
+    manifest = BuildManifest(os.path.join(dest_dir, MANIFEST_NAME))
+    recorded_by = {}
+    for directory in shard_dirs:
+        shard_manifest = BuildManifest.load(os.path.join(directory, MANIFEST_NAME))
+        for section in ("pages", "static", "compressed"):
+            entries = getattr(shard_manifest, section)
+            for rel_path, entry in entries.items():
+                key = (section, rel_path)
+                if key in recorded_by:
+                    conflicts.append((f"{section}:{rel_path}", [recorded_by[key], directory]))
+                recorded_by[key] = directory
+                getattr(manifest, section)[rel_path] = entry
+        # Every shard maps all of the static files, so the maps must agree
+        if directory == shard_dirs[0]:
+            manifest.assets = shard_manifest.assets
+        elif shard_manifest.assets != manifest.assets:
+            conflicts.append(("assets", [shard_dirs[0], directory]))
+    if conflicts:
+        raise MergeConflictError(conflicts)
+
+    os.makedirs(dest_dir, exist_ok=True)
+    changed = []
+    for rel_path, dirs in sorted(owners.items()):
+        source_path = os.path.join(dirs[0], rel_path)
+        dest_path = os.path.join(dest_dir, rel_path)
+        if os.path.exists(dest_path) and same_contents(source_path, dest_path):
+            continue
+        copy_file(source_path, dest_path, link=True)
+        changed.append(rel_path)
+
+    indexes = [SearchIndex.load(directory) for directory in shard_dirs
+               if os.path.exists(os.path.join(directory, SEARCH_DIR))]
+    if indexes:
+        search = SearchIndex.load(dest_dir)
+        urls = set()
+        for index in indexes:
+            for url, title, terms in index.entries():
+                search.update_page(url, title, terms)
+                urls.add(url)
+        search.retain(urls)
+        changed.extend(search.write(dest_dir))
+        manifest.record_search(search.outputs())
+    changed.extend(manifest.remove_unrecorded(dest_dir))
+    manifest.save()
+    return changed
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Merge the outputs of sharded builds into one site.")
+    parser.add_argument("dest", help="Directory to merge into, e.g. docs")
+    parser.add_argument("shards", nargs="+", help="Output directories of the shard builds")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    try:
+        changed = merge_shards(args.shards, args.dest)
+    except MergeConflictError as e:
+        print(e, file=sys.stderr)
+        return 1
+    print(f"Merged {len(args.shards)} shard(s) into {args.dest}: {len(changed)} file(s) changed")
+    return 0
@@ -1,73 +1,603 @@
+import io
 import os
-from markdown_parser import markdown_to_html_node, extract_title
+import mmap
+import cProfile
+from contextlib import contextmanager, ExitStack, redirect_stdout
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing.util import Finalize
+from markdown_parser import (
+    extract_heading_title,
+    MappedMarkdown,
+    markdown_to_html,
+    markdown_to_html_chunks,
+    markdown_to_html_node,
+    PageFacts,
+)
+from manifest import hash_bytes, hash_file, remove_output
+from dependencies import page_dependencies
+from shard import in_shard
+from pipeline import prefetch, read_bytes, replace_if_changed, temp_path, write_if_changed, WriteBehindWriter
+from block_cache import BlockCache, DiskBlockCache
+from profiler import NULL_TIMINGS, PageTimings
+from template import (
+    asset_references,
+    load_template,
+    select_template_path,
+    source_template_name,
+    split_template_directive,
+)
+from urls import UrlResolver
 
-def convert_links_to_relative(html_content, from_path, dest_path):
-    """Convert absolute paths in HTML content to relative paths.
+# Sources at least this large are memory-mapped and rendered one block at a time
+LARGE_SOURCE_SIZE = 4 << 20
+
+class PageGenerationError(Exception):
+    """Raised when one or more pages fail to generate in a parallel build."""
+
+    def __init__(self, failures):
+        self.failures = failures # list of (markdown path, error message)
+        lines = [f"{path}: {error}" for path, error in failures]
+        super().__init__(f"{len(failures)} page(s) failed to generate:\n" + "\n".join(lines))
+
+@contextmanager
+def read_source(path):
+    """Read a page's markdown source as bytes.
+    
+    Sources of at least LARGE_SOURCE_SIZE bytes are memory-mapped instead of
+    read, so only the block being rendered is ever decoded, see decode_source.
+    
+    Yields:
+        bytes or mmap: The source, valid until the context exits
+    """
+    if os.path.getsize(path) < LARGE_SOURCE_SIZE:
+        yield read_bytes(path)
+        return
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as data:
+        yield data
+
+def decode_source(data):
+    """Return the markdown of a source read by read_source, with newlines as text mode reads them.
+    
+    Returns:
+        str or MappedMarkdown: A MappedMarkdown over a memory-mapped source
+    """
+    if isinstance(data, mmap.mmap):
+        return MappedMarkdown(data)
+    return str(data, "utf-8").replace("\r\n", "\n").replace("\r", "\n")
+
+def resolve_page_template(markdown, template_path):
+    """Pick the template for a page and strip its template directive.
     
     Args:
-        html_content (str): The HTML content to process
-        from_path (str): The path of the source markdown file
-        dest_path (str): The path where the HTML will be saved
+        markdown (str or MappedMarkdown): Page source
+        template_path (str): Path to the default HTML template file. A page whose
+            first line is <!-- template: name --> uses templates/name.html next
+            to it instead.
     
     Returns:
-        str: HTML content with relative paths
+        tuple: (markdown without the directive, path of the template to use)
     """
-    # Get the relative path from the destination file to the public root
-    dest_dir = os.path.dirname(dest_path)
-    rel_path = os.path.relpath("public", dest_dir)
-    if rel_path == ".":
-        rel_path = ""
+    if isinstance(markdown, MappedMarkdown):
+        template_name = split_template_directive(markdown.first_line())[0]
+        if template_name is not None:
+            markdown = markdown.skip_line()
     else:
-        rel_path = rel_path + "/"
+        template_name, markdown = split_template_directive(markdown)
+    return markdown, select_template_path(template_path, template_name)
+
+def render_page(markdown, template_path, urls, cache=None, timings=NULL_TIMINGS, cprofile=None,
+                direct=False, facts=None):
+    """Prepare a markdown page for its template.
+    
+    The title is taken from the page's first heading up front, so a page
+    without one fails before any output is opened. The content is a block
+    pipeline that reads, classifies, renders and yields one block at a time
+    as the {{ Content }} slot is written, so neither the page's block list
+    nor its node tree is ever held in memory, see markdown_to_html_chunks.
+    
+    When profiling, pages are parsed here in full instead, so every stage of
+    markdown_to_html_node can be timed on its own. MappedMarkdown sources are
+    always streamed.
+    
+    Args:
+        markdown (str or MappedMarkdown): Page source, without a template directive
+        template_path (str): Path to the HTML template file
+        urls (UrlResolver): Resolves the links of the page and its template, see
+            UrlResolver.for_page
+        cache (BlockCache, optional): Memo of rendered blocks
+        timings (PageTimings, optional): Receives the time spent in each parse stage
+        cprofile (cProfile.Profile, optional): Profiler enabled around markdown_to_html_node
+        direct (bool, optional): Render with the direct engine, markdown_to_html,
+            instead of building a node for every block
+        facts (PageFacts, optional): Receives the page's links and images, and
+            its search terms when searching, as its blocks are rendered, see
+            markdown_parser.PageFacts. For a streamed page, it is complete once
+            the page's content has been written.
+    
+    Returns:
+        tuple: (CompiledTemplate, slot values) to pass to template.write or template.render
+    """
+    template = load_template(template_path, urls)
+    title = extract_heading_title(markdown)
+    
+    if isinstance(markdown, MappedMarkdown) or (not timings.enabled and cprofile is None):
+        chunks = lambda: markdown_to_html_chunks(markdown, cache=cache, timings=timings, direct=direct, urls=urls,
+                                                 facts=facts)
+        return template, {"Title": title, "Content": chunks}
     
-    # Replace absolute paths with relative paths
-    html_content = html_content.replace('href="/', f'href="{rel_path}')
-    html_content = html_content.replace('src="/', f'src="{rel_path}')
+    # Convert markdown to HTML
+    if cprofile is not None:
+        cprofile.enable()
+    try:
+        if direct:
+            html_content = markdown_to_html(markdown, cache=cache, timings=timings, urls=urls, facts=facts)
+        else:
+            html_node = markdown_to_html_node(markdown, cache=cache, timings=timings, urls=urls, facts=facts)
+    finally:
+        if cprofile is not None:
+            cprofile.disable()
     
-    return html_content
+    return template, {
+        "Title": title,
+        "Content": html_content if direct else html_node.iter_html,
+    }
 
-def generate_page(from_path, template_path, dest_path, basepath):
+def generate_page(from_path, template_path, dest_path, urls, cache=None, timings=NULL_TIMINGS, cprofile=None,
+                  direct=False, facts=None):
     """Generate an HTML page from a markdown file using a template.
     
     Args:
         from_path (str): Path to the markdown file to convert
-        template_path (str): Path to the HTML template file
+        template_path (str): Path to the default HTML template file, see
+            resolve_page_template
         dest_path (str): Path where the generated HTML file should be saved
-        basepath (str): Base path for all URLs in the generated HTML
+        urls (UrlResolver): Resolves the page's links, see render_page
+        cache (BlockCache, optional): Memo of rendered blocks
+        timings (PageTimings, optional): Receives the time spent in each stage, see write_page
+        cprofile (cProfile.Profile, optional): Profiler enabled around markdown_to_html_node
+        direct (bool, optional): Render with the direct engine, see render_page
+        facts (PageFacts, optional): Receives the page's links, images and search terms, see render_page
+    
+    Returns:
+        bool: True if dest_path was written, False if it already held the same page
     """
+    with ExitStack() as stack:
+        with timings.stage("read"):
+            markdown = decode_source(stack.enter_context(read_source(from_path)))
+        return write_page(markdown, from_path, template_path, dest_path, urls, cache=cache, timings=timings,
+                          cprofile=cprofile, direct=direct, facts=facts)
+
+def write_page(markdown, from_path, template_path, dest_path, urls, cache=None, timings=NULL_TIMINGS,
+               cprofile=None, direct=False, facts=None):
+    """Generate an HTML page from markdown that was already read.
+    
+    Takes the same arguments as generate_page, with the markdown in place of
+    reading from_path, which is only reported. When timings are measured, the
+    page is serialized, filled in and written as separate steps instead of
+    being streamed, so each stage can be timed on its own. MappedMarkdown
+    sources are always streamed.
+    
+    Returns:
+        bool: True if dest_path was written, False if it already held the same page
+    """
+    if not timings.enabled or isinstance(markdown, MappedMarkdown):
+        markdown, template_path = resolve_page_template(markdown, template_path)
+        print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+        template, values = render_page(markdown, template_path, urls, cache=cache, timings=timings,
+                                       cprofile=cprofile, direct=direct, facts=facts)
+        
+        # Create destination directory if it doesn't exist
+        os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+        
+        # Stream the generated HTML into a temporary file, then move it into
+        # place only if it differs from what is already there
+        tmp_path = temp_path(dest_path)
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                template.write(f, values)
+            return replace_if_changed(tmp_path, dest_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+    
+    html_page = render_page_html(markdown, from_path, template_path, dest_path, urls, cache=cache,
+                                 timings=timings, cprofile=cprofile, direct=direct, facts=facts)
+    with timings.stage("write"):
+        return write_if_changed(dest_path, html_page.encode("utf-8"))
+
+def render_page_html(markdown, from_path, template_path, dest_path, urls, cache=None, timings=NULL_TIMINGS,
+                     cprofile=None, direct=False, facts=None):
+    """Render a page's markdown into its complete HTML document.
+    
+    Takes the same arguments as generate_page, with the markdown already read;
+    from_path and dest_path are only reported.
+    
+    Returns:
+        str: The filled-in template
+    """
+    markdown, template_path = resolve_page_template(markdown, template_path)
     print(f"Generating page from {from_path} to {dest_path} using {template_path}")
+    template, values = render_page(markdown, template_path, urls, cache=cache, timings=timings,
+                                   cprofile=cprofile, direct=direct, facts=facts)
+    with timings.stage("serialize"):
+        content = values["Content"]
+        if not isinstance(content, str):
+            content = "".join(content())
+    with timings.stage("template_fill"):
+        return template.render({**values, "Content": content})
+
+def hash_template(template_path, assets=None):
+    """Hash a template for the manifest.
+
+    With fingerprinted assets, the names of the assets the template links to
+    are hashed too, so pages are rebuilt when a stylesheet is renamed.
+
+    Returns:
+        str: Hex digest
+    """
+    if not assets:
+        return hash_file(template_path)
+    data = read_bytes(template_path)
+    names = [assets.get(path, path) for path in asset_references(data.decode("utf-8"))]
+    return hash_bytes(data + "\n".join(names).encode("utf-8"))
+
+def collect_pages(dir_path_content, dest_dir_path):
+    """Find every markdown file under a directory and pair it with its output path.
     
-    # Read the markdown file
-    with open(from_path, "r") as f:
-        markdown = f.read()
+    Args:
+        dir_path_content (str): Path to the content directory containing markdown files
+        dest_dir_path (str): Path to the destination directory where HTML files will be written
     
-    # Read the template file
-    with open(template_path, "r") as f:
-        template = f.read()
+    Returns:
+        list: Sorted list of (markdown path, html path) tuples
+    """
+    pages = []
+    for root, dirs, files in os.walk(dir_path_content):
+        # Calculate the relative path from content directory
+        rel_path = os.path.relpath(root, dir_path_content)
+        dest_path = os.path.join(dest_dir_path, rel_path)
+        
+        for file in files:
+            if file.endswith(".md"):
+                md_path = os.path.join(root, file)
+                html_file = os.path.splitext(file)[0] + ".html"
+                pages.append((md_path, os.path.normpath(os.path.join(dest_path, html_file))))
+    pages.sort()
+    return pages
+
+class PageCheck():
+    """Decides whether a page has to be rebuilt, from its source as it is read.
     
-    # Convert markdown to HTML
-    html_node = markdown_to_html_node(markdown)
-    html_content = html_node.to_html()
+    Sources are hashed and their template directive is read from the bytes
+    the render pipeline reads anyway, so every source is read once, and only
+    while its page is about to be rendered. A check holds plain data only, so
+    worker processes can be sent a copy.
     
-    # Extract title from markdown
-    title = extract_title(markdown)
+    Args:
+        manifest (BuildManifest): Manifest of the previous build
+        template_path (str): Path to the default HTML template file
+        seen (set): Markdown paths of every page in this build, relative to the content directory
+        base (str): Recorded as the pages' basepath, see generate_pages_recursive
+        changed_assets (set, optional): Static paths changed by this build
+        assets (dict, optional): Fingerprinted asset names, see hash_template
+        rebuild_all (bool, optional): Find every page stale without comparing it
+            to the manifest, only working out the record to save for it
+    """
     
-    # Replace placeholders in template
-    html_page = template.replace("{{ Title }}", title)
-    html_page = html_page.replace("{{ Content }}", html_content)
+    def __init__(self, manifest, template_path, seen, base, changed_assets=(), assets=None, rebuild_all=False):
+        self.manifest = manifest
+        self.template_path = template_path
+        self.seen = seen
+        self.base = base
+        self.changed_assets = changed_assets
+        self.assets = assets
+        self.rebuild_all = rebuild_all
+        self._template_hashes = {}
     
-    # Replace absolute paths with basepath
-    html_page = html_page.replace('href="/', f'href="{basepath}')
-    html_page = html_page.replace('src="/', f'src="{basepath}')
+    def __call__(self, task, data, source_hash=None):
+        """Check one page.
+        
+        Args:
+            task (tuple): The page, see build_page
+            data (bytes or mmap): Its source, see read_source
+            source_hash (str, optional): hash_bytes(data), if already computed
+        
+        Returns:
+            tuple: (list of the reasons the page must be rebuilt, empty if it is
+                current, and its manifest record without dependencies, see
+                BuildManifest.record_page)
+        """
+        md_path, html_path, source_key, output_key, fallback = task
+        if source_hash is None:
+            source_hash = hash_bytes(data)
+        page_template = select_template_path(self.template_path, source_template_name(data))
+        template_hash = self._template_hashes.get(page_template)
+        if template_hash is None:
+            template_hash = self._template_hashes[page_template] = hash_template(page_template, self.assets)
+        if self.rebuild_all:
+            reasons = ["full build"]
+        else:
+            reasons = self.manifest.stale_reasons(source_key, source_hash, template_hash, self.base,
+                                                  self.seen, self.changed_assets)
+        if not reasons and fallback is not None:
+            reasons.append(fallback)
+        template_key = os.path.relpath(page_template, os.path.dirname(self.template_path)).replace(os.sep, "/")
+        return reasons, (source_key, source_hash, template_hash, self.base, output_key, template_key)
     
-    # Create destination directory if it doesn't exist
-    os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+    def dependencies(self, facts, source_key):
+        """Return the dependency entry of a page from the facts collected as it rendered.
+        
+        Args:
+            facts (PageFacts): The page's facts
+            source_key (str): The page's markdown path relative to the content directory
+        
+        Returns:
+            dict: See dependencies.page_dependencies
+        """
+        return page_dependencies(facts.links, facts.images, source_key, self.seen)
+
+def _read_hashed(path):
+    """Read a source and hash it on a prefetch thread."""
+    data = read_bytes(path)
+    return data, hash_bytes(data)
+
+def build_page(task, template_path, urls, check=None, cache=None, timings=NULL_TIMINGS, cprofile=None,
+               direct=False, facts=None):
+    """Read one page and generate it, unless a check finds it current.
+    
+    Args:
+        task (tuple): (markdown path, html path, markdown path relative to the
+            content directory, html path relative to the site root, reason to
+            rebuild the page even if its inputs are unchanged, or None)
+        template_path (str): Path to the default HTML template file
+        urls (UrlResolver): Resolves the links of every page, see UrlResolver.for_page
+        check (PageCheck, optional): Decides whether the page is stale. Without
+            one it is always generated.
+        cache, timings, cprofile, direct: See generate_page
+        facts (PageFacts, optional): Receives the page's links, images and search
+            terms as it renders, see render_page. Required with a check, which
+            records the page's dependencies from it.
+    
+    Returns:
+        tuple: (reasons the page was rebuilt for, and its complete manifest record,
+            both None without a check, and whether its output was written).
+            A current page is not generated and has no reasons.
+    """
+    md_path, html_path, source_key, output_key, fallback = task
+    with ExitStack() as stack:
+        with timings.stage("read"):
+            data = stack.enter_context(read_source(md_path))
+            reasons = record = None
+            if check is not None:
+                reasons, record = check(task, data)
+        if check is not None and not reasons:
+            return reasons, record, False
+        written = write_page(decode_source(data), md_path, template_path, html_path, urls.for_page(output_key),
+                             cache=cache, timings=timings, cprofile=cprofile, direct=direct, facts=facts)
+        if check is not None:
+            record += (check.dependencies(facts, source_key),)
+        return reasons, record, written
+
+_worker_cache = None
+_worker_profiling = False
+_worker_cprofile = None
+_worker_pstats_path = None
+_worker_direct = False
+_worker_urls = None
+_worker_search = False
+_worker_template_path = None
+_worker_check = None
+
+def _init_worker(cache_path, profiling, pstats_path, direct, urls, search, template_path, check):
+    """Process pool initializer: give each worker its own block cache and profiler.
+    
+    Workers read an on-disk cache but never save it. The blocks they render
+    are sent back with each page instead, and the parent merges them into
+    the cache it saves.
+    """
+    global _worker_cache, _worker_profiling, _worker_cprofile, _worker_pstats_path, _worker_direct, _worker_urls
+    global _worker_search, _worker_template_path, _worker_check
+    _worker_cache = DiskBlockCache(cache_path, track_new=True) if cache_path else BlockCache(track_new=True)
+    _worker_profiling = profiling
+    _worker_pstats_path = pstats_path
+    _worker_cprofile = cProfile.Profile() if pstats_path else None
+    if _worker_cprofile is not None:
+        # Dumped once as the worker exits, for the parent to merge
+        Finalize(None, _dump_worker_stats, exitpriority=10)
+    _worker_direct = direct
+    _worker_urls = urls
+    _worker_search = search
+    _worker_template_path = template_path
+    _worker_check = check
+
+def _dump_worker_stats():
+    _worker_cprofile.dump_stats(f"{_worker_pstats_path}.{os.getpid()}.part")
+
+def _generate_page_task(task):
+    """Process pool entry point: check and generate one page and report its error, if any.
+    
+    Returns:
+        tuple: (error message or None, block cache hits, block cache misses,
+            PageTimings or None, whether the output was written, search entry or None,
+            list of the (key, html) blocks added to the worker's cache,
+            (reasons, manifest record) as returned by build_page, what the
+            page printed). Output is sent back rather than written by the
+            worker, so the parent prints it whole, wherever its stdout goes.
+    """
+    hits, misses = _worker_cache.hits, _worker_cache.misses
+    timings = PageTimings(task[0]) if _worker_profiling else NULL_TIMINGS
+    error = None
+    written = False
+    checked = (None, None)
+    search_entry = None
+    facts = PageFacts(search=_worker_search) if _worker_search or _worker_check is not None else None
+    output = io.StringIO()
+    try:
+        with redirect_stdout(output):
+            reasons, record, written = build_page(task, _worker_template_path, _worker_urls, check=_worker_check,
+                                                  cache=_worker_cache, timings=timings, cprofile=_worker_cprofile,
+                                                  direct=_worker_direct, facts=facts)
+        checked = (reasons, record)
+        if _worker_search:
+            search_entry = facts.search_entry()
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return (error, _worker_cache.hits - hits, _worker_cache.misses - misses,
+            timings if _worker_profiling else None, written, search_entry, _worker_cache.take_new(), checked,
+            output.getvalue())
+
+def generate_pages_parallel(tasks, jobs, template_path, urls, check=None, cache=None, profile=None, direct=False,
+                            search_entries=None, checked=None):
+    """Generate pages across a pool of worker processes.
+    
+    Tasks are handed out in chunks so that small pages don't pay one round
+    trip each. Each worker reads, checks and renders its pages. Every task is
+    attempted even if some fail.
+    
+    Args:
+        tasks (list): The pages, see build_page
+        jobs (int): Number of worker processes
+        template_path (str): Path to the default HTML template file
+        urls (UrlResolver): Resolves the links of every page, see UrlResolver.for_page
+        check (PageCheck, optional): Skips pages that are current, see build_page
+        cache (BlockCache, optional): Cache whose hit and miss counters receive the
+            workers' totals, and which the blocks the workers render are added to.
+            Each worker keeps its own cache, preloaded from disk if this is a
+            DiskBlockCache.
+        profile (BuildProfile, optional): Receives the timings of every page
+        direct (bool, optional): Render with the direct engine, see render_page
+        search_entries (dict, optional): Receives the search entry of every page
+            generated, keyed by markdown path, see PageFacts.search_entry
+        checked (dict, optional): With a check, receives (reasons, manifest record)
+            for every page checked, keyed by markdown path, see build_page
     
-    # Write the generated HTML to the destination file
-    with open(dest_path, "w") as f:
-        f.write(html_page)
+    Returns:
+        tuple: (list of (markdown path, error) tuples for the pages that failed, in task
+            order, list of the html paths that were written)
+    """
+    if not tasks:
+        return [], []
+    chunksize = max(1, len(tasks) // (jobs * 4))
+    cache_path = cache.path if isinstance(cache, DiskBlockCache) else None
+    initargs = (cache_path, profile is not None, profile.pstats_path if profile is not None else None, direct,
+                urls, search_entries is not None, template_path, check)
+    with ProcessPoolExecutor(max_workers=jobs, initializer=_init_worker, initargs=initargs) as executor:
+        results = list(executor.map(_generate_page_task, tasks, chunksize=chunksize))
+    failures = []
+    written = []
+    for task, result in zip(tasks, results):
+        error, hits, misses, timings, page_written, search_entry, blocks, (reasons, record), output = result
+        print(output, end="")
+        if profile is not None:
+            profile.add_page(timings)
+        if cache is not None:
+            cache.hits += hits
+            cache.misses += misses
+            for key, html in blocks:
+                cache.put(key, html)
+        if error is not None:
+            failures.append((task[0], error))
+            continue
+        if page_written:
+            written.append(task[1])
+        if checked is not None:
+            checked[task[0]] = (reasons, record)
+        # Pages found current were not rendered
+        if search_entries is not None and reasons != []:
+            search_entries[task[0]] = search_entry
+    return failures, written
 
-def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath):
+def generate_pages_pipelined(tasks, template_path, urls, check=None, cache=None, profile=None, direct=False,
+                             io_workers=4, depth=16, search_entries=None, checked=None):
+    """Generate pages with reads and writes overlapped with rendering.
+    
+    Sources are prefetched, and hashed when there is a check, on a thread pool
+    while earlier pages render, and rendered pages are handed to a write-behind
+    writer, so the rendering thread only waits on I/O when the read-ahead or
+    write queue runs dry or fills up. A source is dropped as soon as its page
+    is found current or has been rendered, so at most depth sources are held
+    at a time. Outputs whose bytes are unchanged are not rewritten. Every task
+    is attempted even if some fail.
+    
+    Args:
+        tasks (list): The pages, see build_page
+        template_path (str): Path to the default HTML template file
+        urls (UrlResolver): Resolves the links of every page, see UrlResolver.for_page
+        check (PageCheck, optional): Skips pages that are current, see build_page
+        cache (BlockCache, optional): Memo of rendered blocks
+        profile (BuildProfile, optional): Receives the timings of every page. The
+            read stage is the time spent waiting for a prefetched source and the
+            write stage the time spent waiting for room in the write queue.
+        direct (bool, optional): Render with the direct engine, see render_page
+        io_workers (int, optional): Number of reader threads and of writer threads
+        depth (int, optional): How many sources to read ahead and writes to queue
+        search_entries (dict, optional): Receives the search entry of every page
+            rendered, keyed by markdown path, see PageFacts.search_entry
+        checked (dict, optional): With a check, receives (reasons, manifest record)
+            for every page checked, keyed by markdown path, see build_page
+    
+    Returns:
+        tuple: (list of (markdown path, error) tuples for the pages that failed, in task
+            order, list of the html paths that were written)
+    """
+    failures = []
+    streamed = []
+    cprofile = profile.cprofile if profile is not None else None
+    large = {task[0] for task in tasks if _is_large(task[0])}
+    reads = prefetch([task[0] for task in tasks if task[0] not in large], workers=io_workers, depth=depth,
+                     read=read_bytes if check is None else _read_hashed)
+    with WriteBehindWriter(workers=io_workers, depth=depth) as writer:
+        for task in tasks:
+            md_path, html_path, source_key, output_key, fallback = task
+            timings = profile.new_page(md_path) if profile is not None else NULL_TIMINGS
+            facts = PageFacts(search=search_entries is not None) if search_entries is not None or check is not None else None
+            try:
+                if md_path in large:
+                    # Mapped and streamed to disk, never held in memory for the writer
+                    reasons, record, written = build_page(task, template_path, urls, check=check, cache=cache,
+                                                          timings=timings, cprofile=cprofile, direct=direct,
+                                                          facts=facts)
+                    if written:
+                        streamed.append(html_path)
+                else:
+                    with timings.stage("read"):
+                        data = next(reads).result()
+                        reasons = record = None
+                        if check is not None:
+                            data, source_hash = data
+                            reasons, record = check(task, data, source_hash)
+                    if reasons != []:
+                        html_page = render_page_html(decode_source(data), md_path, template_path, html_path,
+                                                     urls.for_page(output_key), cache=cache, timings=timings,
+                                                     cprofile=cprofile, direct=direct, facts=facts)
+                        if check is not None:
+                            record += (check.dependencies(facts, source_key),)
+                        with timings.stage("write"):
+                            writer.put(html_path, html_page.encode("utf-8"))
+            except Exception as e:
+                failures.append((md_path, f"{type(e).__name__}: {e}"))
+                continue
+            if checked is not None:
+                checked[md_path] = (reasons, record)
+            # Pages found current were not rendered
+            if search_entries is not None and reasons != []:
+                search_entries[md_path] = facts.search_entry()
+    # Map write errors back to the pages that produced them
+    sources_by_dest = {task[1]: task[0] for task in tasks}
+    failures.extend((sources_by_dest[path], error) for path, error in writer.errors)
+    order = {task[0]: index for index, task in enumerate(tasks)}
+    return sorted(failures, key=lambda failure: order[failure[0]]), writer.written + streamed
+
+def _is_large(path):
+    """Check whether a source is read through a memory map, see read_source."""
+    try:
+        return os.path.getsize(path) >= LARGE_SOURCE_SIZE
+    except OSError:
+        return False
+
+def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, basepath, manifest=None, jobs=1, cache=None, profile=None,
+                             direct=False, changed_assets=(), io_workers=4, changed_files=None, shard=None,
+                             assets=None, search=None, relative_links=False, rebuild_all=False):
     """Recursively generate HTML pages from markdown files in a directory.
     
     Args:
@@ -75,28 +605,130 @@ def generate_pages_recursive(dir_path_content, template_path, dest_dir_path, bas
         template_path (str): Path to the HTML template file
         dest_dir_path (str): Path to the destination directory where HTML files will be written
         basepath (str): Base path for all URLs in the generated HTML
+        manifest (BuildManifest, optional): Manifest of the previous build. When given,
+            only pages whose source, template, basepath or link mode changed, or
+            whose linked pages or referenced assets changed, are rebuilt, and outputs
+            of deleted sources are removed. The manifest is updated in place.
+        jobs (int, optional): Number of worker processes. With more than one, pages
+            are rendered in parallel and failures are collected and raised together
+            as a PageGenerationError once every page has been attempted.
+        cache (BlockCache, optional): Memo of rendered blocks shared by every page
+        profile (BuildProfile, optional): Receives per-page stage timings
+        direct (bool, optional): Render with the direct engine, see render_page
+        changed_assets (set, optional): Static paths copied, removed or renamed by this
+            build, see copy_static.sync_static and BuildManifest.record_assets
+        io_workers (int, optional): With a single job, read and write pages on this
+            many threads while rendering, see generate_pages_pipelined. 0 reads,
+            renders and writes each page in turn. Failures are collected and raised
+            together as a PageGenerationError either way, except with 0, where the
+            first failure is raised as is.
+        changed_files (list, optional): Receives the paths, relative to dest_dir_path,
+            of the pages written or removed. Pages whose HTML came out unchanged are
+            not rewritten and not listed.
+        shard (tuple, optional): (index, count); only build the pages in this shard,
+            see shard.in_shard. Links to pages of other shards still resolve.
+        assets (dict, optional): Static path to fingerprinted path, see
+            copy_static.fingerprint_assets. Absolute links to these assets point
+            at the fingerprinted files instead.
+        search (SearchIndex, optional): Updated with the terms of every page
+            generated and cleared of pages whose source was deleted. With a
+            manifest, pages missing from the index are rebuilt even if current.
+        relative_links (bool, optional): Make absolute links relative to each page
+            instead of prefixing them with basepath, see UrlResolver
+        rebuild_all (bool, optional): With a manifest, rebuild every page without
+            checking it against the manifest, only recording its hashes and
+            dependencies as it renders
+    
+    Returns:
+        dict: With a manifest, the reasons each rebuilt page was rebuilt for, keyed
+            by markdown path relative to dir_path_content. Empty without one.
     """
     # Create destination directory if it doesn't exist
     os.makedirs(dest_dir_path, exist_ok=True)
+
+    urls = UrlResolver(basepath, assets, relative=relative_links)
+    pages = collect_pages(dir_path_content, dest_dir_path)
+    seen = {os.path.relpath(md_path, dir_path_content).replace(os.sep, "/") for md_path, html_path in pages}
+    if shard is not None:
+        # Every shard resolves links against the whole site, but builds only its slice
+        pages = [(md_path, html_path) for md_path, html_path in pages
+                 if in_shard(os.path.relpath(md_path, dir_path_content).replace(os.sep, "/"), shard)]
+    check = None
+    if manifest is not None:
+        # Pages are hashed and checked against the manifest as they are read
+        # for rendering. Relative pages do not depend on the basepath, so
+        # their mode is recorded in its place.
+        check = PageCheck(manifest, template_path, seen, "relative" if relative_links else basepath,
+                          changed_assets=changed_assets, assets=assets, rebuild_all=rebuild_all)
     
-    # Walk through the content directory
-    for root, dirs, files in os.walk(dir_path_content):
-        # Calculate the relative path from content directory
-        rel_path = os.path.relpath(root, dir_path_content)
-        
-        # Create corresponding directory in destination
-        dest_path = os.path.join(dest_dir_path, rel_path)
-        os.makedirs(dest_path, exist_ok=True)
-        
-        # Process each file in the current directory
-        for file in files:
-            if file.endswith(".md"):
-                # Get the full path of the markdown file
-                md_path = os.path.join(root, file)
-                
-                # Create the corresponding HTML file path
-                html_file = os.path.splitext(file)[0] + ".html"
-                html_path = os.path.join(dest_path, html_file)
-                
-                # Generate the HTML page
-                generate_page(md_path, template_path, html_path, basepath) 
\ No newline at end of file
+    tasks = []
+    for md_path, html_path in pages:
+        source_key = os.path.relpath(md_path, dir_path_content).replace(os.sep, "/")
+        output_key = os.path.relpath(html_path, dest_dir_path).replace(os.sep, "/")
+        # Why a page whose inputs are unchanged is rebuilt anyway
+        fallback = None
+        if check is not None and not rebuild_all:
+            if not os.path.exists(html_path):
+                fallback = f"output {output_key} is missing"
+            elif search is not None and output_key not in search:
+                fallback = "not in the search index"
+        tasks.append((md_path, html_path, source_key, output_key, fallback))
+
+    search_entries = {} if search is not None else None
+    checked = {} if check is not None else None
+    if jobs > 1:
+        failures, written = generate_pages_parallel(tasks, jobs, template_path, urls, check=check, cache=cache,
+                                                    profile=profile, direct=direct,
+                                                    search_entries=search_entries, checked=checked)
+    elif io_workers > 0:
+        failures, written = generate_pages_pipelined(tasks, template_path, urls, check=check, cache=cache,
+                                                     profile=profile, direct=direct, io_workers=io_workers,
+                                                     search_entries=search_entries, checked=checked)
+    else:
+        failures, written = [], []
+        for task in tasks:
+            facts = PageFacts(search=search is not None) if search is not None or check is not None else None
+            if profile is None:
+                reasons, record, changed = build_page(task, template_path, urls, check=check, cache=cache,
+                                                      direct=direct, facts=facts)
+            else:
+                reasons, record, changed = build_page(task, template_path, urls, check=check, cache=cache,
+                                                      timings=profile.new_page(task[0]),
+                                                      cprofile=profile.cprofile, direct=direct, facts=facts)
+            if changed:
+                written.append(task[1])
+            if checked is not None:
+                checked[task[0]] = (reasons, record)
+            if search is not None and reasons != []:
+                search_entries[task[0]] = facts.search_entry()
+    if changed_files is not None:
+        changed_files.extend(sorted(os.path.relpath(path, dest_dir_path).replace(os.sep, "/")
+                                    for path in written))
+
+    failed = {path for path, error in failures}
+    if search is not None:
+        for md_path, html_path, source_key, output_key, fallback in tasks:
+            entry = search_entries.get(md_path)
+            if entry is not None and md_path not in failed:
+                search.update_page(output_key, entry["title"] or output_key, entry["terms"])
+
+    rebuilt = {}
+    if manifest is not None:
+        for md_path, (reasons, record) in checked.items():
+            if reasons and md_path not in failed:
+                rebuilt[record[0]] = reasons
+                manifest.record_page(*record)
+
+        # Remove pages whose markdown source was deleted
+        built = {task[2] for task in tasks}
+        for output in manifest.prune_pages(built):
+            print(f"Removing stale page {os.path.join(dest_dir_path, output)}")
+            remove_output(dest_dir_path, output)
+            if search is not None:
+                search.remove_page(output)
+            if changed_files is not None:
+                changed_files.append(output)
+
+    if failures:
+        raise PageGenerationError(failures)
+    return rebuilt
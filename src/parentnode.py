@@ -2,6 +2,8 @@ from htmlnode import HTMLNode
 
 
 class ParentNode(HTMLNode):
+    __slots__ = ()
+
     def __init__(self, tag=None, value=None, children=None, props=None):
         # Support positional arguments: ParentNode(tag, [children])
         if children is None and isinstance(value, list):
@@ -12,14 +14,19 @@ class ParentNode(HTMLNode):
         super().__init__(tag, value, children, props) # tag and children are NOT optional
 
     def to_html(self):
+        # join once at the top instead of building a string per nesting level
+        return ''.join(self.iter_html())
+
+    def iter_html(self):
         if self.tag is None:
             raise ValueError('missing tag for parentnode object')
         if not self.children:
             raise ValueError('missing children for parentnode object')
 
-        # recursively convert children to html
-        children_html = ''.join(child.to_html() for child in self.children)
-        return f'<{self.tag}{self.props_to_html()}>{children_html}</{self.tag}>'
+        yield f'<{self.tag}{self.props_to_html()}>'
+        for child in self.children:
+            yield from child.iter_html()
+        yield f'</{self.tag}>'
     
     def __repr__(self):
         return f"ParentNode({self.tag}, {self.value}, {self.children}, {self.props})"
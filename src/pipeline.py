@@ -0,0 +1,174 @@
+import os
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+def read_bytes(path):
+    """Return the contents of a file as bytes."""
+    with open(path, "rb") as f:
+        return f.read()
+
+def temp_path(path):
+    """Return a scratch path next to path, unique to this process and thread."""
+    return f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+
+def replace_if_changed(tmp_path, path):
+    """Move a freshly written file over path unless path already holds the same bytes.
+
+    The rename is atomic, so readers see either the old or the new file, never
+    a partial one. An unchanged file keeps its mtime, and tmp_path is removed.
+
+    Returns:
+        bool: True if path was replaced, False if it was already current
+    """
+    try:
+        if same_contents(tmp_path, path):
+            os.remove(tmp_path)
+            return False
+    except FileNotFoundError:
+        pass
+    os.replace(tmp_path, path)
+    return True
+
+def same_contents(path_a, path_b, chunk_size=1 << 16):
+    """Compare two files byte for byte, stopping at the first difference."""
+    if os.path.getsize(path_a) != os.path.getsize(path_b):
+        return False
+    with open(path_a, "rb") as a, open(path_b, "rb") as b:
+        while True:
+            chunk = a.read(chunk_size)
+            if chunk != b.read(chunk_size):
+                return False
+            if not chunk:
+                return True
+
+def write_if_changed(path, data):
+    """Write data to path unless the file already holds exactly those bytes.
+
+    Changed files are written to a temporary file and renamed into place.
+
+    Args:
+        path (str): File to write, its directory is created if needed
+        data (bytes): The new contents
+
+    Returns:
+        bool: True if the file was written, False if it was already current
+    """
+    try:
+        if os.path.getsize(path) == len(data) and read_bytes(path) == data:
+            return False
+    except FileNotFoundError:
+        pass
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    tmp_path = temp_path(path)
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return True
+
+def prefetch(paths, workers=4, depth=16, read=read_bytes):
+    """Read files ahead of their consumer on a thread pool.
+
+    At most depth reads are in flight or waiting to be consumed, so memory stays
+    bounded however many files there are.
+
+    Args:
+        paths (iterable): Files to read, in the order they will be consumed
+        workers (int): Number of reader threads
+        depth (int): How many files to read ahead
+        read (callable, optional): Called with each path on a reader thread,
+            read_bytes by default. Work such as hashing done here overlaps
+            with the consumer too.
+
+    Yields:
+        Future: One future per path, in order, resolving to what read returned.
+            Read errors are raised by the future's result().
+    """
+    paths = iter(paths)
+    pending = deque()
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        def submit():
+            for path in paths:
+                pending.append(executor.submit(read, path))
+                return
+
+        for _ in range(depth):
+            submit()
+        while pending:
+            future = pending.popleft()
+            submit()
+            yield future
+
+class WriteBehindWriter():
+    """Writes files on background threads while the caller moves on.
+
+    put() blocks once depth writes are queued, so a slow disk throttles the
+    producer instead of letting rendered pages pile up in memory. Files whose
+    bytes are unchanged are not rewritten, see write_if_changed.
+
+    Use as a context manager; leaving the block waits for every queued write.
+    OSErrors are collected in errors; any other exception raised by a write is
+    re-raised by close(), after the remaining writes have finished.
+    """
+
+    def __init__(self, workers=2, depth=16):
+        self.written = []
+        self.skipped = []
+        self.errors = [] # (path, error message) tuples
+        self._exception = None
+        self._queue = queue.Queue(maxsize=depth)
+        self._threads = [threading.Thread(target=self._run, daemon=True) for _ in range(workers)]
+        for thread in self._threads:
+            thread.start()
+
+    def put(self, path, data):
+        """Queue data to be written to path."""
+        self._queue.put((path, data))
+
+    def close(self):
+        """Wait for every queued write to finish and stop the writer threads.
+
+        Raises:
+            Exception: The first exception other than OSError raised by a write
+        """
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+        if self._exception is not None:
+            exception, self._exception = self._exception, None
+            raise exception
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                return
+            path, data = item
+            try:
+                if write_if_changed(path, data):
+                    self.written.append(path)
+                else:
+                    self.skipped.append(path)
+            except OSError as e:
+                self.errors.append((path, f"{type(e).__name__}: {e}"))
+            except Exception as e:
+                # Keep draining the queue so that put() and close() can't block
+                if self._exception is None:
+                    self._exception = e
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.close()
+        except Exception:
+            # Don't hide the exception that is leaving the block
+            if exc_type is None:
+                raise
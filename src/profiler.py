@@ -0,0 +1,158 @@
+import os
+import json
+import time
+import glob
+import pstats
+import cProfile
+from contextlib import contextmanager, nullcontext
+
+# Page stages in the order they run, used to order reports
+PAGE_STAGES = [
+    "read",
+    "block_split",
+    "inline_parse",
+    "serialize",
+    "template_fill",
+    "write",
+]
+
+class NullTimings():
+    """Stand-in for PageTimings when nothing is being measured."""
+
+    enabled = False
+    _context = nullcontext()
+
+    def stage(self, name):
+        return self._context
+
+NULL_TIMINGS = NullTimings()
+
+class PageTimings():
+    """Wall and CPU seconds spent in each build stage for one page."""
+
+    enabled = True
+
+    def __init__(self, page):
+        self.page = page
+        self.stages = {} # stage name -> [wall seconds, cpu seconds]
+
+    @contextmanager
+    def stage(self, name):
+        wall, cpu = time.perf_counter(), time.process_time()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - wall, time.process_time() - cpu)
+
+    def add(self, name, wall, cpu):
+        totals = self.stages.setdefault(name, [0.0, 0.0])
+        totals[0] += wall
+        totals[1] += cpu
+
+    def total(self):
+        return [sum(wall for wall, cpu in self.stages.values()),
+                sum(cpu for wall, cpu in self.stages.values())]
+
+    def to_dict(self):
+        wall, cpu = self.total()
+        return {
+            "page": self.page,
+            "wall": wall,
+            "cpu": cpu,
+            "stages": {name: {"wall": w, "cpu": c} for name, (w, c) in _ordered(self.stages)},
+        }
+
+class BuildProfile():
+    """Collects build-level stage timings and the PageTimings of every page.
+
+    Args:
+        pstats_path (str, optional): Where to dump cProfile statistics of
+            markdown_to_html_node, accumulated over every page
+    """
+
+    def __init__(self, pstats_path=None):
+        self.pstats_path = pstats_path
+        self.cprofile = cProfile.Profile() if pstats_path else None
+        self.build = PageTimings(None)
+        self.pages = []
+        self._started = time.perf_counter(), time.process_time()
+
+    def stage(self, name):
+        return self.build.stage(name)
+
+    def new_page(self, page):
+        timings = PageTimings(page)
+        self.pages.append(timings)
+        return timings
+
+    def add_page(self, timings):
+        self.pages.append(timings)
+
+    def report(self, top=10):
+        """Build the JSON-serializable report.
+
+        Args:
+            top (int): How many of the slowest pages to list
+
+        Returns:
+            dict: Totals, per-stage aggregates, per-page timings and the slowest pages
+        """
+        aggregate = PageTimings(None)
+        for timings in self.pages:
+            for name, (wall, cpu) in timings.stages.items():
+                aggregate.add(name, wall, cpu)
+        pages = [timings.to_dict() for timings in self.pages]
+        slowest = sorted(pages, key=lambda page: page["wall"], reverse=True)[:top]
+        return {
+            "wall": time.perf_counter() - self._started[0],
+            "cpu": time.process_time() - self._started[1],
+            "build_stages": aggregate_dict(self.build),
+            "page_stages": aggregate_dict(aggregate),
+            "page_count": len(pages),
+            "slowest": [{"page": page["page"], "wall": page["wall"], "cpu": page["cpu"]} for page in slowest],
+            "pages": pages,
+        }
+
+    def write(self, path, top=10):
+        """Write the report to path and any cProfile statistics to pstats_path.
+
+        Returns:
+            dict: The report that was written
+        """
+        report = self.report(top)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(report, f, indent=1)
+        if self.cprofile is not None:
+            self._write_pstats()
+        return report
+
+    def _write_pstats(self):
+        # Parallel workers dump their own statistics next to the final file
+        parts = glob.glob(f"{glob.escape(self.pstats_path)}.*.part")
+        sources = list(parts)
+        self.cprofile.create_stats()
+        if self.cprofile.stats:
+            sources.insert(0, self.cprofile)
+        if sources:
+            pstats.Stats(*sources).dump_stats(self.pstats_path)
+        for part in parts:
+            os.remove(part)
+
+def aggregate_dict(timings):
+    return {name: {"wall": wall, "cpu": cpu} for name, (wall, cpu) in _ordered(timings.stages)}
+
+def _ordered(stages):
+    order = {name: index for index, name in enumerate(PAGE_STAGES)}
+    return sorted(stages.items(), key=lambda item: (order.get(item[0], len(order)), item[0]))
+
+def format_report(report):
+    """Render the human-readable summary printed at the end of a profiled build."""
+    lines = [f"Build: {report['wall']:.3f}s wall, {report['cpu']:.3f}s cpu, {report['page_count']} pages"]
+    for name, times in list(report["build_stages"].items()) + list(report["page_stages"].items()):
+        lines.append(f"  {name:<14} {times['wall']:9.3f}s wall {times['cpu']:9.3f}s cpu")
+    if report["slowest"]:
+        lines.append("Slowest pages:")
+        for page in report["slowest"]:
+            lines.append(f"  {page['wall']:9.3f}s  {page['page']}")
+    return "\n".join(lines)
@@ -0,0 +1,250 @@
+import os
+import re
+import json
+import html
+import heapq
+from manifest import remove_output
+from pipeline import read_bytes, write_if_changed
+
+SEARCH_DIR = "search"
+PAGES_NAME = "pages.json"
+INDEX_VERSION = 1
+
+# Terms are stored in shards named after their first PREFIX_LENGTH characters
+PREFIX_LENGTH = 2
+
+# A word in a heading counts this many times as much as one in body text
+HEADING_WEIGHTS = {"h1": 8, "h2": 4, "h3": 4, "h4": 2, "h5": 2, "h6": 2}
+TEXT_WEIGHT = 1
+
+# Words of two or more letters or digits; shorter ones are too common to search for
+_WORD = re.compile(r"\w\w+")
+_TAG = re.compile(r"<(/?)([A-Za-z][\w-]*)[^>]*>")
+_VOID_TAGS = {"br", "hr", "wbr"}
+_SHARD_CHARS = set("abcdefghijklmnopqrstuvwxyz0123456789")
+
+class PageText():
+    """Accumulates the weighted terms and the title of content as it is built.
+
+    The renderers open and close each block's tag around feeding its text,
+    see markdown_parser.BlockFacts. Text may hold raw HTML, which feed_html
+    strips, as long as no piece ends inside a tag.
+    """
+
+    def __init__(self):
+        self.terms = {}
+        self.title = None
+        self._weights = [TEXT_WEIGHT]
+        self._title_parts = None
+
+    def open(self, tag):
+        weight = HEADING_WEIGHTS.get(tag)
+        self._weights.append(weight if weight is not None else self._weights[-1])
+        if weight is not None and self.title is None and self._title_parts is None:
+            self._title_parts = []
+
+    def close(self, tag):
+        if len(self._weights) > 1:
+            self._weights.pop()
+        if tag in HEADING_WEIGHTS and self._title_parts is not None:
+            self.title = " ".join("".join(self._title_parts).split())
+            self._title_parts = None
+
+    def text(self, text):
+        text = html.unescape(text)
+        if self._title_parts is not None:
+            self._title_parts.append(text)
+        weight = self._weights[-1]
+        for word in _WORD.findall(text.lower()):
+            self.terms[word] = self.terms.get(word, 0) + weight
+
+    def feed_html(self, markup):
+        position = 0
+        for match in _TAG.finditer(markup):
+            if match.start() > position:
+                self.text(markup[position:match.start()])
+            tag = match.group(2).lower()
+            if match.group(1):
+                self.close(tag)
+            elif tag not in _VOID_TAGS:
+                self.open(tag)
+            position = match.end()
+        if position < len(markup):
+            self.text(markup[position:])
+
+def shard_name(term, prefix_length=PREFIX_LENGTH):
+    """Return the shard a term is stored in: its first characters, with anything
+    but a-z and 0-9 replaced by an underscore."""
+    return "".join(char if char in _SHARD_CHARS else "_" for char in term[:prefix_length])
+
+class SearchIndex():
+    """Inverted index of the site's pages, split into prefix shards for the browser.
+
+    The index is written under docs/search/:
+
+        pages.json  {"version": 1, "prefix_length": 2, "pages": [[url, title], ...]}
+                    A page's position in the list is its id; removed pages
+                    leave null until their id is reused.
+        <prefix>.json  {term: [[page id, weight], ...]} for every term whose
+                    shard_name is prefix, heaviest pages first.
+
+    A search client looks up each query word in the shard named after its
+    first prefix_length characters only. URLs are relative to the site root.
+
+    Pages can be updated and removed one at a time. Only the shards holding
+    terms of pages that changed are serialized again on write.
+    """
+
+    def __init__(self, prefix_length=PREFIX_LENGTH):
+        self.prefix_length = prefix_length
+        self.pages = []     # page id -> [url, title] or None
+        self._ids = {}      # url -> page id
+        self._postings = {} # term -> {page id: weight}
+        self._terms = {}    # page id -> {term: weight}
+        self._dirty = set() # shards to serialize again
+        self._free = []     # heap of the ids of removed pages, to reuse lowest first
+
+    @classmethod
+    def load(cls, dest_dir):
+        """Load the index written to a site, or return an empty one if there is none.
+
+        Args:
+            dest_dir (str): The build output directory
+
+        Returns:
+            SearchIndex: The loaded index
+        """
+        directory = os.path.join(dest_dir, SEARCH_DIR)
+        try:
+            data = json.loads(read_bytes(os.path.join(directory, PAGES_NAME)))
+        except FileNotFoundError:
+            return cls()
+        if data.get("version") != INDEX_VERSION:
+            return cls()
+        index = cls(data["prefix_length"])
+        index.pages = data["pages"]
+        for page_id, page in enumerate(index.pages):
+            if page is not None:
+                index._ids[page[0]] = page_id
+                index._terms[page_id] = {}
+            else:
+                index._free.append(page_id)
+        for file in sorted(os.listdir(directory)):
+            if file == PAGES_NAME or not file.endswith(".json"):
+                continue
+            for term, postings in json.loads(read_bytes(os.path.join(directory, file))).items():
+                index._postings[term] = {page_id: weight for page_id, weight in postings}
+                for page_id, weight in postings:
+                    index._terms[page_id][term] = weight
+        return index
+
+    def __contains__(self, url):
+        return url in self._ids
+
+    def __len__(self):
+        return len(self._ids)
+
+    def entries(self):
+        """Yield (url, title, {term: weight}) for every page in the index."""
+        for url, page_id in sorted(self._ids.items()):
+            yield url, self.pages[page_id][1], self._terms[page_id]
+
+    def update_page(self, url, title, terms):
+        """Add a page to the index, or replace what it held for the page.
+
+        Args:
+            url (str): The page's output path relative to the site root
+            title (str): Shown in search results
+            terms (dict): Term to weight, see markdown_parser.PageFacts.search_entry
+        """
+        page_id = self._ids.get(url)
+        if page_id is not None:
+            if self.pages[page_id][1] == title and self._terms[page_id] == terms:
+                return
+            self._remove_terms(page_id)
+        else:
+            page_id = self._free_id()
+            self._ids[url] = page_id
+        self.pages[page_id] = [url, title]
+        self._terms[page_id] = dict(terms)
+        for term, weight in terms.items():
+            self._postings.setdefault(term, {})[page_id] = weight
+            self._dirty.add(shard_name(term, self.prefix_length))
+
+    def remove_page(self, url):
+        """Drop a page from the index, if it is in it."""
+        page_id = self._ids.pop(url, None)
+        if page_id is None:
+            return
+        self._remove_terms(page_id)
+        del self._terms[page_id]
+        self.pages[page_id] = None
+        heapq.heappush(self._free, page_id)
+
+    def retain(self, urls):
+        """Drop every page whose url is not in urls."""
+        for url in [url for url in self._ids if url not in urls]:
+            self.remove_page(url)
+
+    def outputs(self):
+        """Return the paths, relative to the site root, of the files the index writes."""
+        shards = {shard_name(term, self.prefix_length) for term in self._postings}
+        return [f"{SEARCH_DIR}/{PAGES_NAME}"] + sorted(f"{SEARCH_DIR}/{name}.json" for name in shards)
+
+    def write(self, dest_dir):
+        """Write the shards that changed since the index was loaded, and pages.json.
+
+        Shard files no longer backed by any term are removed. Files whose bytes
+        are unchanged are not rewritten.
+
+        Args:
+            dest_dir (str): The build output directory
+
+        Returns:
+            list: Paths, relative to dest_dir, of the files written or removed
+        """
+        directory = os.path.join(dest_dir, SEARCH_DIR)
+        shards = {}
+        for term in self._postings:
+            shards.setdefault(shard_name(term, self.prefix_length), []).append(term)
+        changed = []
+        # Trim freed ids off the end so the pages list only grows with the site
+        if self.pages and self.pages[-1] is None:
+            while self.pages and self.pages[-1] is None:
+                self.pages.pop()
+            self._free = [page_id for page_id in self._free if page_id < len(self.pages)]
+            heapq.heapify(self._free)
+        data = {"version": INDEX_VERSION, "prefix_length": self.prefix_length, "pages": self.pages}
+        if write_if_changed(os.path.join(directory, PAGES_NAME), _dump(data)):
+            changed.append(f"{SEARCH_DIR}/{PAGES_NAME}")
+        for name in sorted(self._dirty & set(shards)):
+            data = {}
+            for term in sorted(shards[name]):
+                postings = self._postings[term]
+                data[term] = sorted(([page_id, weight] for page_id, weight in postings.items()),
+                                    key=lambda posting: (-posting[1], posting[0]))
+            if write_if_changed(os.path.join(directory, f"{name}.json"), _dump(data)):
+                changed.append(f"{SEARCH_DIR}/{name}.json")
+        for file in sorted(os.listdir(directory)):
+            if file != PAGES_NAME and file.endswith(".json") and file[:-len(".json")] not in shards:
+                remove_output(dest_dir, f"{SEARCH_DIR}/{file}")
+                changed.append(f"{SEARCH_DIR}/{file}")
+        self._dirty.clear()
+        return changed
+
+    def _remove_terms(self, page_id):
+        for term in self._terms[page_id]:
+            postings = self._postings[term]
+            del postings[page_id]
+            if not postings:
+                del self._postings[term]
+            self._dirty.add(shard_name(term, self.prefix_length))
+
+    def _free_id(self):
+        if self._free:
+            return heapq.heappop(self._free)
+        self.pages.append(None)
+        return len(self.pages) - 1
+
+def _dump(data):
+    return json.dumps(data, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
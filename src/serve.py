@@ -0,0 +1,303 @@
+import os
+import sys
+import html as html_lib
+import json
+import queue
+import shutil
+import argparse
+import mimetypes
+import threading
+import time
+import traceback
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote
+from page_generator import resolve_page_template, render_page
+from block_cache import BlockCache
+from urls import UrlResolver
+
+RELOAD_PATH = "/__livereload"
+
+RELOAD_SCRIPT = f"""<script>
+new EventSource("{RELOAD_PATH}").onmessage = () => location.reload();
+</script>
+"""
+
+class DevSite():
+    """The site rendered on demand and kept in memory.
+
+    Pages are rendered the first time they are requested and cached until
+    their source or template changes. Static files are streamed from disk on
+    every request. Nothing is written to disk.
+    
+    Watched directories are only listed again when their mtime changes, that
+    is when files are added, removed or renamed in them; the files already
+    known are stat'ed on every poll.
+    """
+
+    def __init__(self, content_dir, static_dir, template_path, basepath="/"):
+        self.content_dir = content_dir
+        self.static_dir = static_dir
+        self.template_path = template_path
+        self.template_dir = os.path.join(os.path.dirname(template_path), "templates")
+        self.basepath = basepath
+        self._urls = UrlResolver(basepath)
+        self._lock = threading.Lock()
+        self._pages = {}     # url path -> markdown path
+        self._rendered = {}  # url path -> html bytes
+        self._generation = 0 # bumped whenever poll drops rendered pages
+        self._blocks = BlockCache()
+        self._listings = {}  # directory -> (mtime, file paths, subdirectory paths)
+        self._mtimes = self._scan()
+        self._index_pages()
+
+    def _scan(self):
+        """Return the mtime of every watched file, keyed by path."""
+        listings = {}
+        for directory in (self.content_dir, self.static_dir, self.template_dir):
+            self._list(directory, listings)
+        self._listings = listings
+        mtimes = {}
+        paths = [path for mtime, files, dirs in listings.values() for path in files]
+        for path in paths + [self.template_path]:
+            try:
+                mtimes[path] = os.stat(path).st_mtime_ns
+            except FileNotFoundError:
+                pass
+        return mtimes
+
+    def _list(self, directory, listings):
+        """Add the listing of directory and its subdirectories to listings,
+        reusing the previous listing of every directory whose mtime is unchanged."""
+        try:
+            mtime = os.stat(directory).st_mtime_ns
+        except FileNotFoundError:
+            return
+        listing = self._listings.get(directory)
+        if listing is None or listing[0] != mtime:
+            files, dirs = [], []
+            try:
+                with os.scandir(directory) as entries:
+                    for entry in entries:
+                        (dirs if entry.is_dir() else files).append(entry.path)
+            except FileNotFoundError:
+                return
+            listing = (mtime, files, dirs)
+        listings[directory] = listing
+        for subdirectory in listing[2]:
+            self._list(subdirectory, listings)
+
+    def _page_url(self, md_path):
+        rel_path = os.path.relpath(md_path, self.content_dir).replace(os.sep, "/")
+        return "/" + os.path.splitext(rel_path)[0] + ".html"
+
+    def _index_pages(self):
+        self._pages = {}
+        for path in self._mtimes:
+            if path.endswith(".md") and self._is_under(path, self.content_dir):
+                self._pages[self._page_url(path)] = path
+
+    @staticmethod
+    def _is_under(path, directory):
+        return os.path.commonpath([os.path.abspath(path), os.path.abspath(directory)]) == os.path.abspath(directory)
+
+    def poll(self):
+        """Check the watched files and drop whatever their changes invalidate.
+
+        Returns:
+            list: Paths of the files that were added, modified or removed
+        """
+        mtimes = self._scan()
+        changed = [path for path in mtimes.keys() | self._mtimes.keys()
+                   if mtimes.get(path) != self._mtimes.get(path)]
+        if not changed:
+            return []
+
+        with self._lock:
+            self._mtimes = mtimes
+            self._generation += 1
+            for path in changed:
+                if path == self.template_path or self._is_under(path, self.template_dir):
+                    # Every page may use this template
+                    self._rendered.clear()
+                elif self._is_under(path, self.content_dir):
+                    self._rendered.pop(self._page_url(path), None)
+            self._index_pages()
+        return sorted(changed)
+
+    def resolve(self, url_path):
+        """Map a request path to the url path of a page or static file, if any."""
+        if url_path.endswith("/"):
+            url_path += "index.html"
+        candidates = [url_path]
+        if not os.path.splitext(url_path)[1]:
+            candidates += [url_path + ".html", url_path + "/index.html"]
+        for candidate in candidates:
+            if candidate in self._pages:
+                return candidate
+            static_path = os.path.normpath(os.path.join(self.static_dir, candidate.lstrip("/")))
+            if self._is_under(static_path, self.static_dir) and os.path.isfile(static_path):
+                return candidate
+        return None
+
+    def get(self, url_path):
+        """Look up a request path.
+
+        Pages are rendered outside the lock, so a slow page does not hold up
+        other requests. A page rendered while poll dropped it is served but
+        not kept.
+
+        Returns:
+            tuple: (body, content type), or None if there is no such file. The
+                body is the bytes of a page, or a static file opened for
+                reading, which the caller closes.
+        """
+        url_path = self.resolve(url_path)
+        if url_path is None:
+            return None
+
+        with self._lock:
+            md_path = self._pages.get(url_path)
+            html = self._rendered.get(url_path)
+            generation = self._generation
+        if md_path is not None:
+            if html is None:
+                html = self._render(md_path)
+                with self._lock:
+                    if self._generation == generation:
+                        self._rendered[url_path] = html
+            return html, "text/html; charset=utf-8"
+
+        try:
+            body = open(os.path.join(self.static_dir, url_path.lstrip("/")), "rb")
+        except FileNotFoundError:
+            # Removed since it was resolved
+            return None
+        content_type = mimetypes.guess_type(url_path)[0] or "application/octet-stream"
+        return body, content_type
+
+    def _render(self, md_path):
+        with open(md_path, "r") as f:
+            markdown = f.read()
+        try:
+            markdown, template_path = resolve_page_template(markdown, self.template_path)
+            urls = self._urls.for_page(self._page_url(md_path)[1:])
+            template, values = render_page(markdown, template_path, urls, cache=self._blocks)
+            html = template.render(values)
+        except Exception:
+            html = f"<pre>{html_lib.escape(traceback.format_exc())}</pre>"
+        if "</body>" in html:
+            html = html.replace("</body>", RELOAD_SCRIPT + "</body>", 1)
+        else:
+            html += RELOAD_SCRIPT
+        return html.encode("utf-8")
+
+class ReloadBroadcaster():
+    """Fan reload events out to every connected browser."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._clients = []
+
+    def subscribe(self):
+        client = queue.Queue()
+        with self._lock:
+            self._clients.append(client)
+        return client
+
+    def unsubscribe(self, client):
+        with self._lock:
+            self._clients.remove(client)
+
+    def publish(self, changed):
+        with self._lock:
+            for client in self._clients:
+                client.put(changed)
+
+class DevRequestHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        url_path = unquote(self.path.split("?", 1)[0].split("#", 1)[0])
+        if url_path == RELOAD_PATH:
+            self._stream_reloads()
+            return
+
+        result = self.server.site.get(url_path)
+        if result is None:
+            self.send_error(404)
+            return
+        body, content_type = result
+        if isinstance(body, bytes):
+            self._send(content_type, len(body))
+            self.wfile.write(body)
+            return
+        with body:
+            self._send(content_type, os.fstat(body.fileno()).st_size)
+            shutil.copyfileobj(body, self.wfile)
+
+    def _send(self, content_type, length):
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(length))
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+
+    def _stream_reloads(self):
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.send_header("Cache-Control", "no-store")
+        self.end_headers()
+        client = self.server.broadcaster.subscribe()
+        try:
+            while True:
+                try:
+                    changed = client.get(timeout=15)
+                    message = f"data: {json.dumps(changed)}\n\n"
+                except queue.Empty:
+                    message = ": keep-alive\n\n"
+                self.wfile.write(message.encode("utf-8"))
+                self.wfile.flush()
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.server.broadcaster.unsubscribe(client)
+
+    def log_message(self, format, *args):
+        pass
+
+def watch(site, broadcaster, interval):
+    """Poll the site's sources forever, announcing every change to the browsers."""
+    while True:
+        time.sleep(interval)
+        changed = site.poll()
+        if changed:
+            print(f"Changed: {', '.join(changed)}")
+            broadcaster.publish(changed)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Serve the site with live reload.")
+    parser.add_argument("--port", type=int, default=8888)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--interval", type=float, default=0.05,
+                        help="Seconds between checks for changed files (default 0.05)")
+    args = parser.parse_args(sys.argv[1:] if argv is None else argv)
+
+    root_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    site = DevSite(
+        os.path.join(root_dir, "content"),
+        os.path.join(root_dir, "static"),
+        os.path.join(root_dir, "template.html"),
+    )
+    broadcaster = ReloadBroadcaster()
+    threading.Thread(target=watch, args=(site, broadcaster, args.interval), daemon=True).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), DevRequestHandler)
+    server.daemon_threads = True
+    server.site = site
+    server.broadcaster = broadcaster
+    print(f"Serving on http://{args.host}:{args.port}/")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,42 @@
+import os
+import hashlib
+
+def parse_shard(text):
+    """Parse a shard spec like "2/4" into (2, 4).
+
+    Shards are numbered from 1, so a build split four ways runs 1/4 to 4/4.
+
+    Raises:
+        ValueError: If the spec is malformed or out of range
+    """
+    try:
+        index, count = (int(part) for part in text.split("/"))
+    except ValueError:
+        raise ValueError(f"shard must look like i/N, got {text!r}")
+    if not 1 <= index <= count:
+        raise ValueError(f"shard index must be between 1 and {count}, got {index}")
+    return index, count
+
+def in_shard(rel_path, shard):
+    """Check whether a source belongs to a shard.
+
+    The partition depends only on the path, so every runner agrees on it
+    without coordinating, and a page stays in the same shard between builds.
+
+    Args:
+        rel_path (str): Source path relative to its content or static directory
+        shard (tuple): (index, count) as returned by parse_shard, or None for all
+
+    Returns:
+        bool: True if the source is built by this shard
+    """
+    if shard is None:
+        return True
+    index, count = shard
+    digest = hashlib.sha256(rel_path.encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % count == index - 1
+
+def shard_dir(docs_dir, shard):
+    """Return the output directory of a shard, e.g. docs-shards/2-of-4 next to docs."""
+    index, count = shard
+    return os.path.join(f"{docs_dir}-shards", f"{index}-of-{count}")
@@ -0,0 +1,144 @@
+import os
+import re
+
+# {{ Title }}, {{ Content }} and any other named placeholder
+SLOT_PATTERN = re.compile(r"\{\{ (\w+) \}\}")
+
+# An optional first line in a markdown page choosing a named template
+TEMPLATE_DIRECTIVE = re.compile(r"\A<!--\s*template:\s*([\w.-]+)\s*-->[ \t]*(?:\n|\Z)")
+
+# An absolute href or src URL, up to any query or fragment
+ASSET_URL = re.compile(r'(href|src)="/([^"?#]*)')
+
+_cache = {}
+
+def asset_references(html):
+    """Return the site paths of the absolute href and src URLs in html, in order."""
+    return [match.group(2) for match in ASSET_URL.finditer(html)]
+
+class CompiledTemplate():
+    """A template split once into literal segments and named slots.
+
+    literals always has one more entry than slots: the page is
+    literals[0] + value(slots[0]) + literals[1] + ... + literals[-1].
+    """
+
+    def __init__(self, literals, slots):
+        self.literals = literals
+        self.slots = slots
+
+    def iter_chunks(self, values):
+        """Yield the filled-in page in chunks.
+
+        Args:
+            values (dict): Slot name to either a string, or a callable returning
+                an iterable of string chunks (called once per occurrence of the
+                slot, so streamed content can fill a slot used more than once).
+                Slots without a value are left as written in the template.
+        """
+        yield self.literals[0]
+        for slot, literal in zip(self.slots, self.literals[1:]):
+            value = values.get(slot)
+            if value is None:
+                yield f"{{{{ {slot} }}}}"
+            elif isinstance(value, str):
+                yield value
+            else:
+                yield from value()
+            yield literal
+
+    def render(self, values):
+        """Return the filled-in page as a single string."""
+        return "".join(self.iter_chunks(values))
+
+    def write(self, fp, values):
+        """Write the filled-in page to a file object chunk by chunk."""
+        for chunk in self.iter_chunks(values):
+            fp.write(chunk)
+
+def compile_template(text, urls=None):
+    """Split template text into literals and slots, resolving its links.
+
+    Args:
+        text (str): Template source
+        urls (UrlResolver, optional): Resolves the absolute href and src URLs
+            in the template itself. Without one they are kept as written.
+
+    Returns:
+        CompiledTemplate: The compiled template
+    """
+    pieces = SLOT_PATTERN.split(text)
+    literals = pieces[0::2]
+    if urls is not None:
+        literals = [urls.resolve_html(literal) for literal in literals]
+    return CompiledTemplate(literals, pieces[1::2])
+
+def load_template(path, urls=None):
+    """Return the compiled template for a file, compiling it at most once per change.
+
+    Compiled templates are cached per process by path and by the context of
+    the resolver their links were resolved with, see UrlResolver, and the
+    cache entry is reused for as long as the file's mtime stays the same.
+    With relative URLs that is one entry per directory of pages.
+
+    Args:
+        path (str): Path to the HTML template file
+        urls (UrlResolver, optional): Resolves the template's links, see compile_template
+
+    Returns:
+        CompiledTemplate: The compiled template
+    """
+    key = (os.path.abspath(path), urls.context if urls is not None else None)
+    mtime = os.stat(path).st_mtime_ns
+    cached = _cache.get(key)
+    if cached is not None and cached[0] == mtime:
+        return cached[1]
+    with open(path, "r") as f:
+        compiled = compile_template(f.read(), urls)
+    _cache[key] = (mtime, compiled)
+    return compiled
+
+def split_template_directive(markdown):
+    """Strip a leading <!-- template: name --> line from a page.
+
+    Args:
+        markdown (str): Page source
+
+    Returns:
+        tuple: (template name or None, markdown without the directive line)
+    """
+    match = TEMPLATE_DIRECTIVE.match(markdown)
+    if match is None:
+        return None, markdown
+    return match.group(1), markdown[match.end():]
+
+def source_template_name(data):
+    """Return the template named on the first line of a page's source, if any.
+
+    Args:
+        data (bytes or mmap): The markdown file's contents as read, so the
+            name is found without opening the file again
+
+    Returns:
+        str: The template name, or None for the default template
+    """
+    end = data.find(b"\n")
+    first_line = data[:len(data) if end == -1 else end + 1]
+    return split_template_directive(str(first_line, "utf-8").replace("\r\n", "\n"))[0]
+
+def select_template_path(template_path, name):
+    """Find the template file for a page.
+
+    Named templates live in a templates/ directory next to the default
+    template, so "blog" resolves to templates/blog.html.
+
+    Args:
+        template_path (str): Path to the default template
+        name (str): Template name chosen by the page, or None for the default
+
+    Returns:
+        str: Path of the template to use
+    """
+    if name is None:
+        return template_path
+    return os.path.join(os.path.dirname(template_path), "templates", f"{name}.html")
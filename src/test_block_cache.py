@@ -0,0 +1,57 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from block_cache import BlockCache, DiskBlockCache
+from markdown_parser import markdown_to_html_node
+
+
+class TestBlockCache(unittest.TestCase):
+    def test_hits_and_misses(self):
+        cache = BlockCache()
+        key = cache.key("- item")
+        self.assertIsNone(cache.get(key))
+        cache.put(key, "<ul><li>item</li></ul>")
+        self.assertEqual(cache.get(key), "<ul><li>item</li></ul>")
+        self.assertEqual(cache.stats(), {"hits": 1, "misses": 1, "size": 1})
+
+    def test_least_recently_used_is_evicted(self):
+        cache = BlockCache(maxsize=2)
+        cache.put("a", "1")
+        cache.put("b", "2")
+        cache.get("a")
+        cache.put("c", "3")
+        self.assertEqual(len(cache), 2)
+        self.assertIsNone(cache.get("b"))
+        self.assertEqual(cache.get("a"), "1")
+        self.assertEqual(cache.get("c"), "3")
+
+    def test_markdown_to_html_node_with_cache(self):
+        md = "# Title\n\nShared **disclaimer**\n\n- one\n- two\n\nShared **disclaimer**"
+        cache = BlockCache()
+        cached = markdown_to_html_node(md, cache=cache).to_html()
+        self.assertEqual(cached, markdown_to_html_node(md).to_html())
+        self.assertEqual((cache.hits, cache.misses), (1, 3))
+
+        markdown_to_html_node(md, cache=cache)
+        self.assertEqual((cache.hits, cache.misses), (5, 3))
+
+    def test_disk_cache_round_trip(self):
+        root = tempfile.mkdtemp()
+        try:
+            path = os.path.join(root, "cache", "blocks.json")
+            cache = DiskBlockCache(path)
+            markdown_to_html_node("# Title\n\nBody", cache=cache)
+            cache.save()
+
+            reloaded = DiskBlockCache(path)
+            html = markdown_to_html_node("# Title\n\nBody", cache=reloaded).to_html()
+            self.assertEqual(html, "<div><h1>Title</h1><p>Body</p></div>")
+            self.assertEqual((reloaded.hits, reloaded.misses), (2, 0))
+        finally:
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import os
+import gzip
+import shutil
+import tempfile
+import unittest
+
+from compress import compress_outputs, remove_compressed
+from manifest import BuildManifest, MANIFEST_NAME
+from testutil import write_file
+
+
+class TestCompressOutputs(unittest.TestCase):
+    def setUp(self):
+        self.docs = tempfile.mkdtemp()
+        self.manifest = BuildManifest(os.path.join(self.docs, MANIFEST_NAME))
+        write_file(os.path.join(self.docs, "index.html"), "<p>hello</p>" * 200)
+        write_file(os.path.join(self.docs, "css", "main.css"), "body {}")
+        write_file(os.path.join(self.docs, "images", "a.png"), "png" * 1000)
+
+    def tearDown(self):
+        shutil.rmtree(self.docs)
+
+    def compress(self):
+        return compress_outputs(self.docs, self.manifest, min_size=100, formats=["gz"])
+
+    def test_writes_siblings_above_threshold(self):
+        self.assertEqual(self.compress(), ["index.html.gz"])
+        with gzip.open(os.path.join(self.docs, "index.html.gz"), "rt") as f:
+            self.assertEqual(f.read(), "<p>hello</p>" * 200)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "css", "main.css.gz")))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images", "a.png.gz")))
+
+    def test_unchanged_content_is_not_recompressed(self):
+        self.compress()
+        os.utime(os.path.join(self.docs, "index.html.gz"), ns=(0, 0))
+        self.assertEqual(self.compress(), [])
+        self.assertEqual(os.stat(os.path.join(self.docs, "index.html.gz")).st_mtime_ns, 0)
+        write_file(os.path.join(self.docs, "index.html"), "<p>changed</p>" * 200)
+        self.assertEqual(self.compress(), ["index.html.gz"])
+
+    def test_stale_siblings_are_removed(self):
+        self.compress()
+        os.remove(os.path.join(self.docs, "index.html"))
+        self.assertEqual(self.compress(), ["index.html.gz"])
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "index.html.gz")))
+        self.assertEqual(self.manifest.compressed, {})
+
+    def test_remove_compressed(self):
+        self.compress()
+        self.assertEqual(remove_compressed(self.docs, self.manifest), ["index.html.gz"])
+        self.assertEqual(sorted(os.listdir(self.docs)), ["css", "images", "index.html"])
+
+
+if __name__ == "__main__":
+    unittest.main()
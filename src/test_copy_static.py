@@ -0,0 +1,131 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from copy_static import copy_static, fingerprint_assets, sync_static, write_asset_manifest
+from manifest import ASSET_MANIFEST_NAME, BuildManifest
+from testutil import write_file
+
+
+class TestCopyStatic(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.static = os.path.join(self.root, "static")
+        self.docs = os.path.join(self.root, "docs")
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+        write_file(os.path.join(self.static, "images", "a.png"), "png")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def read(self, rel_path):
+        with open(os.path.join(self.docs, rel_path)) as f:
+            return f.read()
+
+    def test_copy_static(self):
+        write_file(os.path.join(self.docs, "old.html"), "old")
+        copy_static(self.static, self.docs)
+        self.assertEqual(self.read("images/a.png"), "png")
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "old.html")))
+
+    def test_sync_copies_only_changed_files(self):
+        self.assertEqual(sorted(sync_static(self.static, self.docs, link=False)), ["images/a.png", "index.css"])
+        self.assertEqual(sync_static(self.static, self.docs, link=False), [])
+
+        write_file(os.path.join(self.static, "index.css"), "body { color: red }")
+        self.assertEqual(sync_static(self.static, self.docs, link=False), ["index.css"])
+        self.assertEqual(self.read("index.css"), "body { color: red }")
+
+    def test_sync_hash_comparison_skips_touched_files(self):
+        sync_static(self.static, self.docs, link=False)
+        os.utime(os.path.join(self.static, "index.css"), ns=(0, 0))
+        self.assertEqual(sync_static(self.static, self.docs, compare_hash=True, link=False), [])
+        self.assertEqual(os.stat(os.path.join(self.docs, "index.css")).st_mtime_ns, 0)
+
+        os.utime(os.path.join(self.static, "index.css"), ns=(10**9, 10**9))
+        self.assertEqual(sync_static(self.static, self.docs, link=False), ["index.css"])
+
+    def test_sync_hardlinks_on_same_filesystem(self):
+        sync_static(self.static, self.docs)
+        self.assertTrue(os.path.samefile(os.path.join(self.static, "index.css"),
+                                         os.path.join(self.docs, "index.css")))
+
+    def test_sync_reports_hardlinked_files_edited_in_place(self):
+        manifest = BuildManifest(os.path.join(self.docs, ".build-manifest.json"))
+        sync_static(self.static, self.docs, manifest)
+        self.assertEqual(sync_static(self.static, self.docs, manifest), [])
+        path = os.path.join(self.static, "index.css")
+        with open(path, "w") as f:
+            f.write("body { color: red }")
+        os.utime(path, ns=(10**9, 10**9))
+        self.assertEqual(sync_static(self.static, self.docs, manifest), ["index.css"])
+        self.assertEqual(sync_static(self.static, self.docs, manifest), [])
+        # With compare_hash the hash is recorded, then only a change of contents counts
+        os.utime(path, ns=(2 * 10**9, 2 * 10**9))
+        self.assertEqual(sync_static(self.static, self.docs, manifest, compare_hash=True), ["index.css"])
+        os.utime(path, ns=(3 * 10**9, 3 * 10**9))
+        self.assertEqual(sync_static(self.static, self.docs, manifest, compare_hash=True), [])
+
+    def test_sync_removes_only_stale_static_files(self):
+        manifest = BuildManifest(os.path.join(self.docs, "manifest.json"))
+        sync_static(self.static, self.docs, manifest)
+        write_file(os.path.join(self.docs, "index.html"), "generated page")
+        os.remove(os.path.join(self.static, "images", "a.png"))
+
+        self.assertEqual(sync_static(self.static, self.docs, manifest), ["images/a.png"])
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images")))
+        self.assertEqual(self.read("index.html"), "generated page")
+        self.assertEqual(list(manifest.static), ["index.css"])
+
+    def test_sync_fingerprinted_assets(self):
+        manifest = BuildManifest(os.path.join(self.docs, ".build-manifest.json"))
+        assets = fingerprint_assets(self.static)
+        self.assertRegex(assets["index.css"], r"^index\.[0-9a-f]{8}\.css$")
+        self.assertRegex(assets["images/a.png"], r"^images/a\.[0-9a-f]{8}\.png$")
+        self.assertEqual(sorted(sync_static(self.static, self.docs, manifest, link=False, assets=assets)),
+                         sorted([*assets, *assets.values()]))
+        # The originals stay, for url() references in stylesheets and relative links
+        self.assertEqual(self.read("index.css"), "body {}")
+        self.assertEqual(write_asset_manifest(self.docs, assets), [ASSET_MANIFEST_NAME])
+        self.assertEqual(json.loads(self.read(ASSET_MANIFEST_NAME)), assets)
+
+        # A changed file gets a new name and its old copy is removed
+        old_name = assets["index.css"]
+        write_file(os.path.join(self.static, "index.css"), "body { margin: 0; }")
+        assets = fingerprint_assets(self.static)
+        self.assertNotEqual(assets["index.css"], old_name)
+        self.assertEqual(sync_static(self.static, self.docs, manifest, link=False, assets=assets),
+                         ["index.css", assets["index.css"], old_name])
+        self.assertEqual(self.read(assets["index.css"]), "body { margin: 0; }")
+        self.assertEqual(self.read("index.css"), "body { margin: 0; }")
+        self.assertFalse(os.path.exists(os.path.join(self.docs, old_name)))
+
+        # Files that are looked up by name keep it
+        for name in ("robots.txt", "favicon.ico", "CNAME", ".htaccess"):
+            write_file(os.path.join(self.static, name), name)
+        assets = fingerprint_assets(self.static)
+        self.assertEqual(sorted(assets), ["images/a.png", "index.css"])
+        sync_static(self.static, self.docs, manifest, link=False, assets=assets)
+        self.assertEqual(self.read("favicon.ico"), "favicon.ico")
+        self.assertEqual(self.read(".htaccess"), ".htaccess")
+        for name in ("robots.txt", "favicon.ico", "CNAME", ".htaccess"):
+            os.remove(os.path.join(self.static, name))
+
+        # A deleted asset loses both copies, and a full build keeps both of the others
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        assets = fingerprint_assets(self.static)
+        sync_static(self.static, self.docs, manifest, link=False, assets=assets)
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "images")))
+        self.assertEqual(manifest.remove_unrecorded(self.docs), [ASSET_MANIFEST_NAME])
+        self.assertEqual(sorted(os.listdir(self.docs)), sorted(["index.css", assets["index.css"]]))
+
+        # Turning fingerprinting off goes back to the plain names
+        sync_static(self.static, self.docs, manifest, link=False)
+        self.assertEqual(write_asset_manifest(self.docs, {}), [])
+        self.assertEqual(sorted(os.listdir(self.docs)), ["index.css"])
+
+
+if __name__ == "__main__":
+    unittest.main()
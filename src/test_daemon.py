@@ -0,0 +1,131 @@
+import io
+import os
+import shutil
+import socketserver
+import tempfile
+import threading
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+import client
+from client import NoDaemonError, request_build
+from daemon import BuildDaemon
+from main import build, parse_args
+from testutil import read_tree, write_file
+
+
+class TestBuildDaemon(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        write_file(os.path.join(self.root, "template.html"), '<link href="/index.css">{{ Content }}')
+        write_file(os.path.join(self.root, "static", "index.css"), "body {}")
+        for i in range(4):
+            write_file(os.path.join(self.root, "content", f"page{i}.md"), f"# Page {i}\n\n[Home](/)")
+        self.socket = os.path.join(self.root, "daemon.sock")
+        self.daemon = BuildDaemon(self.socket, self.root)
+        threading.Thread(target=self.daemon.serve_forever, daemon=True).start()
+
+    def tearDown(self):
+        self.daemon.shutdown()
+        self.daemon.server_close()
+        shutil.rmtree(self.root)
+
+    def page(self, index):
+        return os.path.join(self.root, "content", f"page{index}.md")
+
+    def request(self, *argv):
+        out = io.StringIO()
+        status = request_build(list(argv), self.socket, out)
+        return status, out.getvalue()
+
+    def test_warm_builds_match_a_cold_build(self):
+        options = ["/site/", "--fingerprint", "--search-index", "--io-workers", "0", "--verbose"]
+        status, output = self.request(*options)
+        self.assertEqual(status, 0)
+        self.assertIn("Block cache: 3 hits, 5 misses", output)
+        docs = os.path.join(self.root, "docs")
+        warm = read_tree(docs)
+
+        # The warm manifest and block cache carry over to the next build
+        status, output = self.request(*options, "--incremental")
+        self.assertIn("Changed files: 0", output)
+        status, output = self.request(*options)
+        self.assertIn("Block cache: 8 hits, 0 misses", output)
+
+        write_file(self.page(1), "# Changed")
+        status, output = self.request(*options, "--incremental", "--explain", self.page(1))
+        self.assertIn("page1.md was rebuilt: source changed", output)
+        self.assertNotIn("page0.md", output)
+        warm = read_tree(docs)
+
+        shutil.rmtree(docs)
+        build(parse_args(options), self.root)
+        self.assertEqual(read_tree(docs), warm)
+
+    def test_cold_builds_in_between_are_picked_up(self):
+        self.request("--io-workers", "0")
+        os.remove(self.page(3))
+        build(parse_args(["--incremental", "--io-workers", "0"]), self.root)
+        write_file(self.page(3), "# Back")
+        status, output = self.request("--incremental", "--io-workers", "0", "--explain", self.page(3))
+        self.assertIn("page3.md was rebuilt: not built before", output)
+
+    def test_log_and_worker_output_reach_the_client(self):
+        status, output = self.request("--jobs", "2")
+        self.assertEqual(status, 0)
+        self.assertIn("INFO:copy_static:Static sync: 1 linked, 0 copied, 0 unchanged, 0 removed\n", output)
+        lines = output.splitlines()
+        for i in range(4):
+            md_path = self.page(i)
+            html_path = os.path.join(self.root, "docs", f"page{i}.html")
+            self.assertIn(f"Generating page from {md_path} to {html_path} "
+                          f"using {os.path.join(self.root, 'template.html')}", lines)
+
+    def test_bad_options_report_their_status(self):
+        status, output = self.request("--jobs", "many")
+        self.assertEqual(status, 2)
+        self.assertIn("invalid int value", output)
+
+    def test_no_daemon(self):
+        with self.assertRaises(NoDaemonError):
+            request_build([], os.path.join(self.root, "missing.sock"))
+        with mock.patch.dict(os.environ, {"BUILD_DAEMON_SOCKET": os.path.join(self.root, "missing.sock")}), \
+                mock.patch("main.main", return_value=0) as build_main, redirect_stderr(io.StringIO()):
+            self.assertEqual(client.main(["--incremental"]), 0)
+        build_main.assert_called_once_with(["--incremental"])
+
+
+class TestClient(unittest.TestCase):
+    def test_daemon_lost_mid_build_is_an_error(self):
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                self.rfile.readline()
+                self.wfile.write(b'{"output": "Generating page\\n"}\n')
+
+        root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, root)
+        path = os.path.join(root, "daemon.sock")
+        server = socketserver.UnixStreamServer(path, Handler)
+        self.addCleanup(server.server_close)
+        threading.Thread(target=server.handle_request, daemon=True).start()
+        out, errors = io.StringIO(), io.StringIO()
+        with mock.patch.dict(os.environ, {"BUILD_DAEMON_SOCKET": path}), \
+                mock.patch("main.main", return_value=0) as build_main, redirect_stdout(out), redirect_stderr(errors):
+            self.assertEqual(client.main([]), 1)
+        build_main.assert_not_called()
+        self.assertEqual(out.getvalue(), "Generating page\n")
+        self.assertIn("Build daemon failed mid-build", errors.getvalue())
+
+    def test_commands_run_locally(self):
+        for command in client.LOCAL_COMMANDS:
+            with self.subTest(command=command):
+                with mock.patch("client.request_build") as request, \
+                        mock.patch("main.main", return_value=0) as build_main:
+                    self.assertEqual(client.main([command, "--help"]), 0)
+                request.assert_not_called()
+                build_main.assert_called_once_with([command, "--help"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,35 @@
+import unittest
+
+from dependencies import site_path, resolve_page, page_dependencies
+
+
+class TestDependencies(unittest.TestCase):
+    def test_site_path(self):
+        self.assertEqual(site_path("/blog/post", "index.md"), "blog/post")
+        self.assertEqual(site_path("../about", "blog/post.md"), "about")
+        self.assertEqual(site_path("img/a.png?v=1#top", "blog/post.md"), "blog/img/a.png")
+        self.assertEqual(site_path("/", "blog/post.md"), "")
+        self.assertIsNone(site_path("https://www.boot.dev", "index.md"))
+        self.assertIsNone(site_path("#section", "index.md"))
+
+    def test_resolve_page(self):
+        pages = {"index.md", "blog/post.md", "blog/tom/index.md"}
+        self.assertEqual(resolve_page("", pages), "index.md")
+        self.assertEqual(resolve_page("blog/post", pages), "blog/post.md")
+        self.assertEqual(resolve_page("blog/post.html", pages), "blog/post.md")
+        self.assertEqual(resolve_page("blog/tom", pages), "blog/tom/index.md")
+        self.assertIsNone(resolve_page("contact", pages))
+
+    def test_page_dependencies(self):
+        links = ["/blog/post", "/contact", "/files/cv.pdf", "https://www.boot.dev"]
+        self.assertEqual(
+            page_dependencies(links, ["/images/a.png"], "index.md", {"index.md", "blog/post.md"}),
+            {
+                "links": {"blog/post": "blog/post.md", "contact": None},
+                "assets": ["files/cv.pdf", "images/a.png"],
+            },
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
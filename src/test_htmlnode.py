@@ -28,4 +28,38 @@ class TestHtmlNode(unittest.TestCase):
       node = TextNode("This is a text node", TextType.TEXT)
       html_node = text_node_to_html_node(node)
       self.assertEqual(html_node.tag, None)
-      self.assertEqual(html_node.value, "This is a text node")
\ No newline at end of file
+      self.assertEqual(html_node.value, "This is a text node")
+
+    def test_eq_ignores_prop_order(self):
+        node = HTMLNode("img", props={"src": "a.png", "alt": "a"})
+        node2 = HTMLNode("img", props={"alt": "a", "src": "a.png"})
+        self.assertEqual(node, node2)
+        self.assertNotEqual(node, HTMLNode("img", props={"src": "b.png", "alt": "a"}))
+        self.assertNotEqual(HTMLNode("p", props={}), HTMLNode("p"))
+
+    def test_props_round_trip(self):
+        node = HTMLNode("a", props={"href": "/x", "class": "y"})
+        self.assertEqual(node.props, {"href": "/x", "class": "y"})
+        node.props = None
+        self.assertEqual(node.props, None)
+        self.assertEqual(node.props_to_html(), '')
+
+    def test_nodes_are_slotted(self):
+        node = text_node_to_html_node(TextNode("link", TextType.LINK, "/x"))
+        node2 = text_node_to_html_node(TextNode("other", TextType.LINK, "/y"))
+        self.assertFalse(hasattr(node, "__dict__"))
+        self.assertIs(node._prop_keys, node2._prop_keys)
+        self.assertEqual(node.to_html(), '<a href="/x">link</a>')
+
+
+    def test_props_can_be_changed_in_place(self):
+        node = HTMLNode("a", "link", props={"href": "/"})
+        node.props["class"] = "nav"
+        node.props["href"] = "/home"
+        self.assertEqual(node.props, {"href": "/home", "class": "nav"})
+        self.assertEqual(node.props_to_html(), ' href="/home" class="nav"')
+        self.assertEqual(node, HTMLNode("a", "link", props={"class": "nav", "href": "/home"}))
+        self.assertNotEqual(node, HTMLNode("a", "link", props={"href": "/"}))
+        link = text_node_to_html_node(TextNode("link", TextType.LINK, "/x"))
+        link.props["class"] = "nav"
+        self.assertEqual(link.to_html(), '<a href="/x" class="nav">link</a>')
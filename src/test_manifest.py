@@ -0,0 +1,221 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+from contextlib import redirect_stderr, redirect_stdout
+from unittest import mock
+
+from main import build, parse_args
+from manifest import BuildManifest, MANIFEST_NAME
+from copy_static import fingerprint_assets, sync_static
+from page_generator import generate_pages_recursive
+from pipeline import read_bytes
+from testutil import write_file
+
+
+class TestIncrementalBuild(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.docs = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        write_file(self.template, "<title>{{ Title }}</title><article>{{ Content }}</article>")
+        write_file(os.path.join(self.content, "index.md"), "# Home")
+        write_file(os.path.join(self.content, "blog", "post.md"), "# Post")
+        write_file(os.path.join(self.static, "css", "main.css"), "body {}")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def build(self, basepath="/"):
+        manifest = BuildManifest.load(os.path.join(self.docs, MANIFEST_NAME))
+        changed = sync_static(self.static, self.docs, manifest)
+        self.rebuilt = generate_pages_recursive(self.content, self.template, self.docs, basepath,
+                                                manifest=manifest, changed_assets=set(changed))
+        manifest.save()
+        return manifest
+
+    def mtime(self, rel_path):
+        return os.stat(os.path.join(self.docs, rel_path)).st_mtime_ns
+
+    def test_manifest_round_trip(self):
+        manifest = self.build()
+        loaded = BuildManifest.load(manifest.path)
+        self.assertEqual(loaded.pages, manifest.pages)
+        self.assertEqual(loaded.static, manifest.static)
+        self.assertEqual(sorted(loaded.pages), ["blog/post.md", "index.md"])
+        self.assertEqual(loaded.pages["blog/post.md"]["output"], "blog/post.html")
+
+    def test_unchanged_pages_are_skipped(self):
+        self.build()
+        os.utime(os.path.join(self.docs, "index.html"), ns=(0, 0))
+        os.utime(os.path.join(self.docs, "css", "main.css"), ns=(0, 0))
+        self.build()
+        self.assertEqual(self.mtime("index.html"), 0)
+        self.assertEqual(self.mtime("css/main.css"), 0)
+
+    def test_changed_page_is_rebuilt(self):
+        self.build()
+        os.utime(os.path.join(self.docs, "index.html"), ns=(0, 0))
+        os.utime(os.path.join(self.docs, "blog", "post.html"), ns=(0, 0))
+        write_file(os.path.join(self.content, "index.md"), "# Home again")
+        self.build()
+        self.assertNotEqual(self.mtime("index.html"), 0)
+        self.assertEqual(self.mtime("blog/post.html"), 0)
+
+    def test_sources_are_read_once(self):
+        write_file(os.path.join(self.root, "templates", "post.html"), "<h1>{{ Title }}</h1>{{ Content }}")
+        write_file(os.path.join(self.content, "blog", "post.md"), "<!-- template: post -->\n# Post")
+        self.build()
+        write_file(os.path.join(self.content, "index.md"), "# Home again")
+        for io_workers in (0, 2):
+            with self.subTest(io_workers=io_workers):
+                reads = []
+                manifest = BuildManifest.load(os.path.join(self.docs, MANIFEST_NAME))
+                with mock.patch("page_generator.read_bytes", side_effect=lambda path: reads.append(path) or
+                                read_bytes(path)):
+                    rebuilt = generate_pages_recursive(self.content, self.template, self.docs, "/",
+                                                       manifest=manifest, io_workers=io_workers)
+                self.assertEqual(sorted(reads), [os.path.join(self.content, "blog", "post.md"),
+                                                 os.path.join(self.content, "index.md")])
+                self.assertEqual(rebuilt, {"index.md": ["source changed"]})
+                self.assertEqual(manifest.pages["blog/post.md"]["template_path"], "templates/post.html")
+
+    def test_full_build_records_without_checking(self):
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n[Post](/blog/post)")
+        expected = self.build().pages
+        for io_workers, jobs in ((0, 1), (2, 1), (0, 2)):
+            with self.subTest(io_workers=io_workers, jobs=jobs):
+                manifest = BuildManifest(os.path.join(self.docs, MANIFEST_NAME))
+                with mock.patch.object(BuildManifest, "stale_reasons", side_effect=AssertionError):
+                    rebuilt = generate_pages_recursive(self.content, self.template, self.docs, "/",
+                                                       manifest=manifest, io_workers=io_workers, jobs=jobs,
+                                                       rebuild_all=True)
+                self.assertEqual(rebuilt, {"index.md": ["full build"], "blog/post.md": ["full build"]})
+                self.assertEqual(manifest.pages, expected)
+
+    def test_explain_requires_incremental(self):
+        with redirect_stderr(io.StringIO()), self.assertRaises(SystemExit):
+            parse_args(["--explain", "content/index.md"])
+        self.assertEqual(parse_args(["--incremental", "--explain", "content/index.md"]).explain,
+                         "content/index.md")
+
+    def test_basepath_change_rebuilds_everything(self):
+        # Link to something so the page's bytes depend on the basepath
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n[Post](/blog/post)")
+        self.build()
+        os.utime(os.path.join(self.docs, "index.html"), ns=(0, 0))
+        self.build(basepath="/site/")
+        self.assertNotEqual(self.mtime("index.html"), 0)
+
+    def test_deleted_sources_are_pruned(self):
+        self.build()
+        os.remove(os.path.join(self.content, "blog", "post.md"))
+        os.remove(os.path.join(self.static, "css", "main.css"))
+        manifest = self.build()
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "blog")))
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "css")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "index.html")))
+        self.assertEqual(list(manifest.pages), ["index.md"])
+        self.assertEqual(manifest.static, {})
+
+    def test_remove_unrecorded(self):
+        manifest = self.build()
+        write_file(os.path.join(self.docs, "old", "page.html"), "old")
+        self.assertEqual(manifest.remove_unrecorded(self.docs), ["old/page.html"])
+        self.assertFalse(os.path.exists(os.path.join(self.docs, "old")))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, MANIFEST_NAME)))
+        self.assertTrue(os.path.exists(os.path.join(self.docs, "css", "main.css")))
+
+    def test_dependencies_are_recorded(self):
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n[Post](/blog/post) ![css](/css/main.css)")
+        manifest = self.build()
+        entry = BuildManifest.load(manifest.path).pages["index.md"]
+        self.assertEqual(entry["template_path"], "template.html")
+        self.assertEqual(entry["links"], {"blog/post": "blog/post.md"})
+        self.assertEqual(entry["assets"], ["css/main.css"])
+
+    def test_linked_page_added_rebuilds_linking_pages(self):
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n[About](/about)")
+        self.build()
+        write_file(os.path.join(self.content, "about.md"), "# About")
+        self.build()
+        self.assertEqual(self.rebuilt, {
+            "about.md": ["not built before"],
+            "index.md": ["linked page about.md was added"],
+        })
+
+    def test_changed_asset_rebuilds_referencing_pages(self):
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n![css](/css/main.css)")
+        self.build()
+        # Edited in place, so the hardlinked copy in docs changes along with it
+        self.edit_in_place(os.path.join(self.static, "css", "main.css"), "body { color: red; }")
+        self.build()
+        self.assertEqual(self.rebuilt, {"index.md": ["asset css/main.css changed"]})
+
+    def edit_in_place(self, path, text):
+        inode = os.stat(path).st_ino
+        with open(path, "r+") as f:
+            f.truncate()
+            f.write(text)
+        st = os.stat(path)
+        os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 10**9))
+        self.assertEqual(os.stat(path).st_ino, inode)
+
+    def test_static_edited_in_place_is_a_changed_file(self):
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n![css](/css/main.css)")
+        changed = os.path.join(self.root, "changed.txt")
+        with redirect_stdout(io.StringIO()):
+            build(parse_args(["--io-workers", "0"]), self.root)
+            self.assertTrue(os.path.samefile(os.path.join(self.static, "css", "main.css"),
+                                             os.path.join(self.docs, "css", "main.css")))
+            self.edit_in_place(os.path.join(self.static, "css", "main.css"), "body { color: red; }")
+            for options in (["--incremental"], []):
+                with self.subTest(options=options):
+                    build(parse_args(["--io-workers", "0", "--changed-files", changed, *options]), self.root)
+                    with open(changed) as f:
+                        self.assertIn("css/main.css", f.read().split())
+                    # Reported once, the next build finds it current
+                    build(parse_args(["--io-workers", "0", "--changed-files", changed, *options]), self.root)
+                    with open(changed) as f:
+                        self.assertNotIn("css/main.css", f.read().split())
+                    self.edit_in_place(os.path.join(self.static, "css", "main.css"), "body { color: blue; }")
+
+    def test_renamed_asset_rebuilds_pages_and_templates_linking_it(self):
+        def build():
+            manifest = BuildManifest.load(os.path.join(self.docs, MANIFEST_NAME))
+            assets = fingerprint_assets(self.static)
+            renamed = manifest.record_assets(assets)
+            changed = sync_static(self.static, self.docs, manifest, assets=assets)
+            self.rebuilt = generate_pages_recursive(self.content, self.template, self.docs, "/",
+                                                    manifest=manifest, assets=assets,
+                                                    changed_assets=set(changed) | set(renamed))
+            manifest.save()
+            return assets
+
+        write_file(self.template, '<link href="/css/main.css"><title>{{ Title }}</title>{{ Content }}')
+        write_file(os.path.join(self.static, "images", "a.png"), "png")
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n![a](/images/a.png)")
+        build()
+        self.assertEqual(build(), BuildManifest.load(os.path.join(self.docs, MANIFEST_NAME)).assets)
+        self.assertEqual(self.rebuilt, {})
+
+        os.remove(os.path.join(self.static, "images", "a.png"))
+        write_file(os.path.join(self.static, "images", "a.png"), "new png")
+        assets = build()
+        self.assertEqual(self.rebuilt, {"index.md": ["asset images/a.png changed"]})
+        with open(os.path.join(self.docs, "index.html")) as f:
+            self.assertIn(f'src="/{assets["images/a.png"]}"', f.read())
+
+        os.remove(os.path.join(self.static, "css", "main.css"))
+        write_file(os.path.join(self.static, "css", "main.css"), "body { color: red; }")
+        assets = build()
+        self.assertEqual(sorted(self.rebuilt), ["blog/post.md", "index.md"])
+        with open(os.path.join(self.docs, "blog", "post.html")) as f:
+            self.assertIn(f'href="/{assets["css/main.css"]}"', f.read())
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -7,11 +7,19 @@ from markdown_parser import (
     split_nodes_link,
     text_to_textnodes,
     markdown_to_blocks,
+    scan_blocks,
+    classify_block,
     block_to_block_type,
     BlockType,
     markdown_to_html_node,
-    extract_title,
+    markdown_to_html,
+    extract_heading_title,
+    iter_blocks,
+    markdown_to_html_chunks,
+    MappedMarkdown,
+    PageFacts,
 )
+from block_cache import BlockCache
 from textnode import TextNode, TextType
 
 class TestMarkdownParser(unittest.TestCase):
@@ -235,30 +243,218 @@ This is text that _should_ remain\nthe **same** even with inline stuff\n```
             "<div><pre><code>This is text that _should_ remain\nthe **same** even with inline stuff\n</code></pre></div>",
         )
 
-    def test_simple_title(self):
-        markdown = "# My Title"
-        self.assertEqual(extract_title(markdown), "My Title")
-
-    def test_title_with_extra_spaces(self):
-        markdown = "#   My Title"
-        self.assertEqual(extract_title(markdown), "My Title")
-
-    def test_title_with_multiple_hashes(self):
-        markdown = "### My Title"
-        self.assertEqual(extract_title(markdown), "My Title")
-
-    def test_no_title(self):
-        markdown = "This is not a title"
-        with self.assertRaises(Exception) as context:
-            extract_title(markdown)
-        self.assertEqual(str(context.exception), "no title in markdown found")
-
-    def test_empty_string(self):
-        markdown = ""
-        with self.assertRaises(Exception) as context:
-            extract_title(markdown)
-        self.assertEqual(str(context.exception), "no title in markdown found")
-
-    def test_title_with_content_after(self):
-        markdown = "# My Title\nSome content after"
-        self.assertEqual(extract_title(markdown), "My Title\nSome content after")
\ No newline at end of file
+    def test_heading_title(self):
+        markdown = "Intro with a #hashtag\n\n```\n# not a heading\n```\n\n##  My Title\nwraps\n\n# Later"
+        self.assertEqual(extract_heading_title(markdown), "My Title wraps")
+        self.assertEqual(extract_heading_title(MappedMarkdown(markdown.encode("utf-8"))), "My Title wraps")
+        for markdown in ("", "#hashtag only", "```\n# code\n```"):
+            with self.assertRaises(Exception) as context:
+                extract_heading_title(markdown)
+            self.assertEqual(str(context.exception), "no title in markdown found")
+
+
+def split_pipeline(text):
+    """The original five-pass inline pipeline, kept as the reference for the scanner."""
+    nodes = [TextNode(text, TextType.TEXT)]
+    nodes = split_nodes_delimiter(nodes, "**", TextType.BOLD)
+    nodes = split_nodes_delimiter(nodes, "_", TextType.ITALIC)
+    nodes = split_nodes_delimiter(nodes, "`", TextType.CODE)
+    nodes = split_nodes_image(nodes)
+    nodes = split_nodes_link(nodes)
+    return nodes
+
+
+class TestInlineScannerDifferential(unittest.TestCase):
+    cases = [
+        "This is text with a `code block` word",
+        "This is text with an ![image](https://i.imgur.com/zjjcJKZ.png) and another ![second image](https://i.imgur.com/3elNhQu.png)",
+        "This is text with a [link](https://www.boot.dev) and [another link](https://www.youtube.com)",
+        "This is **text** with an _italic_ word and a `code block` and an ![obi wan image](https://i.imgur.com/fJRm4Vk.jpeg) and a [link](https://boot.dev)",
+        "This is a paragraph of text. It has some **bold** and _italic_ words inside of it.",
+        "This is **bolded** paragraph text in a p tag here",
+        "This is another paragraph with _italic_ text and `code` here",
+        "Here's the deal, **I like Tolkien**.",
+        "**bold** at the start and `code` at the end `x`",
+        "![image](/images/tolkien.png)",
+        "plain text only",
+        "",
+    ]
+
+    def test_matches_split_pipeline(self):
+        for text in self.cases:
+            with self.subTest(text=text):
+                self.assertListEqual(text_to_textnodes(text), split_pipeline(text))
+
+    def test_unclosed_markers_stay_literal(self):
+        self.assertListEqual(
+            text_to_textnodes("snake_case and [not a link] or ![nor](an image"),
+            [TextNode("snake_case and [not a link] or ![nor](an image", TextType.TEXT)],
+        )
+
+    def test_markers_inside_link_urls_are_literal(self):
+        self.assertListEqual(
+            text_to_textnodes("see [docs](https://example.com/a_b_c) now"),
+            [
+                TextNode("see ", TextType.TEXT),
+                TextNode("docs", TextType.LINK, "https://example.com/a_b_c"),
+                TextNode(" now", TextType.TEXT),
+            ],
+        )
+
+
+class TestDirectRenderDifferential(unittest.TestCase):
+    cases = [
+        "This is **bolded** paragraph\ntext in a p\ntag here\n\nThis is another paragraph with _italic_ text and `code` here",
+        "```\nThis is text that _should_ remain\nthe **same** even with inline stuff\n```",
+        "# Heading 1\n\n## Heading _two_\n\n###### Heading 6",
+        "- item with **bold**\n- item with [link](https://boot.dev)\n\n1. first\n2. second `code`",
+        "> quoted _text_\n> across lines",
+        "Paragraph with ![image](/images/tolkien.png) and a [link](/blog/post)",
+        "# Title\n\nsnake_case and [not a link] stay literal",
+    ]
+
+    def test_matches_node_tree(self):
+        for markdown in self.cases:
+            with self.subTest(markdown=markdown):
+                self.assertEqual(markdown_to_html(markdown), markdown_to_html_node(markdown).to_html())
+
+    def test_empty_markdown_raises(self):
+        with self.assertRaises(ValueError):
+            markdown_to_html("")
+
+
+class TestPageFacts(unittest.TestCase):
+    markdown = (
+        "# [Home](/)\n\nSee ![map](/images/map.png) and [the post](blog/post).\n\n"
+        "```\n[not a link](/code)\n```\n\n- [a](/a)\n- ![b](/b.png)"
+    )
+
+    def render(self, engine, cache):
+        facts = PageFacts()
+        if engine == "node":
+            markdown_to_html_node(self.markdown, cache=cache, facts=facts)
+        elif engine == "direct":
+            markdown_to_html(self.markdown, cache=cache, facts=facts)
+        else:
+            "".join(markdown_to_html_chunks(self.markdown, cache=cache, facts=facts))
+        return facts.links, facts.images
+
+    def test_links_and_images_are_collected_as_blocks_render(self):
+        expected = (["/", "blog/post", "/a"], ["/images/map.png", "/b.png"])
+        for engine in ("node", "direct", "chunks"):
+            with self.subTest(engine=engine):
+                self.assertEqual(self.render(engine, None), expected)
+                cache = BlockCache()
+                self.assertEqual(self.render(engine, cache), expected)
+                # Cached blocks report the facts they were rendered with
+                self.assertEqual(self.render(engine, cache), expected)
+                self.assertEqual(cache.misses, 4)
+
+    def test_blocks_cached_without_facts_are_kept_apart(self):
+        cache = BlockCache()
+        markdown_to_html_node(self.markdown, cache=cache)
+        self.assertEqual(self.render("node", cache), (["/", "blog/post", "/a"], ["/images/map.png", "/b.png"]))
+
+
+class TestBlockScanner(unittest.TestCase):
+    def test_spans_slice_the_source(self):
+        markdown = "  # Heading  \n\n> quote\n> more\n\n\n1. one\n2. two\n"
+        self.assertListEqual(
+            [(block_type, markdown[start:end]) for block_type, start, end in scan_blocks(markdown)],
+            [
+                (BlockType.HEADING, "# Heading"),
+                (BlockType.QUOTE, "> quote\n> more"),
+                (BlockType.ORDERED_LIST, "1. one\n2. two"),
+            ],
+        )
+
+    def test_fenced_code_keeps_blank_lines(self):
+        markdown = "Intro\n\n```\nfirst\n\nsecond\n```\n\nOutro"
+        self.assertListEqual(
+            markdown_to_blocks(markdown),
+            ["Intro", "```\nfirst\n\nsecond\n```", "Outro"],
+        )
+        self.assertEqual(
+            markdown_to_html_node(markdown).to_html(),
+            "<div><p>Intro</p><pre><code>first\n\nsecond\n</code></pre><p>Outro</p></div>",
+        )
+
+    def test_inline_triple_backticks_do_not_open_a_fence(self):
+        self.assertListEqual(markdown_to_blocks("```code```\n\nafter"), ["```code```", "after"])
+
+    def test_unclosed_fence_runs_to_the_end(self):
+        self.assertListEqual(markdown_to_blocks("```\ncode\n\nmore\n"), ["```\ncode\n\nmore"])
+
+    def test_classify_block_returns_item_bodies(self):
+        cases = [
+            ("## Heading", BlockType.HEADING, ["Heading"]),
+            ("```python\nprint('hi')\n```", BlockType.CODE, ["print('hi')\n"]),
+            (">  one\n>two", BlockType.QUOTE, ["one", "two"]),
+            ("- a\n- b", BlockType.UNORDERED_LIST, ["a", "b"]),
+            ("1. a\n2. b", BlockType.ORDERED_LIST, ["a", "b"]),
+            ("1. a\n3. b", BlockType.PARAGRAPH, ["1. a\n3. b"]),
+        ]
+        for block, block_type, bodies in cases:
+            with self.subTest(block=block):
+                kind, items = classify_block(block)
+                self.assertEqual(kind, block_type)
+                self.assertEqual([block[start:end] for start, end in items], bodies)
+
+    def test_classify_block_within_a_document(self):
+        markdown = "intro\n\n- a\n- b"
+        self.assertEqual(classify_block(markdown, 7, len(markdown)), (BlockType.UNORDERED_LIST, [(9, 10), (13, 14)]))
+
+    def test_fence_markers_inside_code_are_kept(self):
+        markdown = "```\necho ```\n```"
+        self.assertEqual(
+            markdown_to_html_node(markdown).to_html(),
+            "<div><pre><code>echo ```\n</code></pre></div>",
+        )
+
+    def test_whitespace_only_lines_separate_blocks(self):
+        self.assertListEqual(markdown_to_blocks("first\n   \nsecond"), ["first", "second"])
+
+
+class TestMappedMarkdown(unittest.TestCase):
+    document = (
+        "# Title\r\n\r\nSome **bold** text\u00a0\n\u2003\n"
+        "```\ncode\n\nmore\n```\n\n- one\n- two\n\n> quote \u00e9"
+    )
+
+    def mapped(self, markdown):
+        return MappedMarkdown(markdown.encode("utf-8"))
+
+    def test_blocks_match_text_scanner(self):
+        text = self.document.replace("\r\n", "\n")
+        expected = [(text[start:end], block_type, [(s - start, e - start) for s, e in items])
+                    for text, block_type, items, start, end in iter_blocks(text)]
+        blocks = [(text[start:end], block_type, items)
+                  for text, block_type, items, start, end in iter_blocks(self.mapped(self.document))]
+        self.assertListEqual(blocks, expected)
+
+    def test_chunks_join_to_node_html(self):
+        expected = markdown_to_html_node(self.document.replace("\r\n", "\n")).to_html()
+        for direct in (False, True):
+            with self.subTest(direct=direct):
+                cache = BlockCache()
+                for _ in range(2):
+                    chunks = markdown_to_html_chunks(self.mapped(self.document), cache=cache, direct=direct)
+                    self.assertEqual("".join(chunks), expected)
+
+    def test_lone_carriage_returns_are_newlines(self):
+        text = self.document.replace("\r\n", "\n")
+        expected = markdown_to_html_node(text).to_html()
+        for newline in ("\r", "\r\n"):
+            with self.subTest(newline=newline):
+                chunks = markdown_to_html_chunks(self.mapped(text.replace("\n", newline)))
+                self.assertEqual("".join(chunks), expected)
+        markdown = self.mapped("<!-- template: blog -->\r## Title\rrest")
+        self.assertEqual(markdown.first_line(), "<!-- template: blog -->\n")
+        self.assertEqual(list(iter_blocks(markdown.skip_line()))[0][0], "## Title\nrest")
+
+    def test_skip_line(self):
+        markdown = self.mapped("<!-- template: blog -->\n## Title\nrest")
+        self.assertEqual(markdown.first_line(), "<!-- template: blog -->\n")
+        self.assertEqual(list(iter_blocks(markdown.skip_line()))[0][0], "## Title\nrest")
+        with self.assertRaises(ValueError):
+            list(markdown_to_html_chunks(self.mapped("  \n\n")))
@@ -0,0 +1,137 @@
+import os
+import shutil
+import tempfile
+import tracemalloc
+import unittest
+from unittest import mock
+
+from block_cache import DiskBlockCache
+from manifest import BuildManifest, MANIFEST_NAME
+from page_generator import collect_pages, generate_page, generate_pages_recursive, PageGenerationError
+from urls import UrlResolver
+from testutil import read_tree, write_file
+
+
+class TestPageGenerator(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        write_file(self.template, '<title>{{ Title }}</title><link href="/index.css"><article>{{ Content }}</article>')
+        for i in range(12):
+            write_file(os.path.join(self.content, f"section{i % 3}", f"page{i}.md"),
+                       f"# Page {i}\n\nSome **bold** text and a [link](/section0/page0).")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_collect_pages(self):
+        pages = collect_pages(self.content, os.path.join(self.root, "docs"))
+        self.assertEqual(len(pages), 12)
+        self.assertEqual(pages, sorted(pages))
+        md_path, html_path = pages[0]
+        self.assertEqual(md_path, os.path.join(self.content, "section0", "page0.md"))
+        self.assertEqual(html_path, os.path.join(self.root, "docs", "section0", "page0.html"))
+
+    def test_parallel_matches_sequential(self):
+        sequential = os.path.join(self.root, "sequential")
+        parallel = os.path.join(self.root, "parallel")
+        generate_pages_recursive(self.content, self.template, sequential, "/site/")
+        generate_pages_recursive(self.content, self.template, parallel, "/site/", jobs=4)
+        self.assertEqual(read_tree(sequential), read_tree(parallel))
+
+    def test_parallel_blocks_reach_the_disk_cache(self):
+        path = os.path.join(self.root, "blocks.json")
+        cache = DiskBlockCache(path)
+        generate_pages_recursive(self.content, self.template, os.path.join(self.root, "docs"), "/", jobs=2,
+                                 cache=cache)
+        cache.save()
+        # Twelve headings and the paragraph they share
+        self.assertEqual(len(DiskBlockCache(path)), 13)
+
+    def test_pipelined_matches_sequential(self):
+        sequential = os.path.join(self.root, "sequential")
+        pipelined = os.path.join(self.root, "pipelined")
+        generate_pages_recursive(self.content, self.template, sequential, "/site/", io_workers=0)
+        generate_pages_recursive(self.content, self.template, pipelined, "/site/", io_workers=3)
+        self.assertEqual(read_tree(sequential), read_tree(pipelined))
+
+    def test_unchanged_outputs_are_not_rewritten(self):
+        for io_workers in (0, 3):
+            with self.subTest(io_workers=io_workers):
+                dest = os.path.join(self.root, f"docs{io_workers}")
+                generate_pages_recursive(self.content, self.template, dest, "/", io_workers=io_workers)
+                page = os.path.join(dest, "section0", "page0.html")
+                os.utime(page, ns=(0, 0))
+                write_file(os.path.join(self.content, "section1", "page1.md"), f"# Changed {io_workers}")
+                changed = []
+                generate_pages_recursive(self.content, self.template, dest, "/", io_workers=io_workers,
+                                         changed_files=changed)
+                self.assertEqual(os.stat(page).st_mtime_ns, 0)
+                self.assertEqual(changed, ["section1/page1.html"])
+
+    def test_pipelined_reports_each_failure(self):
+        write_file(os.path.join(self.content, "broken", "a.md"), "no title here")
+        dest = os.path.join(self.root, "docs")
+        with self.assertRaises(PageGenerationError) as context:
+            generate_pages_recursive(self.content, self.template, dest, "/")
+        self.assertEqual([path for path, error in context.exception.failures],
+                         [os.path.join(self.content, "broken", "a.md")])
+        self.assertEqual(len(read_tree(dest)), 12)
+
+    def test_parallel_reports_each_failure(self):
+        write_file(os.path.join(self.content, "broken", "a.md"), "no title here")
+        write_file(os.path.join(self.content, "broken", "b.md"), "nor here")
+        dest = os.path.join(self.root, "docs")
+        with self.assertRaises(PageGenerationError) as context:
+            generate_pages_recursive(self.content, self.template, dest, "/", jobs=2)
+        failed = [path for path, error in context.exception.failures]
+        self.assertEqual(failed, [os.path.join(self.content, "broken", "a.md"),
+                                  os.path.join(self.content, "broken", "b.md")])
+        self.assertIn("no title in markdown found", context.exception.failures[0][1])
+        # The other pages were still generated
+        self.assertEqual(len(read_tree(dest)), 12)
+
+    def test_large_sources_match_read_sources(self):
+        write_file(os.path.join(self.root, "templates", "blog.html"), "<h1>{{ Title }}</h1>{{ Content }}")
+        write_file(os.path.join(self.content, "blog.md"),
+                   "<!-- template: blog -->\r\n# Blog\r\n\r\n```\ncode\n\nmore\n```\n\n- [a](/blog)")
+        expected = os.path.join(self.root, "expected")
+        generate_pages_recursive(self.content, self.template, expected, "/site/", io_workers=0)
+        for io_workers in (0, 3):
+            with self.subTest(io_workers=io_workers):
+                dest = os.path.join(self.root, f"mapped{io_workers}")
+                manifest = BuildManifest(os.path.join(dest, MANIFEST_NAME))
+                with mock.patch("page_generator.LARGE_SOURCE_SIZE", 1):
+                    generate_pages_recursive(self.content, self.template, dest, "/site/", manifest=manifest,
+                                             io_workers=io_workers)
+                    manifest.save()
+                    tree = read_tree(dest)
+                    del tree[MANIFEST_NAME]
+                    self.assertEqual(tree, read_tree(expected))
+                    rebuilt = generate_pages_recursive(self.content, self.template, dest, "/site/",
+                                                       manifest=manifest, io_workers=io_workers)
+                    self.assertEqual(rebuilt, {})
+
+    def test_large_pages_render_in_bounded_memory(self):
+        source = os.path.join(self.root, "changelog.md")
+        write_file(source, "# Changelog\n\n" + "\n\n".join(
+            f"## v{i}\n\n- fixed **bug** {i} in [module](/m/{i})\n- added `thing` {i}" for i in range(8000)))
+        dest = os.path.join(self.root, "docs", "changelog.html")
+        with mock.patch("page_generator.LARGE_SOURCE_SIZE", 1):
+            tracemalloc.start()
+            try:
+                generate_page(source, self.template, dest, UrlResolver("/"))
+                peak = tracemalloc.get_traced_memory()[1]
+            finally:
+                tracemalloc.stop()
+        # One block at a time: a small fraction of the page, let alone its node tree
+        self.assertLess(peak, os.path.getsize(source) // 8)
+        with open(dest) as f:
+            html = f.read()
+        self.assertTrue(html.startswith("<title>Changelog</title>"))
+        self.assertIn('<h2>v7999</h2><ul><li>fixed <b>bug</b> 7999 in <a href="/m/7999">module</a></li>', html)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,3 +1,4 @@
+import io
 import unittest
 
 from parentnode import ParentNode
@@ -30,4 +31,17 @@ class TestParentNode(unittest.TestCase):
 
     def test_missing_children(self):
         with self.assertRaises(ValueError):
-            ParentNode(tag="p").to_html()
\ No newline at end of file
+            ParentNode(tag="p").to_html()
+
+    def test_iter_html_chunks(self):
+        parent_node = ParentNode("p", [LeafNode("b", "bold"), LeafNode(None, " text")])
+        self.assertEqual(list(parent_node.iter_html()), ["<p>", "<b>bold</b>", " text", "</p>"])
+
+    def test_write_html(self):
+        grandchild_node = LeafNode("a", "link", props={"href": "/x"})
+        parent_node = ParentNode("div", [ParentNode("span", [grandchild_node])])
+        fp = io.StringIO()
+        parent_node.write_html(fp)
+        self.assertEqual(fp.getvalue(), parent_node.to_html())
+        self.assertEqual(fp.getvalue(), '<div><span><a href="/x">link</a></span></div>')
+
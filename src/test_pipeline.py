@@ -0,0 +1,85 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from pipeline import prefetch, read_bytes, replace_if_changed, temp_path, write_if_changed, WriteBehindWriter
+
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def path(self, name):
+        return os.path.join(self.root, name)
+
+    def test_prefetch_keeps_order(self):
+        paths = []
+        for i in range(20):
+            paths.append(self.path(f"{i}.md"))
+            with open(paths[-1], "wb") as f:
+                f.write(str(i).encode())
+        results = [future.result() for future in prefetch(paths, workers=3, depth=4)]
+        self.assertEqual(results, [str(i).encode() for i in range(20)])
+
+    def test_prefetch_reads_with_the_given_function_and_reports_errors(self):
+        with open(self.path("a.md"), "wb") as f:
+            f.write(b"text")
+        futures = list(prefetch([self.path("a.md"), self.path("missing.md")],
+                                read=lambda path: len(read_bytes(path))))
+        self.assertEqual(futures[0].result(), 4)
+        with self.assertRaises(FileNotFoundError):
+            futures[1].result()
+
+    def test_write_if_changed(self):
+        path = self.path(os.path.join("out", "page.html"))
+        self.assertTrue(write_if_changed(path, b"<p>one</p>"))
+        os.utime(path, ns=(0, 0))
+        self.assertFalse(write_if_changed(path, b"<p>one</p>"))
+        self.assertEqual(os.stat(path).st_mtime_ns, 0)
+        self.assertTrue(write_if_changed(path, b"<p>two</p>"))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"<p>two</p>")
+
+    def test_replace_if_changed(self):
+        path = self.path("page.html")
+        write_if_changed(path, b"same")
+        os.utime(path, ns=(0, 0))
+        for data, replaced in ((b"same", False), (b"other", True)):
+            tmp_path = temp_path(path)
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            self.assertEqual(replace_if_changed(tmp_path, path), replaced)
+            self.assertFalse(os.path.exists(tmp_path))
+        with open(path, "rb") as f:
+            self.assertEqual(f.read(), b"other")
+        self.assertEqual(os.listdir(self.root), ["page.html"])
+
+    def test_write_behind_writer(self):
+        write_if_changed(self.path("same.html"), b"same")
+        with WriteBehindWriter(workers=2, depth=2) as writer:
+            writer.put(self.path("same.html"), b"same")
+            for i in range(5):
+                writer.put(self.path(f"{i}.html"), b"new")
+        self.assertEqual(writer.skipped, [self.path("same.html")])
+        self.assertEqual(sorted(writer.written), sorted(self.path(f"{i}.html") for i in range(5)))
+        self.assertEqual(writer.errors, [])
+
+    def test_write_behind_reraises_unexpected_errors(self):
+        with self.assertRaises(TypeError):
+            with WriteBehindWriter(workers=1, depth=1) as writer:
+                writer.put(self.path("bad.html"), "not bytes")
+                for i in range(3):
+                    writer.put(self.path(f"{i}.html"), b"new")
+        self.assertEqual(sorted(writer.written), sorted(self.path(f"{i}.html") for i in range(3)))
+        os.mkdir(self.path("dir.html"))
+        with WriteBehindWriter(workers=1) as writer:
+            writer.put(self.path("dir.html"), b"new")
+        self.assertEqual([path for path, error in writer.errors], [self.path("dir.html")])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,79 @@
+import os
+import json
+import pstats
+import shutil
+import tempfile
+import unittest
+
+from profiler import BuildProfile, PageTimings, PAGE_STAGES, format_report
+from page_generator import generate_pages_recursive
+
+
+class TestProfiler(unittest.TestCase):
+    def test_page_timings(self):
+        timings = PageTimings("a.md")
+        timings.add("read", 1.0, 0.5)
+        timings.add("read", 1.0, 0.5)
+        timings.add("write", 0.5, 0.25)
+        self.assertEqual(timings.total(), [2.5, 1.25])
+        self.assertEqual(list(timings.to_dict()["stages"]), ["read", "write"])
+
+    def test_report_lists_slowest_pages(self):
+        profile = BuildProfile()
+        for page, wall in [("a.md", 1.0), ("b.md", 3.0), ("c.md", 2.0)]:
+            profile.new_page(page).add("read", wall, wall)
+        report = profile.report(top=2)
+        self.assertEqual([page["page"] for page in report["slowest"]], ["b.md", "c.md"])
+        self.assertEqual(report["page_stages"]["read"]["wall"], 6.0)
+        self.assertIn("b.md", format_report(report))
+
+    def test_profiled_build_records_every_stage(self):
+        root = tempfile.mkdtemp()
+        try:
+            content = os.path.join(root, "content")
+            os.makedirs(content)
+            with open(os.path.join(content, "index.md"), "w") as f:
+                f.write("# Title\n\nSome **text**\n\n- a\n- b")
+            template = os.path.join(root, "template.html")
+            with open(template, "w") as f:
+                f.write("<title>{{ Title }}</title>{{ Content }}")
+
+            profile = BuildProfile(os.path.join(root, "build.pstats"))
+            generate_pages_recursive(content, template, os.path.join(root, "docs"), "/", profile=profile)
+            report_path = os.path.join(root, "profile.json")
+            profile.write(report_path)
+
+            with open(report_path) as f:
+                report = json.load(f)
+            self.assertEqual(report["page_count"], 1)
+            self.assertEqual(list(report["pages"][0]["stages"]), PAGE_STAGES)
+            self.assertTrue(os.path.exists(os.path.join(root, "build.pstats")))
+        finally:
+            shutil.rmtree(root)
+
+    def test_parallel_build_merges_worker_stats(self):
+        root = tempfile.mkdtemp()
+        try:
+            content = os.path.join(root, "content")
+            os.makedirs(content)
+            for i in range(4):
+                with open(os.path.join(content, f"page{i}.md"), "w") as f:
+                    f.write(f"# Page {i}\n\nSome **text**")
+            template = os.path.join(root, "template.html")
+            with open(template, "w") as f:
+                f.write("<title>{{ Title }}</title>{{ Content }}")
+
+            pstats_path = os.path.join(root, "build.pstats")
+            profile = BuildProfile(pstats_path)
+            generate_pages_recursive(content, template, os.path.join(root, "docs"), "/", jobs=2, profile=profile)
+            profile.write(os.path.join(root, "profile.json"))
+
+            stats = pstats.Stats(pstats_path)
+            self.assertTrue(any(func[2] == "markdown_to_html_node" for func in stats.stats))
+            self.assertEqual([name for name in os.listdir(root) if name.endswith(".part")], [])
+        finally:
+            shutil.rmtree(root)
+
+
+if __name__ == "__main__":
+    unittest.main()
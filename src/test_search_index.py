@@ -0,0 +1,154 @@
+import os
+import json
+import shutil
+import tempfile
+import unittest
+
+from block_cache import BlockCache
+from manifest import BuildManifest, MANIFEST_NAME
+from markdown_parser import markdown_to_html, markdown_to_html_chunks, markdown_to_html_node, PageFacts
+from page_generator import generate_pages_recursive
+from search_index import shard_name, SearchIndex, SEARCH_DIR
+from testutil import read_tree, write_file
+
+PAGE = """# Rivendell &amp; Lothlorien
+
+Rivendell is the **Last Homely House**, see [maps](/maps).
+
+## Elves
+
+- Elrond
+- Glorfindel of Rivendell
+
+```
+code block
+```"""
+
+
+def search_entry(render, markdown, **kwargs):
+    facts = PageFacts(search=True)
+    result = render(markdown, facts=facts, **kwargs)
+    if callable(getattr(result, "__next__", None)):
+        "".join(result)
+    return facts.search_entry()
+
+
+class TestPageSearchEntry(unittest.TestCase):
+    def test_headings_are_weighted(self):
+        entry = search_entry(markdown_to_html_node, PAGE)
+        self.assertEqual(entry["title"], "Rivendell & Lothlorien")
+        terms = entry["terms"]
+        self.assertEqual(terms["rivendell"], 8 + 1 + 1)
+        self.assertEqual(terms["elves"], 4)
+        self.assertEqual(terms["homely"], 1)
+        self.assertEqual(terms["maps"], 1)
+        self.assertEqual(terms["code"], 1)
+        self.assertNotIn("amp", terms)
+
+    def test_engines_and_cache_agree(self):
+        expected = search_entry(markdown_to_html_node, PAGE)
+        self.assertEqual(search_entry(markdown_to_html, PAGE), expected)
+        self.assertEqual(search_entry(markdown_to_html_chunks, PAGE), expected)
+        cache = BlockCache()
+        self.assertEqual(search_entry(markdown_to_html_node, PAGE, cache=cache), expected)
+        # Taken from the cache this time, with the terms cached alongside the HTML
+        self.assertEqual(search_entry(markdown_to_html, PAGE, cache=cache), expected)
+        self.assertEqual(cache.hits, 5)
+
+    def test_shard_name(self):
+        self.assertEqual(shard_name("rivendell"), "ri")
+        self.assertEqual(shard_name("élan"), "_l")
+        self.assertEqual(shard_name("42nd"), "42")
+
+
+class TestSearchIndex(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.docs = os.path.join(self.root, "docs")
+        self.template = os.path.join(self.root, "template.html")
+        write_file(self.template, "<title>{{ Title }}</title><article>{{ Content }}</article>")
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\nWelcome to rivendell")
+        write_file(os.path.join(self.content, "blog", "elves.md"), "# Elves\n\nElrond lives in rivendell")
+        write_file(os.path.join(self.content, "blog", "hobbits.md"), "# Hobbits\n\nBilbo lives in the shire")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def build(self, **kwargs):
+        manifest = BuildManifest.load(os.path.join(self.docs, MANIFEST_NAME))
+        search = SearchIndex.load(self.docs)
+        generate_pages_recursive(self.content, self.template, self.docs, "/", manifest=manifest,
+                                 search=search, **kwargs)
+        manifest.save()
+        return search.write(self.docs)
+
+    def read(self, name):
+        with open(os.path.join(self.docs, SEARCH_DIR, name)) as f:
+            return json.load(f)
+
+    def test_index_is_sharded_by_prefix(self):
+        written = self.build()
+        self.assertIn("search/ri.json", written)
+        pages = self.read("pages.json")["pages"]
+        self.assertEqual(sorted(pages), [["blog/elves.html", "Elves"], ["blog/hobbits.html", "Hobbits"],
+                                         ["index.html", "Home"]])
+        ids = {url: page_id for page_id, (url, title) in enumerate(pages)}
+        self.assertEqual(self.read("ri.json"), {"rivendell": [[ids["blog/elves.html"], 1], [ids["index.html"], 1]]})
+        self.assertEqual(self.read("el.json")["elves"], [[ids["blog/elves.html"], 8]])
+
+    def test_parallel_build_writes_the_same_index(self):
+        self.build()
+        expected = read_tree(os.path.join(self.docs, SEARCH_DIR))
+        shutil.rmtree(self.docs)
+        self.build(jobs=2)
+        self.assertEqual(read_tree(os.path.join(self.docs, SEARCH_DIR)), expected)
+
+    def test_incremental_update_rewrites_only_affected_shards(self):
+        self.build()
+        ids = {url: page_id for page_id, (url, title) in enumerate(self.read("pages.json")["pages"])}
+        write_file(os.path.join(self.content, "blog", "hobbits.md"), "# Hobbits\n\nFrodo lives in the shire")
+        self.assertEqual(sorted(self.build()), ["search/bi.json", "search/fr.json"])
+        self.assertEqual(self.read("fr.json"), {"frodo": [[ids["blog/hobbits.html"], 1]]})
+        self.assertFalse(os.path.exists(os.path.join(self.docs, SEARCH_DIR, "bi.json")))
+
+        # Deleted pages are dropped and their id is given to the next new page
+        os.remove(os.path.join(self.content, "blog", "elves.md"))
+        self.build()
+        write_file(os.path.join(self.content, "blog", "ents.md"), "# Ents")
+        self.build()
+        pages = self.read("pages.json")["pages"]
+        self.assertEqual(pages[ids["blog/elves.html"]], ["blog/ents.html", "Ents"])
+        self.assertEqual(self.read("ri.json"), {"rivendell": [[ids["index.html"], 1]]})
+
+    def test_freed_ids_are_reused_lowest_first(self):
+        search = SearchIndex()
+        for name in ["a", "b", "c", "d"]:
+            search.update_page(f"{name}.html", name, {name * 2: 1})
+        search.remove_page("c.html")
+        search.remove_page("a.html")
+        search.update_page("e.html", "e", {"ee": 1})
+        search.update_page("f.html", "f", {"ff": 1})
+        self.assertEqual([page[0] for page in search.pages], ["e.html", "b.html", "f.html", "d.html"])
+
+        # Ids trimmed off the end on write are not handed out again
+        search.remove_page("b.html")
+        search.remove_page("d.html")
+        search.write(self.docs)
+        self.assertEqual(len(search.pages), 3)
+        search.update_page("g.html", "g", {"gg": 1})
+        search.update_page("h.html", "h", {"hh": 1})
+        self.assertEqual([page[0] for page in search.pages], ["e.html", "g.html", "f.html", "h.html"])
+
+    def test_pages_missing_from_the_index_are_rebuilt(self):
+        manifest = BuildManifest(os.path.join(self.docs, MANIFEST_NAME))
+        generate_pages_recursive(self.content, self.template, self.docs, "/", manifest=manifest)
+        search = SearchIndex()
+        rebuilt = generate_pages_recursive(self.content, self.template, self.docs, "/", manifest=manifest,
+                                           search=search)
+        self.assertEqual(rebuilt["index.md"], ["not in the search index"])
+        self.assertEqual(len(search), 3)
+
+
+if __name__ == "__main__":
+    unittest.main()
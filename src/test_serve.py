@@ -0,0 +1,120 @@
+import os
+import shutil
+import tempfile
+import threading
+import unittest
+from http.server import ThreadingHTTPServer
+from urllib.request import urlopen
+
+from serve import DevRequestHandler, DevSite, ReloadBroadcaster, RELOAD_SCRIPT
+from testutil import write_file
+
+
+class TestDevSite(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.template = os.path.join(self.root, "template.html")
+        write_file(self.template, "<body><article>{{ Content }}</article></body>")
+        write_file(os.path.join(self.content, "index.md"), "# Home")
+        write_file(os.path.join(self.content, "blog", "tom", "index.md"), "# Tom")
+        write_file(os.path.join(self.static, "index.css"), "body {}")
+        self.site = DevSite(self.content, self.static, self.template)
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def touch(self, path, text):
+        write_file(path, text)
+        # make sure the change is visible even on coarse mtime filesystems
+        stat = os.stat(path)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+    def test_serves_pages_with_reload_script(self):
+        body, content_type = self.site.get("/")
+        self.assertEqual(content_type, "text/html; charset=utf-8")
+        self.assertEqual(body.decode(), "<body><article><div><h1>Home</h1></div></article>" + RELOAD_SCRIPT + "</body>")
+        self.assertEqual(self.site.get("/blog/tom"), self.site.get("/blog/tom/"))
+
+    def read_static(self, url_path):
+        body, content_type = self.site.get(url_path)
+        with body:
+            return body.read(), content_type
+
+    def test_serves_static_files(self):
+        self.assertEqual(self.read_static("/index.css"), (b"body {}", "text/css"))
+        self.assertIsNone(self.site.get("/missing.css"))
+        self.assertIsNone(self.site.get("/../template.html"))
+
+    def test_page_change_rerenders_only_that_page(self):
+        self.site.get("/")
+        tom = self.site.get("/blog/tom/")
+        self.touch(os.path.join(self.content, "index.md"), "# Home again")
+        self.assertEqual(self.site.poll(), [os.path.join(self.content, "index.md")])
+        self.assertIn(b"Home again", self.site.get("/")[0])
+        self.assertIs(self.site.get("/blog/tom/")[0], tom[0])
+        self.assertEqual(self.site.poll(), [])
+
+    def test_template_change_rerenders_pages(self):
+        self.site.get("/")
+        self.touch(self.template, "<body><main>{{ Content }}</main></body>")
+        self.site.poll()
+        self.assertIn(b"<main>", self.site.get("/")[0])
+
+    def test_added_and_removed_pages(self):
+        self.assertIsNone(self.site.get("/new.html"))
+        write_file(os.path.join(self.content, "new.md"), "# New")
+        self.site.poll()
+        self.assertIn(b"New", self.site.get("/new.html")[0])
+        os.remove(os.path.join(self.content, "new.md"))
+        self.site.poll()
+        self.assertIsNone(self.site.get("/new.html"))
+
+    def test_static_change_is_picked_up(self):
+        self.read_static("/index.css")
+        self.touch(os.path.join(self.static, "index.css"), "body { color: red }")
+        self.assertEqual(self.site.poll(), [os.path.join(self.static, "index.css")])
+        self.assertEqual(self.read_static("/index.css")[0], b"body { color: red }")
+
+    def test_added_files_in_subdirectories_are_found(self):
+        write_file(os.path.join(self.content, "blog", "ents", "index.md"), "# Ents")
+        self.assertEqual(self.site.poll(), [os.path.join(self.content, "blog", "ents", "index.md")])
+        self.assertIn(b"Ents", self.site.get("/blog/ents/")[0])
+        shutil.rmtree(os.path.join(self.content, "blog"))
+        self.assertEqual(sorted(self.site.poll()), [os.path.join(self.content, "blog", "ents", "index.md"),
+                                                    os.path.join(self.content, "blog", "tom", "index.md")])
+        self.assertIsNone(self.site.get("/blog/tom/"))
+
+    def test_pages_dropped_while_rendering_are_not_kept(self):
+        render = self.site._render
+        def edit_while_rendering(md_path):
+            html = render(md_path)
+            self.touch(os.path.join(self.content, "index.md"), "# Home again")
+            self.site.poll()
+            return html
+        self.site._render = edit_while_rendering
+        self.assertIn(b"Home", self.site.get("/")[0])
+        self.site._render = render
+        self.assertIn(b"Home again", self.site.get("/")[0])
+
+
+    def test_http_paths_are_unquoted(self):
+        write_file(os.path.join(self.content, "my page.md"), "# Mine")
+        write_file(os.path.join(self.static, "my style.css"), "p {}")
+        self.site.poll()
+        server = ThreadingHTTPServer(("127.0.0.1", 0), DevRequestHandler)
+        server.site = self.site
+        server.broadcaster = ReloadBroadcaster()
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        self.addCleanup(server.server_close)
+        self.addCleanup(server.shutdown)
+        base = f"http://127.0.0.1:{server.server_address[1]}"
+        with urlopen(f"{base}/my%20page.html") as response:
+            self.assertIn(b"Mine", response.read())
+        with urlopen(f"{base}/my%20style.css") as response:
+            self.assertEqual((response.read(), response.headers["Content-Length"]), (b"p {}", "4"))
+
+
+if __name__ == "__main__":
+    unittest.main()
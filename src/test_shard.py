@@ -0,0 +1,94 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from copy_static import sync_static
+from manifest import BuildManifest, MANIFEST_NAME
+from merge import merge_shards, MergeConflictError
+from page_generator import generate_pages_recursive
+from search_index import SearchIndex
+from shard import in_shard, parse_shard, shard_dir
+from testutil import read_tree, write_file
+
+
+class TestShard(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.static = os.path.join(self.root, "static")
+        self.template = os.path.join(self.root, "template.html")
+        write_file(self.template, "<title>{{ Title }}</title><article>{{ Content }}</article>")
+        for i in range(10):
+            write_file(os.path.join(self.content, f"section{i % 3}", f"page{i}.md"),
+                       f"# Page {i}\n\n[Next](/section{(i + 1) % 3}/page{(i + 1) % 10})")
+            write_file(os.path.join(self.static, "images", f"image{i}.txt"), f"image {i}")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def build(self, dest, shard=None):
+        manifest = BuildManifest(os.path.join(dest, MANIFEST_NAME))
+        search = SearchIndex()
+        sync_static(self.static, dest, manifest, shard=shard)
+        generate_pages_recursive(self.content, self.template, dest, "/", manifest=manifest, shard=shard,
+                                 search=search)
+        search.write(dest)
+        manifest.record_search(search.outputs())
+        manifest.save()
+
+    def test_parse_shard(self):
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for text in ("0/4", "5/4", "2", "a/b", "1/2/3"):
+            with self.assertRaises(ValueError):
+                parse_shard(text)
+
+    def test_shards_partition_paths(self):
+        paths = [f"section{i}/page{i}.md" for i in range(200)]
+        for count in (1, 3, 4):
+            owners = [[index for index in range(1, count + 1) if in_shard(path, (index, count))]
+                      for path in paths]
+            self.assertTrue(all(len(owner) == 1 for owner in owners))
+        self.assertTrue(all(in_shard(path, None) for path in paths))
+
+    def test_merged_shards_match_full_build(self):
+        full = os.path.join(self.root, "full")
+        self.build(full)
+        docs = os.path.join(self.root, "docs")
+        shards = [shard_dir(docs, (index, 3)) for index in range(1, 4)]
+        for index, directory in enumerate(shards, start=1):
+            self.build(directory, shard=(index, 3))
+        self.assertLess(len(read_tree(shards[0])), len(read_tree(full)))
+
+        merge_shards(shards, docs)
+        expected = read_tree(full)
+        merged = read_tree(docs)
+        self.assertEqual(set(merged), set(expected))
+        # Page ids in the merged search index depend on the merge order, the entries do not
+        def site_files(tree):
+            return {path: text for path, text in tree.items()
+                    if path != MANIFEST_NAME and not path.startswith("search")}
+        self.assertEqual(site_files(merged), site_files(expected))
+        self.assertEqual(list(SearchIndex.load(docs).entries()), list(SearchIndex.load(full).entries()))
+        manifest = BuildManifest.load(os.path.join(docs, MANIFEST_NAME))
+        self.assertEqual(len(manifest.pages), 10)
+        self.assertEqual(len(manifest.static), 10)
+
+        # Merging again changes nothing, a stale file is swept
+        write_file(os.path.join(docs, "stale.html"), "old")
+        self.assertEqual(merge_shards(shards, docs), ["stale.html"])
+
+    def test_conflicting_shards_are_rejected(self):
+        shards = [os.path.join(self.root, "a"), os.path.join(self.root, "b")]
+        write_file(os.path.join(shards[0], "index.html"), "one")
+        write_file(os.path.join(shards[1], "index.html"), "two")
+        write_file(os.path.join(shards[1], "other.html"), "other")
+        dest = os.path.join(self.root, "docs")
+        with self.assertRaises(MergeConflictError) as context:
+            merge_shards(shards, dest)
+        self.assertEqual([path for path, dirs in context.exception.conflicts], ["index.html"])
+        self.assertFalse(os.path.exists(dest))
+
+
+if __name__ == "__main__":
+    unittest.main()
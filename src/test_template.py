@@ -0,0 +1,112 @@
+import io
+import os
+import shutil
+import tempfile
+import unittest
+
+from template import (
+    compile_template,
+    load_template,
+    select_template_path,
+    source_template_name,
+    split_template_directive,
+)
+from page_generator import generate_page
+from urls import UrlResolver
+
+
+class TestTemplate(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def write(self, rel_path, text):
+        path = os.path.join(self.root, rel_path)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "w") as f:
+            f.write(text)
+        return path
+
+    def test_compile_splits_literals_and_slots(self):
+        template = compile_template("<title>{{ Title }}</title><main>{{ Content }}</main>")
+        self.assertEqual(template.literals, ["<title>", "</title><main>", "</main>"])
+        self.assertEqual(template.slots, ["Title", "Content"])
+
+    def test_basepath_is_baked_into_literals(self):
+        template = compile_template('<link href="/index.css"><img src="/a.png">{{ Content }}', UrlResolver("/site/"))
+        self.assertEqual(template.literals[0], '<link href="/site/index.css"><img src="/site/a.png">')
+
+    def test_fingerprinted_assets_are_resolved(self):
+        assets = {"index.css": "index.3f9a1c2e.css", "a.png": "a.0b1c2d3e.png"}
+        template = compile_template('<link href="/index.css?v=1"><a href="//cdn.example.com/a.png">{{ Content }}',
+                                    UrlResolver("/site/", assets))
+        self.assertEqual(template.literals[0],
+                         '<link href="/site/index.3f9a1c2e.css?v=1"><a href="//cdn.example.com/a.png">')
+
+    def test_relative_links_are_baked_per_directory(self):
+        urls = UrlResolver("/site/", relative=True).for_page("blog/2024/post.html")
+        template = compile_template('<a href="/">home</a><link href="/index.css">{{ Content }}', urls)
+        self.assertEqual(template.literals[0], '<a href="../../">home</a><link href="../../index.css">')
+
+    def test_render(self):
+        template = compile_template("<h1>{{ Title }}</h1>{{ Content }}{{ Content }}")
+        self.assertEqual(
+            template.render({"Title": "Hi", "Content": "<p>x</p>"}),
+            "<h1>Hi</h1><p>x</p><p>x</p>",
+        )
+
+    def test_write_streams_callable_values(self):
+        template = compile_template("[{{ Content }}|{{ Content }}]")
+        fp = io.StringIO()
+        template.write(fp, {"Content": lambda: iter(["a", "b"])})
+        self.assertEqual(fp.getvalue(), "[ab|ab]")
+
+    def test_unknown_slots_are_left_alone(self):
+        template = compile_template("{{ Title }} {{ Author }}")
+        self.assertEqual(template.render({"Title": "Hi"}), "Hi {{ Author }}")
+
+    def test_load_template_is_cached_until_modified(self):
+        path = self.write("template.html", "<b>{{ Title }}</b>")
+        first = load_template(path, UrlResolver("/"))
+        self.assertIs(load_template(path, UrlResolver("/")), first)
+        self.assertIsNot(load_template(path, UrlResolver("/other/")), first)
+        self.assertIsNot(load_template(path, UrlResolver("/", {"a.css": "a.123.css"})), first)
+
+        self.write("template.html", "<i>{{ Title }}</i>")
+        os.utime(path, ns=(0, 0))
+        self.assertEqual(load_template(path, UrlResolver("/")).render({"Title": "x"}), "<i>x</i>")
+
+    def test_split_template_directive(self):
+        self.assertEqual(
+            split_template_directive("<!-- template: blog -->\n# Post"),
+            ("blog", "# Post"),
+        )
+        self.assertEqual(split_template_directive("# Post"), (None, "# Post"))
+
+    def test_source_template_name(self):
+        self.assertEqual(source_template_name(b"<!-- template: blog -->\r\n# Post"), "blog")
+        self.assertEqual(source_template_name(b"<!-- template: blog -->"), "blog")
+        self.assertIsNone(source_template_name(b"# Post\n<!-- template: blog -->"))
+
+    def test_select_template_path(self):
+        default = os.path.join(self.root, "template.html")
+        self.assertEqual(select_template_path(default, None), default)
+        self.assertEqual(
+            select_template_path(default, "blog"),
+            os.path.join(self.root, "templates", "blog.html"),
+        )
+
+    def test_generate_page_uses_named_template(self):
+        default = self.write("template.html", "<main>{{ Content }}</main>")
+        self.write("templates/blog.html", '<a href="/">home</a><article>{{ Content }}</article>')
+        source = self.write("content/post.md", "<!-- template: blog -->\n# Post")
+        dest = os.path.join(self.root, "docs", "post.html")
+        generate_page(source, default, dest, UrlResolver("/site/"))
+        with open(dest) as f:
+            self.assertEqual(f.read(), '<a href="/site/">home</a><article><div><h1>Post</h1></div></article>')
+
+
+if __name__ == "__main__":
+    unittest.main()
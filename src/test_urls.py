@@ -0,0 +1,93 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from block_cache import BlockCache
+from markdown_parser import markdown_to_html, markdown_to_html_node, PageFacts
+from page_generator import generate_pages_recursive
+from testutil import read_tree, write_file
+from urls import UrlResolver
+
+
+class TestUrlResolver(unittest.TestCase):
+    def test_absolute_urls_get_the_basepath(self):
+        urls = UrlResolver("/site/", {"index.css": "index.3f9a1c2e.css"})
+        self.assertEqual(urls.resolve("/blog/tom"), "/site/blog/tom")
+        self.assertEqual(urls.resolve("/index.css?v=2#top"), "/site/index.3f9a1c2e.css?v=2#top")
+        self.assertEqual(urls.resolve("/"), "/site/")
+        for url in ("https://boot.dev", "//cdn.example.com/a.js", "images/a.png", "#top"):
+            self.assertEqual(urls.resolve(url), url)
+        self.assertIs(urls.for_page("blog/tom.html"), urls)
+
+    def test_relative_urls_climb_to_the_site_root(self):
+        urls = UrlResolver("/site/", relative=True)
+        self.assertEqual(urls.for_page("index.html").resolve("/blog/tom"), "./blog/tom")
+        self.assertEqual(urls.for_page("blog/tom.html").resolve("/"), "../")
+        self.assertEqual(urls.for_page("a/b/c.html").resolve("/index.css"), "../../index.css")
+        # One resolver per directory, wherever it is asked from
+        self.assertIs(urls.for_page("blog/a.html"), urls.for_page("blog/tom.html").for_page("blog/b.html"))
+        self.assertNotEqual(urls.for_page("blog/a.html").context, urls.context)
+
+    def test_nodes_are_built_with_resolved_urls(self):
+        markdown = "[Tom](/blog/tom) and ![art](/images/a.png) and [out](https://boot.dev)"
+        urls = UrlResolver("/site/", {"images/a.png": "images/a.0b1c2d3e.png"})
+        expected = ('<div><p><a href="/site/blog/tom">Tom</a> and '
+                    '<img src="/site/images/a.0b1c2d3e.png" alt="art"></img> and '
+                    '<a href="https://boot.dev">out</a></p></div>')
+        self.assertEqual(markdown_to_html_node(markdown, urls=urls).to_html(), expected)
+        self.assertEqual(markdown_to_html(markdown, urls=urls), expected)
+
+    def test_raw_html_urls_are_resolved(self):
+        markdown = '<a href="/blog/">Blog</a> and <img src="/images/a.png"> and <a href="//cdn.example.com/">cdn</a>'
+        urls = UrlResolver("/site/", {"images/a.png": "images/a.0b1c2d3e.png"})
+        expected = ('<div><p><a href="/site/blog/">Blog</a> and <img src="/site/images/a.0b1c2d3e.png"> and '
+                    '<a href="//cdn.example.com/">cdn</a></p></div>')
+        for render in (markdown_to_html_node, markdown_to_html):
+            with self.subTest(render=render.__name__):
+                facts = PageFacts()
+                html = render(markdown, urls=urls, facts=facts)
+                self.assertEqual(html if isinstance(html, str) else html.to_html(), expected)
+                # Recorded as the page's dependencies, as written
+                self.assertEqual(facts.links, ["/blog/", "//cdn.example.com/"])
+                self.assertEqual(facts.images, ["/images/a.png"])
+
+    def test_cached_blocks_are_keyed_by_resolver(self):
+        cache = BlockCache()
+        markdown = "[Tom](/blog/tom)"
+        first = markdown_to_html(markdown, cache=cache, urls=UrlResolver("/a/"))
+        second = markdown_to_html(markdown, cache=cache, urls=UrlResolver("/b/"))
+        self.assertEqual((first, second), ('<div><p><a href="/a/blog/tom">Tom</a></p></div>',
+                                           '<div><p><a href="/b/blog/tom">Tom</a></p></div>'))
+        self.assertEqual(cache.hits, 0)
+
+
+class TestRelativeLinks(unittest.TestCase):
+    def setUp(self):
+        self.root = tempfile.mkdtemp()
+        self.content = os.path.join(self.root, "content")
+        self.template = os.path.join(self.root, "template.html")
+        write_file(self.template, '<link href="/index.css">{{ Content }}')
+        write_file(os.path.join(self.content, "index.md"), "# Home\n\n[Tom](/blog/tom)")
+        write_file(os.path.join(self.content, "blog", "tom.md"), "# Tom\n\n[Tom](/blog/tom)")
+
+    def tearDown(self):
+        shutil.rmtree(self.root)
+
+    def test_pages_link_relative_to_their_directory(self):
+        for kwargs in ({"io_workers": 0}, {"io_workers": 2}, {"jobs": 2}, {"direct": True}):
+            with self.subTest(**kwargs):
+                dest = os.path.join(self.root, "docs")
+                generate_pages_recursive(self.content, self.template, dest, "/site/", cache=BlockCache(),
+                                         relative_links=True, **kwargs)
+                self.assertEqual(read_tree(dest), {
+                    "index.html": '<link href="./index.css"><div><h1>Home</h1>'
+                                  '<p><a href="./blog/tom">Tom</a></p></div>',
+                    os.path.join("blog", "tom.html"): '<link href="../index.css"><div><h1>Tom</h1>'
+                                                      '<p><a href="../blog/tom">Tom</a></p></div>',
+                })
+                shutil.rmtree(dest)
+
+
+if __name__ == "__main__":
+    unittest.main()
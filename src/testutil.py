@@ -0,0 +1,19 @@
+import os
+
+# Helpers shared by the test modules
+
+
+def write_file(path, text):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "w") as f:
+        f.write(text)
+
+
+def read_tree(root):
+    files = {}
+    for dirpath, dirs, filenames in os.walk(root):
+        for filename in filenames:
+            path = os.path.join(dirpath, filename)
+            with open(path) as f:
+                files[os.path.relpath(path, root)] = f.read()
+    return files
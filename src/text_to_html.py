@@ -1,9 +1,24 @@
 from textnode import TextType
 from leafnode import LeafNode
+from htmlnode import intern_prop_keys
 
-def text_node_to_html_node(text_node):
+_LINK_PROPS = intern_prop_keys(("href",))
+_IMAGE_PROPS = intern_prop_keys(("src", "alt"))
+
+def text_node_to_html_node(text_node, urls=None):
+    """Convert a TextNode to its LeafNode.
+
+    Args:
+        text_node (TextNode): The inline node
+        urls (UrlResolver, optional): Resolves the URLs of links, images and
+            raw HTML tags. Without one they are kept as written.
+    """
+    url = text_node.url
+    if urls is not None and url is not None:
+        url = urls.resolve(url)
     if text_node.text_type == TextType.TEXT:
-        return LeafNode(tag=None, value=text_node.text)
+        # Raw HTML in the markdown is passed through with its links resolved
+        return LeafNode(tag=None, value=text_node.text if urls is None else urls.resolve_html(text_node.text))
     elif text_node.text_type == TextType.BOLD:
         return LeafNode(tag="b", value=text_node.text)
     elif text_node.text_type == TextType.ITALIC:
@@ -11,10 +26,13 @@ def text_node_to_html_node(text_node):
     elif text_node.text_type == TextType.CODE:
         return LeafNode(tag="code", value=text_node.text)
     elif text_node.text_type == TextType.LINK:
-        return LeafNode(tag="a", value=text_node.text, 
-                        props={"href": text_node.url})
+        node = LeafNode(tag="a", value=text_node.text)
+        node._set_props(_LINK_PROPS, (url,))
+        return node
     elif text_node.text_type == TextType.IMAGE:
-        return LeafNode(tag="img", value="", 
-                        props={"src": text_node.url, "alt": text_node.text})
+        node = LeafNode(tag="img", value="")
+        node._set_props(_IMAGE_PROPS, (url, text_node.text))
+        return node
     else:
-        return LeafNode(tag=None, value=text_node.text) 
+        # Raw HTML in the markdown is passed through with its links resolved
+        return LeafNode(tag=None, value=text_node.text if urls is None else urls.resolve_html(text_node.text)) 
@@ -10,6 +10,8 @@ class TextType(Enum):
     IMAGE = 'image'
 
 class TextNode():
+    __slots__ = ('text', 'text_type', 'url')
+
     def __init__(self, text, text_type=TextType.TEXT, url=None):
         self.text = text
         self.text_type: TextType = text_type
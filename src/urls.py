@@ -0,0 +1,101 @@
+import re
+import hashlib
+import posixpath
+
+# The path of a URL, up to any query or fragment
+_PATH = re.compile(r"[^?#]*")
+
+# An href or src attribute in raw HTML, and its URL
+_HTML_URL = re.compile(r'\b(href|src)="([^"]*)"')
+
+def html_urls(markup):
+    """Yield (attribute, URL) for every href and src attribute in raw HTML, in order."""
+    if '="' in markup:
+        for match in _HTML_URL.finditer(markup):
+            yield match.group(1), match.group(2)
+
+class UrlResolver():
+    """Maps the site-absolute URLs in markdown and templates to the URLs they are served at.
+
+    Pages link to pages and assets by their path from the site root, like
+    /blog/ or /images/tolkien.png. A resolver prefixes those with the site's
+    basepath, or, in relative mode, with the way back up from the page's
+    directory to the site root, and points links to fingerprinted assets at
+    their hashed names. Every other URL is left as written.
+
+    URLs are resolved as the LINK and IMAGE nodes, the raw HTML in text
+    nodes and the compiled templates are built, so finished pages never need
+    a rewriting pass.
+
+    In relative mode, directory is the directory of the pages a resolver is
+    for, relative to the site root; see for_page. The basepath is unused then.
+    """
+
+    def __init__(self, basepath="/", assets=None, relative=False, directory=""):
+        self.basepath = basepath
+        self.assets = assets or {}
+        self.relative = relative
+        self.directory = directory
+        if not relative:
+            self.prefix = basepath
+        elif directory:
+            self.prefix = "../" * (directory.count("/") + 1)
+        else:
+            self.prefix = "./"
+        # Everything resolved URLs depend on, so rendered blocks can be cached under it
+        self.context = self.prefix
+        if self.assets:
+            names = "\n".join(f"{path}\0{name}" for path, name in sorted(self.assets.items()))
+            self.context += "\0" + hashlib.blake2b(names.encode("utf-8"), digest_size=16).hexdigest()
+        self._directories = {directory: self}
+
+    def for_page(self, page):
+        """Return the resolver for one page.
+
+        In absolute mode every page shares this resolver. In relative mode the
+        prefix depends on the page's directory, so one resolver is made and
+        kept per directory.
+
+        Args:
+            page (str): The page's output path relative to the site root, e.g. blog/post.html
+
+        Returns:
+            UrlResolver: The resolver to render the page with
+        """
+        if not self.relative:
+            return self
+        directory = posixpath.dirname(page)
+        resolver = self._directories.get(directory)
+        if resolver is None:
+            resolver = UrlResolver(self.basepath, self.assets, relative=True, directory=directory)
+            resolver._directories = self._directories
+            self._directories[directory] = resolver
+        return resolver
+
+    def resolve(self, url):
+        """Return the URL a page should link to for url.
+
+        Args:
+            url (str): A URL as written in markdown or a template
+
+        Returns:
+            str: url with a site-absolute path resolved, anything else unchanged
+        """
+        if not url.startswith("/") or url.startswith("//"):
+            return url
+        end = _PATH.match(url, 1).end()
+        path = url[1:end]
+        return self.prefix + self.assets.get(path, path) + url[end:]
+
+    def resolve_html(self, markup):
+        """Return raw HTML with the URLs of its href and src attributes resolved.
+
+        Args:
+            markup (str): Text that may hold HTML tags, from markdown or a template
+
+        Returns:
+            str: markup with every href and src URL passed through resolve
+        """
+        if '="' not in markup:
+            return markup
+        return _HTML_URL.sub(lambda match: f'{match.group(1)}="{self.resolve(match.group(2))}"', markup)